@@ -0,0 +1,41 @@
+# app/api/dependencies.py
+from fastapi import Request
+from fastapi.requests import HTTPConnection
+from app.services.agent_service import HealthAgent
+from app.services.voice_service import VoiceService
+from app.services.whisper_pool import WhisperModelPool
+from app.services.transcription_executor import TranscriptionExecutor
+from app.services.transcription_jobs import TranscriptionJobManager
+from app.services.camera_pipeline import CameraPipeline
+from app.services.knowledge_service import KnowledgeService
+
+# -----------------------------
+# 🔌 Services partagés (créés dans le lifespan de l'app)
+# -----------------------------
+def get_health_agent(request: Request) -> HealthAgent:
+    return request.app.state.health_agent
+
+
+def get_voice_service(connection: HTTPConnection) -> VoiceService:
+    # HTTPConnection : utilisable depuis une route HTTP comme depuis un WebSocket
+    return connection.app.state.voice_service
+
+
+def get_whisper_pool(request: Request) -> WhisperModelPool:
+    return request.app.state.whisper_pool
+
+
+def get_transcription_executor(request: Request) -> TranscriptionExecutor:
+    return request.app.state.transcription_executor
+
+
+def get_transcription_jobs(request: Request) -> TranscriptionJobManager:
+    return request.app.state.transcription_jobs
+
+
+def get_camera_pipeline(connection: HTTPConnection) -> CameraPipeline:
+    return connection.app.state.camera_pipeline
+
+
+def get_knowledge_service(request: Request) -> KnowledgeService:
+    return request.app.state.knowledge_service
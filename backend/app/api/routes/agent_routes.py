@@ -1,11 +1,19 @@
 # app/api/routes/agent_routes.py
-from fastapi import APIRouter, HTTPException
+import json
+import os
+from fastapi import APIRouter, HTTPException, Depends
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import Dict, Any, List
+from typing import Dict, Any, List, AsyncIterator, Optional
 from app.services.agent_service import HealthAgent
+from app.api.dependencies import get_health_agent
 
 router = APIRouter(prefix="/agents", tags=["Agents"])
 
+# Nombre maximal de messages d'un lot traités simultanément
+BATCH_CONCURRENCY = int(os.getenv("AGENT_BATCH_CONCURRENCY", "8"))
+BATCH_MAX_ITEMS = int(os.getenv("AGENT_BATCH_MAX_ITEMS", "500"))
+
 class ChatMessage(BaseModel):
     user_id: int
     message: str
@@ -16,14 +24,29 @@ class AgentResponse(BaseModel):
     type: str
     urgency: str
     suggestions: list
+    usage: Optional[Dict[str, int]] = None  # tokens du prompt (system, profile, summary, history, user, total) ; absent si aucun prompt construit (cache, démo)
+
+class BatchChatRequest(BaseModel):
+    items: List[ChatMessage]
+    stream: bool = False  # True : résultats en NDJSON au fil de l'eau
+
+class BatchChatItemResult(BaseModel):
+    index: int
+    user_id: int
+    response: Optional[AgentResponse] = None
+    error: Optional[str] = None
+
+class BatchChatResponse(BaseModel):
+    results: List[BatchChatItemResult]
+    total: int
+    failed: int
 
 @router.post("/chat", response_model=AgentResponse)
-async def chat_with_agent(chat_data: ChatMessage):
+async def chat_with_agent(chat_data: ChatMessage, agent: HealthAgent = Depends(get_health_agent)):
     """
     Dialogue avec l'agent santé intelligent
     """
     try:
-        agent = HealthAgent()
         response = await agent.process_user_message(
             user_id=chat_data.user_id,
             message=chat_data.message,
@@ -38,14 +61,88 @@ async def chat_with_agent(chat_data: ChatMessage):
             detail=f"Erreur lors du traitement du message: {str(e)}"
         )
 
+@router.post("/chat/batch", response_model=BatchChatResponse)
+async def chat_with_agent_batch(batch: BatchChatRequest, agent: HealthAgent = Depends(get_health_agent)):
+    """
+    Dialogue en lot (tableau de bord soignant) : les messages sont traités en parallèle
+    avec une concurrence bornée. Résultats dans l'ordre des messages, avec erreur par élément.
+    Avec stream=true, chaque résultat est renvoyé en NDJSON dès qu'il est prêt.
+    """
+    if len(batch.items) > BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Lot trop volumineux: {len(batch.items)} messages (max {BATCH_MAX_ITEMS})"
+        )
+    
+    items = [
+        {"user_id": item.user_id, "message": item.message, "context": item.context}
+        for item in batch.items
+    ]
+    outcomes = agent.process_batch(items, BATCH_CONCURRENCY)
+    
+    if batch.stream:
+        return StreamingResponse(
+            _to_ndjson(batch.items, outcomes),
+            media_type="application/x-ndjson"
+        )
+    
+    results: List[Optional[BatchChatItemResult]] = [None] * len(items)
+    async for index, outcome in outcomes:
+        results[index] = _batch_item_result(index, batch.items[index], outcome)
+    
+    return {
+        "results": results,
+        "total": len(results),
+        "failed": sum(1 for r in results if r.error is not None)
+    }
+
+def _batch_item_result(index: int, item: ChatMessage, outcome: Any) -> BatchChatItemResult:
+    if isinstance(outcome, Exception):
+        return BatchChatItemResult(
+            index=index,
+            user_id=item.user_id,
+            error=f"Erreur lors du traitement du message: {str(outcome)}"
+        )
+    return BatchChatItemResult(index=index, user_id=item.user_id, response=outcome)
+
+async def _to_ndjson(items: List[ChatMessage], outcomes: AsyncIterator) -> AsyncIterator[str]:
+    async for index, outcome in outcomes:
+        yield _batch_item_result(index, items[index], outcome).model_dump_json() + "\n"
+
+@router.post("/chat/stream")
+async def chat_with_agent_stream(chat_data: ChatMessage, agent: HealthAgent = Depends(get_health_agent)):
+    """
+    Dialogue en streaming (Server-Sent Events) : les tokens arrivent au fil de la génération.
+    Événements : "token" (texte à ajouter), "replace" (texte à remplacer), "done" (réponse finale)
+    """
+    events = agent.stream_user_message(
+        user_id=chat_data.user_id,
+        message=chat_data.message,
+        context=chat_data.context
+    )
+    return StreamingResponse(
+        _to_sse(events),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+async def _to_sse(events: AsyncIterator[Dict[str, Any]]) -> AsyncIterator[str]:
+    """Formate les événements de l'agent en Server-Sent Events"""
+    try:
+        async for event in events:
+            name = event.pop("event")
+            yield f"event: {name}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+    except Exception as e:
+        error = {"detail": f"Erreur lors du traitement du message: {str(e)}"}
+        yield f"event: error\ndata: {json.dumps(error, ensure_ascii=False)}\n\n"
+
 @router.get("/conversation/{user_id}")
-async def get_conversation_history(user_id: int):
+async def get_conversation_history(user_id: int, agent: HealthAgent = Depends(get_health_agent)):
     """
     Récupère l'historique de conversation d'un utilisateur
     """
     try:
-        agent = HealthAgent()
-        history = agent.get_conversation_history(user_id)
+        history = await agent.get_conversation_history(user_id)
         
         return {
             "user_id": user_id,
@@ -60,13 +157,12 @@ async def get_conversation_history(user_id: int):
         )
 
 @router.delete("/conversation/{user_id}")
-async def clear_conversation(user_id: int):
+async def clear_conversation(user_id: int, agent: HealthAgent = Depends(get_health_agent)):
     """
     Efface l'historique de conversation d'un utilisateur
     """
     try:
-        agent = HealthAgent()
-        agent.clear_conversation_history(user_id)
+        await agent.clear_conversation_history(user_id)
         
         return {
             "status": "success",
@@ -80,12 +176,14 @@ async def clear_conversation(user_id: int):
         )
 
 @router.get("/health")
-async def agent_health_check():
+async def agent_health_check(agent: HealthAgent = Depends(get_health_agent)):
     return {
         "status": "healthy",
         "service": "Health Agent",
         "capabilities": [
             "mental_health", "sleep", "nutrition", 
             "exercise", "symptoms", "general_health"
-        ]
+        ],
+        "conversation_memory": agent.memory_stats(),
+        "llm": agent.llm_service.stats()
     }
\ No newline at end of file
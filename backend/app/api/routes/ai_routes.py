@@ -1,6 +1,7 @@
 # app/api/routes/ai_routes.py
 from fastapi import APIRouter
 from app.models.recommendation import Recommendation
+from app.services.keyword_classifier import health_classifier
 
 router = APIRouter(prefix="/ai", tags=["AI"])
 
@@ -9,9 +10,10 @@ def get_recommendation(user_input: str):
     """
     Exemple simple — on remplacera plus tard par ton moteur IA.
     """
-    if "stress" in user_input.lower():
+    topic = health_classifier.classify(user_input).first("recommendation")
+    if topic == "stress":
         return {"recommendation": "Faites 10 minutes de respiration consciente 🧘‍♀️"}
-    elif "fatigue" in user_input.lower():
+    elif topic == "fatigue":
         return {"recommendation": "Essayez de dormir 8h cette nuit 😴"}
     else:
         return {"recommendation": "Buvez de l’eau et marchez un peu 💧🚶"}
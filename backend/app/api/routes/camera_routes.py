@@ -1,14 +1,24 @@
 # app/api/routes/camera_routes.py
-from fastapi import APIRouter, UploadFile, File, HTTPException
-from pydantic import BaseModel
-from typing import Dict, Any, List
-import cv2
-import numpy as np
-import tempfile
+import asyncio
+import json
 import os
+from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, WebSocket
+from pydantic import BaseModel
+from typing import Dict, Any, List, Iterable, Optional
+from app.services.camera_pipeline import (
+    CameraPipeline, ImageDecodingError, ImageTooLargeError, CameraUnavailableError,
+    MAX_IMAGE_BYTES, ANALYSES, EMOTIONS, FATIGUE, ADVANCED
+)
+from app.services.camera_streaming import CameraStreamSession
+from app.api.dependencies import get_camera_pipeline
 
 router = APIRouter(prefix="/camera", tags=["Camera Analysis"])
 
+# Durée maximale d'une session d'analyse en continu
+STREAM_MAX_SECONDS = float(os.getenv("CAMERA_STREAM_MAX_SECONDS", "3600"))
+# Nombre maximal d'images par requête d'analyse groupée
+MAX_BATCH_IMAGES = int(os.getenv("CAMERA_MAX_BATCH_IMAGES", "32"))
+
 class CameraAnalysisResponse(BaseModel):
     emotions: Dict[str, float]
     fatigue_score: float
@@ -18,83 +28,157 @@ class CameraAnalysisResponse(BaseModel):
     recommendations: List[str]
 
 @router.post("/analyze-advanced", response_model=CameraAnalysisResponse)
-async def analyze_advanced_health(image: UploadFile = File(...)):
+async def analyze_advanced_health(image: UploadFile = File(...), user_id: Optional[int] = None, pipeline: CameraPipeline = Depends(get_camera_pipeline)):
     """
     Analyse avancée santé via caméra - Détection émotions, fatigue, posture, hydratation
     """
+    results = await _run_pipeline(pipeline, image, (ADVANCED,), user_id)
+    return results[ADVANCED]
+
+@router.post("/analyze-batch", response_model=List[CameraAnalysisResponse])
+async def analyze_batch(images: List[UploadFile] = File(...), pipeline: CameraPipeline = Depends(get_camera_pipeline)):
+    """
+    Analyse avancée de plusieurs photos en une requête (ex. tour des résidents d'un établissement).
+    Résultats dans l'ordre des images ; une image illisible donne une entrée vide
+    (`health_metrics.error`) sans faire échouer le lot.
+    """
+    if len(images) > MAX_BATCH_IMAGES:
+        raise HTTPException(413, f"Trop d'images (max {MAX_BATCH_IMAGES} par requête)")
+    data = [await image.read(MAX_IMAGE_BYTES + 1) for image in images]
     try:
-        # Simulation analyse IA avancée
-        analysis_result = await _simulate_advanced_analysis(image)
-        
-        return analysis_result
-        
+        results = await pipeline.analyze_batch(data, (ADVANCED,))
+    except CameraUnavailableError as e:
+        raise HTTPException(503, f"Analyse caméra indisponible: {str(e)}")
     except Exception as e:
         raise HTTPException(500, f"Erreur analyse caméra: {str(e)}")
+    return [_failed_analysis(result["error"]) if "error" in result else result[ADVANCED] for result in results]
 
 @router.post("/detect-emotions")
-async def detect_emotions(image: UploadFile = File(...)):
+async def detect_emotions(image: UploadFile = File(...), user_id: Optional[int] = None, pipeline: CameraPipeline = Depends(get_camera_pipeline)):
     """
-    Détection des 23 points d'émotions du visage
+    Détection des émotions du visage (sourire, tension, ouverture des yeux)
     """
-    try:
-        emotions = await _analyze_micro_expressions(image)
-        return {
-            "dominant_emotion": emotions["dominant"],
-            "emotion_breakdown": emotions["breakdown"],
-            "confidence": emotions["confidence"]
-        }
-    except Exception as e:
-        raise HTTPException(500, f"Erreur détection émotions: {str(e)}")
+    results = await _run_pipeline(pipeline, image, (EMOTIONS,), user_id)
+    return _emotions_payload(results[EMOTIONS])
 
 @router.post("/fatigue-detection")
-async def detect_fatigue(image: UploadFile = File(...)):
+async def detect_fatigue(image: UploadFile = File(...), user_id: Optional[int] = None, pipeline: CameraPipeline = Depends(get_camera_pipeline)):
+    """
+    Détection fatigue via analyse visage (cernes, rougeurs, yeux mi-clos)
+    """
+    results = await _run_pipeline(pipeline, image, (FATIGUE,), user_id)
+    return _fatigue_payload(results[FATIGUE])
+
+@router.post("/analyze-all")
+async def analyze_all(image: UploadFile = File(...), user_id: Optional[int] = None, pipeline: CameraPipeline = Depends(get_camera_pipeline)):
     """
-    Détection fatigue via analyse visage (cernes, rougeurs, pupilles)
+    Les trois analyses pour le prix d'une : un seul décodage et une seule passe de détection.
+    Avec `user_id` (consentement `camera_cache`), une image quasi identique à une précédente
+    reprend son résultat sans nouvelle détection (`cached`).
     """
+    results = await _run_pipeline(pipeline, image, ANALYSES, user_id)
+    return {
+        "emotions": _emotions_payload(results[EMOTIONS]),
+        "fatigue": _fatigue_payload(results[FATIGUE]),
+        "advanced": results[ADVANCED],
+        "face_detected": results["face_detected"],
+        "cached": results["cached"],
+        "timings_ms": results["timings_ms"]
+    }
+
+@router.websocket("/stream")
+async def stream_camera(
+    websocket: WebSocket,
+    alpha: float = 0.3,
+    min_change: float = 0.05,
+    redetect_every: int = 15,
+    pipeline: CameraPipeline = Depends(get_camera_pipeline)
+):
+    """
+    Suivi fatigue/posture en continu.
+
+    Le client envoie des images encodées (JPEG, PNG, WebP) en trames binaires,
+    puis `{"event": "end"}` en texte. Le serveur répond en JSON : `ready`,
+    `analysis` (uniquement quand le résultat lissé change), `error`, `end`.
+    Les images arrivées pendant une analyse en cours sont ignorées, sauf la plus récente.
+    """
+    await websocket.accept()
+    if not pipeline.ready or not 0 < alpha <= 1 or redetect_every < 1:
+        reason = "Analyse caméra indisponible" if not pipeline.ready else "Paramètres invalides"
+        await websocket.send_json({"event": "error", "detail": reason})
+        await websocket.close(code=1013 if not pipeline.ready else 1003)
+        return
+    
+    session = CameraStreamSession(
+        pipeline, websocket.send_json, alpha=alpha, min_change=min_change, redetect_every=redetect_every
+    )
+    await websocket.send_json({"event": "ready"})
+    loop_start = asyncio.get_running_loop().time()
     try:
-        fatigue_data = await _analyze_fatigue_indicators(image)
-        return {
-            "fatigue_score": fatigue_data["score"],
-            "indicators": fatigue_data["indicators"],
-            "recommendations": fatigue_data["recommendations"]
-        }
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+            if message.get("bytes"):
+                session.feed(message["bytes"])
+                if asyncio.get_running_loop().time() - loop_start > STREAM_MAX_SECONDS:
+                    await websocket.send_json({"event": "error", "detail": f"Durée maximale atteinte ({int(STREAM_MAX_SECONDS)} s)"})
+                    break
+            elif message.get("text"):
+                try:
+                    event = json.loads(message["text"]).get("event")
+                except (ValueError, AttributeError):
+                    event = None
+                if event == "end":
+                    break
+        
+        await session.finish()
+        await websocket.send_json({"event": "end", **session.stats()})
+        await websocket.close()
     except Exception as e:
-        raise HTTPException(500, f"Erreur détection fatigue: {str(e)}")
+        print(f"❌ Erreur analyse caméra en continu: {e}")
+    finally:
+        await session.aclose()
 
-async def _simulate_advanced_analysis(image: UploadFile) -> Dict[str, Any]:
-    """Simulation analyse IA avancée"""
+@router.get("/health")
+async def camera_health(pipeline: CameraPipeline = Depends(get_camera_pipeline)):
+    return pipeline.stats()
+
+def _emotions_payload(emotions: Dict[str, Any]) -> Dict[str, Any]:
     return {
-        "emotions": {
-            "joy": 0.7, "calm": 0.6, "focus": 0.5, 
-            "fatigue": 0.3, "stress": 0.2
-        },
-        "fatigue_score": 0.3,
-        "posture_quality": 0.8,
-        "hydration_level": 0.75,
-        "health_metrics": {
-            "estimated_age": 28,
-            "skin_health": 0.8,
-            "vitality_index": 0.85
-        },
-        "recommendations": [
-            "Hydratation bonne, continuez ! 💧",
-            "Posture correcte, penser aux pauses 🪑",
-            "Niveau d'énergie optimal 🚀"
-        ]
+        "dominant_emotion": emotions["dominant"],
+        "emotion_breakdown": emotions["breakdown"],
+        "confidence": emotions["confidence"]
     }
 
-async def _analyze_micro_expressions(image: UploadFile) -> Dict[str, Any]:
-    """Analyse micro-expressions faciales"""
+def _fatigue_payload(fatigue: Dict[str, Any]) -> Dict[str, Any]:
     return {
-        "dominant": "calm",
-        "breakdown": {"joy": 0.7, "calm": 0.8, "surprise": 0.1},
-        "confidence": 0.89
+        "fatigue_score": fatigue["score"],
+        "indicators": fatigue["indicators"],
+        "recommendations": fatigue["recommendations"]
     }
 
-async def _analyze_fatigue_indicators(image: UploadFile) -> Dict[str, Any]:
-    """Analyse indicateurs fatigue"""
+def _failed_analysis(detail: str) -> Dict[str, Any]:
     return {
-        "score": 0.3,
-        "indicators": ["yeux_clairs", "peau_saine", "posture_droite"],
-        "recommendations": ["Repos suffisant", "Continuer bonne hydratation"]
-    }
\ No newline at end of file
+        "emotions": {},
+        "fatigue_score": 0.0,
+        "posture_quality": 0.0,
+        "hydration_level": 0.0,
+        "health_metrics": {"face_detected": False, "error": detail},
+        "recommendations": [f"Renvoyez cette photo (JPEG, PNG ou WebP, {MAX_IMAGE_BYTES // (1024 * 1024)} Mo maximum)"]
+    }
+
+async def _run_pipeline(pipeline: CameraPipeline, image: UploadFile, analyses: Iterable[str],
+                        user_id: Optional[int] = None) -> Dict[str, Any]:
+    """Lecture bornée de l'image puis pipeline partagé ; erreurs traduites en réponses HTTP"""
+    data = await image.read(MAX_IMAGE_BYTES + 1)
+    try:
+        return await pipeline.analyze(data, analyses, user_id=user_id)
+    except ImageTooLargeError as e:
+        raise HTTPException(413, str(e))
+    except ImageDecodingError as e:
+        raise HTTPException(400, str(e))
+    except CameraUnavailableError as e:
+        raise HTTPException(503, f"Analyse caméra indisponible: {str(e)}")
+    except Exception as e:
+        raise HTTPException(500, f"Erreur analyse caméra: {str(e)}")
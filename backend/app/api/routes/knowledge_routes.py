@@ -1,19 +1,31 @@
 # app/api/routes/knowledge_routes.py
-from fastapi import APIRouter, HTTPException
-from app.services.knowledge_service import KnowledgeService
+from fastapi import APIRouter, HTTPException, Depends
+from pydantic import BaseModel, Field
+from typing import Optional
+from app.services.knowledge_service import KnowledgeService, SEARCH_MODES
+from app.api.dependencies import get_knowledge_service
 
 router = APIRouter(prefix="/knowledge", tags=["Knowledge"])
 
+class TipCreate(BaseModel):
+    category: str = Field(..., min_length=1, max_length=50)
+    content: str = Field(..., min_length=3, max_length=2000)
+    source: Optional[str] = None
+
 @router.get("/search")
-async def search_knowledge(query: str, max_results: int = 3):
+async def search_knowledge(query: str, max_results: int = 3, mode: str = "lexical",
+                           service: KnowledgeService = Depends(get_knowledge_service)):
     """
-    Recherche intelligente dans les connaissances santé
+    Recherche intelligente dans les connaissances santé :
+    `lexical` (BM25), `semantic` (embeddings) ou `hybrid` (fusion des deux)
     """
+    if mode not in SEARCH_MODES:
+        raise HTTPException(400, f"Mode inconnu: {mode} (attendu : {', '.join(SEARCH_MODES)})")
     try:
-        service = KnowledgeService()
-        results = await service.search_health_resources(query, max_results)
+        results = await service.search_health_resources(query, max_results, mode=mode)
         return {
             "query": query,
+            "mode": mode,
             "results": results,
             "total_found": len(results)
         }
@@ -23,13 +35,26 @@ async def search_knowledge(query: str, max_results: int = 3):
             detail=f"Erreur lors de la recherche: {str(e)}"
         )
 
+@router.post("/tips")
+async def add_tip(tip: TipCreate, service: KnowledgeService = Depends(get_knowledge_service)):
+    """
+    Ajoute un conseil à la base : cherchable immédiatement sur tous les workers, conservé au redémarrage
+    """
+    try:
+        document = await service.add_tip(tip.category.strip().lower(), tip.content.strip(), tip.source or "Contribution")
+        return {"tip": document, "total_tips": len(service.documents)}
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Erreur lors de l'ajout du conseil: {str(e)}"
+        )
+
 @router.get("/scrape/{topic}")
-async def scrape_health_topic(topic: str):
+async def scrape_health_topic(topic: str, service: KnowledgeService = Depends(get_knowledge_service)):
     """
     Scrapping de ressources santé sur un sujet spécifique
     """
     try:
-        service = KnowledgeService()
         resources = await service.scrape_health_resources(topic)
         return {
             "topic": topic,
@@ -43,9 +68,15 @@ async def scrape_health_topic(topic: str):
         )
 
 @router.get("/health")
-async def knowledge_health_check():
+async def knowledge_health_check(service: KnowledgeService = Depends(get_knowledge_service)):
+    stats = service.stats()
+    vectors = stats["vector_index"]
+    capabilities = ["lexical_search", "semantic_search", "hybrid_search", "resource_scraping"]
+    if vectors["memory_mapped"]:
+        capabilities.append("vector_storage")
     return {
         "status": "healthy",
         "service": "Knowledge Base",
-        "capabilities": ["semantic_search", "resource_scraping", "vector_storage"]
+        "capabilities": capabilities,
+        **stats
     }
\ No newline at end of file
@@ -1,37 +1,181 @@
 # app/api/routes/voice_routes.py
-from fastapi import APIRouter, UploadFile, File, HTTPException
+import asyncio
+import json
+import os
+import re
+from typing import Dict, Any, Optional, List
+from fastapi import APIRouter, UploadFile, File, Form, Query, HTTPException, Depends, Request, WebSocket
+from fastapi.responses import StreamingResponse
+from fastapi.responses import JSONResponse
 from app.services.voice_service import VoiceService
+from app.services.agent_service import HealthAgent
+from app.services.whisper_pool import WhisperModelPool, ModelNotReadyError
+from app.services.audio_decoding import AudioDecodingError, AudioTooLargeError, MAX_UPLOAD_BYTES
+from app.services.transcription_executor import (
+    TranscriptionExecutor, TranscriptionQueueFullError, TranscriptionTimeoutError
+)
+from app.services.voice_streaming import StreamingTranscriptionSession
+from app.services.transcription_jobs import TranscriptionJobManager, JobNotFoundError
+from app.api.dependencies import (
+    get_voice_service, get_whisper_pool, get_transcription_executor, get_transcription_jobs,
+    get_health_agent
+)
 
 router = APIRouter(prefix="/voice", tags=["Voice"])
 
+# Durée maximale d'une session de transcription en continu
+STREAM_MAX_SECONDS = float(os.getenv("VOICE_STREAM_MAX_SECONDS", "900"))
+# Nombre maximal de fichiers par job de transcription par lots
+JOB_MAX_FILES = int(os.getenv("VOICE_JOB_MAX_FILES", "500"))
+
+ALLOWED_AUDIO_TYPES = ['audio/wav', 'audio/mpeg', 'audio/mp3', 'audio/x-wav', 'audio/webm']
+
 @router.post("/transcribe")
-async def transcribe_audio(file: UploadFile = File(...)):
+async def transcribe_audio(
+    file: UploadFile = File(...),
+    language: Optional[str] = None,
+    user_id: Optional[int] = None,
+    latency_budget_ms: Optional[float] = Query(None, gt=0),
+    service: VoiceService = Depends(get_voice_service)
+):
     """
-    Transcription audio avec analyse intelligente
+    Transcription audio avec analyse intelligente.
+    
+    `language` (ou à défaut la langue de `user_id`) évite la passe de détection ;
+    `latency_budget_ms` oriente vers un modèle plus rapide pour les clips longs.
     """
     print(f"📥 Réception fichier: {file.filename} ({file.content_type})")
     
     # Vérification du type de fichier
-    allowed_types = ['audio/wav', 'audio/mpeg', 'audio/mp3', 'audio/x-wav', 'audio/webm']
-    if not file.content_type or file.content_type not in allowed_types:
+    _check_audio_type(file.content_type)
+    return await _run_transcription(service.transcribe_audio(
+        file, language=language, user_id=user_id, latency_budget_ms=latency_budget_ms
+    ))
+
+@router.post("/transcribe/raw")
+async def transcribe_raw_audio(
+    request: Request,
+    language: Optional[str] = None,
+    user_id: Optional[int] = None,
+    latency_budget_ms: Optional[float] = Query(None, gt=0),
+    service: VoiceService = Depends(get_voice_service)
+):
+    """
+    Transcription d'un corps de requête audio brut (Content-Type audio/*) :
+    le flux est décodé au fil de la réception, sans multipart ni fichier temporaire
+    """
+    content_type = (request.headers.get("content-type") or "").split(";")[0].strip()
+    _check_audio_type(content_type)
+    
+    # Rejet immédiat si la taille annoncée dépasse déjà la limite
+    declared = request.headers.get("content-length")
+    if declared and declared.isdigit() and int(declared) > MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=413, detail=f"Fichier audio trop volumineux (max {MAX_UPLOAD_BYTES} octets)")
+    
+    return await _run_transcription(service.transcribe_stream(
+        request.stream(), language=language, user_id=user_id, latency_budget_ms=latency_budget_ms
+    ))
+
+@router.post("/chat")
+async def voice_chat(
+    file: UploadFile = File(...),
+    user_id: int = Form(...),
+    language: Optional[str] = Form(None),
+    latency_budget_ms: Optional[float] = Form(None, gt=0),
+    service: VoiceService = Depends(get_voice_service),
+    agent: HealthAgent = Depends(get_health_agent)
+):
+    """
+    Message vocal -> agent santé en un seul aller-retour (NDJSON) :
+    `transcript` (transcription + analyse) dès qu'elle est prête, puis les événements
+    de l'agent (`token`, `replace`) et `done` avec la réponse complète.
+    """
+    print(f"📥 Réception message vocal: {file.filename} ({file.content_type})")
+    _check_audio_type(file.content_type)
+    
+    # Pendant la transcription : historique chargé et connexion LLM ouverte
+    preparing = asyncio.ensure_future(agent.prepare(user_id))
+    try:
+        transcription = await _run_transcription(service.transcribe_audio(
+            file, language=language, user_id=user_id, latency_budget_ms=latency_budget_ms
+        ))
+    except BaseException:
+        preparing.cancel()
+        raise
+    
+    return StreamingResponse(
+        _voice_chat_events(agent, user_id, transcription, preparing),
+        media_type="application/x-ndjson"
+    )
+
+async def _voice_chat_events(agent: HealthAgent, user_id: int, transcription: Dict[str, Any], preparing):
+    yield json.dumps({"event": "transcript", **transcription}, ensure_ascii=False) + "\n"
+    
+    text = transcription["transcription"].strip()
+    if not text:
+        preparing.cancel()
+        yield json.dumps({"event": "done", "answer": None, "type": "no_speech"}) + "\n"
+        return
+    
+    try:
+        await preparing
+    except Exception as e:
+        print(f"⚠️  Préparation agent: {e}")
+    try:
+        async for event in agent.stream_user_message(
+            user_id=user_id,
+            message=text,
+            context={"source": "voice", "voice_analysis": transcription["analysis"]}
+        ):
+            yield json.dumps(event, ensure_ascii=False) + "\n"
+    except Exception as e:
+        error = {"event": "error", "detail": f"Erreur lors du traitement du message: {str(e)}"}
+        yield json.dumps(error, ensure_ascii=False) + "\n"
+
+def _check_audio_type(content_type: str):
+    if not content_type or content_type not in ALLOWED_AUDIO_TYPES:
         raise HTTPException(
             status_code=400, 
-            detail=f"Type de fichier non supporté. Types autorisés: {allowed_types}"
+            detail=f"Type de fichier non supporté. Types autorisés: {ALLOWED_AUDIO_TYPES}"
         )
-    
+
+async def _run_transcription(transcription) -> Dict[str, Any]:
+    """Exécute une transcription et traduit les erreurs en réponses HTTP"""
     try:
-        service = VoiceService()
-        result = await service.transcribe_audio(file)
+        result = await transcription
         
         return {
             "status": "success",
             "transcription": result["text"],
             "detected_language": result["language"],
+            "model": result.get("model"),
+            "language_detection": result.get("language_detection"),
+            "duration_seconds": result.get("duration_seconds"),
+            "skipped_seconds": result.get("skipped_seconds"),
             "confidence": result["confidence"],
             "analysis": result["analysis"],
             "intent": result["intent"],
+            "audio_sha256": result["audio_sha256"],
+            "cached": result["cached"],
             "message": "Transcription et analyse réussies"
         }
+    except AudioTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except AudioDecodingError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ModelNotReadyError as e:
+        raise HTTPException(
+            status_code=503,
+            detail=f"Modèle de transcription indisponible: {str(e)}",
+            headers={"Retry-After": "10"}
+        )
+    except (TranscriptionQueueFullError, TranscriptionTimeoutError) as e:
+        # Backpressure : le client réessaiera quand la file se sera écoulée
+        raise HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)}
+        )
     except Exception as e:
         print(f"❌ Erreur API vocale: {e}")
         raise HTTPException(
@@ -39,6 +183,118 @@ async def transcribe_audio(file: UploadFile = File(...)):
             detail=f"Erreur lors de la transcription: {str(e)}"
         )
 
+@router.websocket("/stream")
+async def stream_transcription(
+    websocket: WebSocket,
+    language: Optional[str] = None,
+    sample_rate: int = 16000,
+    sample_format: str = "s16le",
+    user_id: Optional[int] = None,
+    latency_budget_ms: Optional[float] = None,
+    service: VoiceService = Depends(get_voice_service)
+):
+    """
+    Transcription en temps réel.
+
+    Le client envoie des trames binaires PCM mono (`sample_format` s16le ou f32le),
+    puis `{"event": "end"}` en texte. Le serveur répond en JSON :
+    `ready`, `partial` (énoncé en cours), `final` (énoncé terminé + analyse et intention),
+    `alert` (formule urgente détectée), `error`, `end`.
+    Sans `language`, la langue de `user_id` est utilisée, sinon elle est détectée.
+    """
+    await websocket.accept()
+    if not service.model_pool.ready or sample_format not in ("s16le", "f32le") or not 8000 <= sample_rate <= 48000:
+        reason = "Modèle de transcription indisponible" if not service.model_pool.ready else "Format audio non supporté"
+        await websocket.send_json({"event": "error", "detail": reason})
+        await websocket.close(code=1013 if not service.model_pool.ready else 1003)
+        return
+    
+    if not language and user_id is not None:
+        language = await service.user_language(user_id)
+    session = StreamingTranscriptionSession(
+        service, websocket.send_json, language=language or None,
+        sample_rate=sample_rate, sample_format=sample_format, latency_budget_ms=latency_budget_ms
+    )
+    await websocket.send_json({"event": "ready", "sample_rate": sample_rate, "sample_format": sample_format})
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+            if message.get("bytes"):
+                await session.feed_pcm(message["bytes"])
+                if session.received_seconds > STREAM_MAX_SECONDS:
+                    await websocket.send_json({"event": "error", "detail": f"Durée maximale atteinte ({int(STREAM_MAX_SECONDS)} s)"})
+                    break
+            elif message.get("text"):
+                try:
+                    event = json.loads(message["text"]).get("event")
+                except (ValueError, AttributeError):
+                    event = None
+                if event == "end":
+                    break
+        
+        await session.finish()
+        await websocket.send_json({"event": "end", "utterances": session.utterances})
+        await websocket.close()
+    except Exception as e:
+        print(f"❌ Erreur transcription en continu: {e}")
+    finally:
+        await session.aclose()
+
+@router.post("/jobs", status_code=202)
+async def create_transcription_job(
+    files: List[UploadFile] = File(...),
+    priority: int = Form(5, ge=0, le=9),
+    jobs: TranscriptionJobManager = Depends(get_transcription_jobs)
+):
+    """
+    Job de transcription par lots : les fichiers sont mis en file et traités
+    en arrière-plan (priorité 9 d'abord). Renvoie l'identifiant du job.
+    """
+    if len(files) > JOB_MAX_FILES:
+        raise HTTPException(status_code=413, detail=f"Trop de fichiers (max {JOB_MAX_FILES})")
+    for upload in files:
+        _check_audio_type(upload.content_type)
+    
+    try:
+        return await jobs.create_job(files, priority=priority)
+    except AudioTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+
+@router.get("/jobs/{job_id}")
+async def get_transcription_job(job_id: str, jobs: TranscriptionJobManager = Depends(get_transcription_jobs)):
+    """État du job et résultats des éléments terminés"""
+    try:
+        return await jobs.get_job(job_id)
+    except JobNotFoundError:
+        raise HTTPException(status_code=404, detail="Job de transcription introuvable")
+
+@router.get("/jobs/{job_id}/stream")
+async def stream_transcription_job(job_id: str, jobs: TranscriptionJobManager = Depends(get_transcription_jobs)):
+    """
+    Progression du job en NDJSON : une ligne à chaque changement,
+    puis l'état complet (avec résultats) une fois terminé
+    """
+    try:
+        await jobs.get_job(job_id, include_items=False)
+    except JobNotFoundError:
+        raise HTTPException(status_code=404, detail="Job de transcription introuvable")
+    
+    async def progress():
+        async for snapshot in jobs.watch_job(job_id):
+            yield json.dumps(snapshot, ensure_ascii=False) + "\n"
+    
+    return StreamingResponse(progress(), media_type="application/x-ndjson")
+
+@router.delete("/jobs/{job_id}")
+async def cancel_transcription_job(job_id: str, jobs: TranscriptionJobManager = Depends(get_transcription_jobs)):
+    """Annule les éléments encore en attente (les éléments en cours se terminent)"""
+    try:
+        return await jobs.cancel_job(job_id)
+    except JobNotFoundError:
+        raise HTTPException(status_code=404, detail="Job de transcription introuvable")
+
 @router.get("/languages")
 async def get_supported_languages():
     return {
@@ -55,10 +311,48 @@ async def get_supported_languages():
     }
 
 @router.get("/health")
-async def voice_health_check():
-    return {
-        "status": "healthy",
+async def voice_health_check(
+    pool: WhisperModelPool = Depends(get_whisper_pool),
+    executor: TranscriptionExecutor = Depends(get_transcription_executor),
+    service: VoiceService = Depends(get_voice_service)
+):
+    """
+    Readiness : reflète l'état réel du pool de modèles (503 tant qu'il n'est pas prêt)
+    """
+    stats = pool.stats()
+    body = {
+        "status": "healthy" if pool.ready else stats["state"],
         "service": "Voice Transcription & Analysis",
-        "model": "whisper-base",
-        "capabilities": ["transcription", "intent_detection", "content_analysis"]
-    }
\ No newline at end of file
+        "model": stats["model"],
+        "capabilities": ["transcription", "intent_detection", "content_analysis"],
+        "model_pool": stats,
+        "transcription_queue": executor.stats(),
+        "preprocessing": service.stats(),
+        "transcription_cache": service.cache.stats() if service.cache is not None else None
+    }
+    return JSONResponse(status_code=200 if pool.ready else 503, content=body)
+
+_SHA256 = re.compile(r"^[0-9a-f]{64}$")
+
+@router.get("/cache/stats")
+async def transcription_cache_stats(service: VoiceService = Depends(get_voice_service)):
+    if service.cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **service.cache.stats()}
+
+@router.delete("/cache/{audio_sha256}")
+async def purge_transcription(audio_sha256: str, service: VoiceService = Depends(get_voice_service)):
+    """
+    Supprime la transcription en cache d'un fichier audio (demande de confidentialité).
+    `audio_sha256` est renvoyé par /transcribe.
+    """
+    if not _SHA256.match(audio_sha256):
+        raise HTTPException(status_code=400, detail="Empreinte SHA-256 invalide")
+    removed = await service.cache.purge(audio_sha256) if service.cache is not None else 0
+    return {"status": "success", "removed": removed}
+
+@router.delete("/cache")
+async def purge_transcription_cache(service: VoiceService = Depends(get_voice_service)):
+    """Vide entièrement le cache des transcriptions"""
+    removed = await service.cache.purge() if service.cache is not None else 0
+    return {"status": "success", "removed": removed}
\ No newline at end of file
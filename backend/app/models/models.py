@@ -21,7 +21,6 @@ class User(Base):
 
     consents = relationship("Consent", back_populates="user")
     habits = relationship("Habit", back_populates="user")
-    chat_sessions = relationship("ChatSession", back_populates="user")
     suggestions = relationship("Suggestion", back_populates="user")
 
 
@@ -72,29 +71,8 @@ class Measurement(Base):
 
 
 # ----------------------
-# CHAT SESSIONS & MESSAGES
+# CHAT SESSIONS & MESSAGES : voir app/models/chat_session.py
 # ----------------------
-class ChatSession(Base):
-    __tablename__ = "chat_sessions"
-
-    id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
-    started_at = Column(DateTime, default=datetime.utcnow)
-
-    user = relationship("User", back_populates="chat_sessions")
-    messages = relationship("Message", back_populates="session")
-
-
-class Message(Base):
-    __tablename__ = "messages"
-
-    id = Column(Integer, primary_key=True, index=True)
-    session_id = Column(Integer, ForeignKey("chat_sessions.id"), nullable=False)
-    role = Column(String, nullable=False)         # "user" / "bot"
-    content = Column(String, nullable=False)
-    timestamp = Column(DateTime, default=datetime.utcnow)
-
-    session = relationship("ChatSession", back_populates="messages")
 
 
 # ----------------------
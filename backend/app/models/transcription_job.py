@@ -0,0 +1,38 @@
+# app/models/transcription_job.py
+from sqlalchemy import Column, Integer, String, Text, ForeignKey, DateTime
+from sqlalchemy.orm import relationship
+from datetime import datetime
+from app.core.database import Base
+
+class TranscriptionJob(Base):
+    __tablename__ = "transcription_jobs"
+
+    id = Column(String, primary_key=True, index=True)     # uuid hex
+    status = Column(String, default="queued", index=True)  # queued / running / completed / failed / cancelled
+    priority = Column(Integer, default=5)                  # 0 (basse) à 9 (haute)
+    total_items = Column(Integer, default=0)
+    completed_items = Column(Integer, default=0)
+    failed_items = Column(Integer, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+    items = relationship("TranscriptionJobItem", back_populates="job", cascade="all, delete-orphan")
+
+
+class TranscriptionJobItem(Base):
+    __tablename__ = "transcription_job_items"
+
+    id = Column(Integer, primary_key=True, index=True)
+    job_id = Column(String, ForeignKey("transcription_jobs.id"), nullable=False, index=True)
+    position = Column(Integer, nullable=False)
+    filename = Column(String, nullable=True)
+    spool_path = Column(String, nullable=True)             # fichier en attente (supprimé une fois traité)
+    status = Column(String, default="queued", index=True)  # queued / running / completed / failed / cancelled
+    result = Column(Text, nullable=True)                   # JSON de la transcription
+    error = Column(String, nullable=True)
+    owner = Column(String, nullable=True)                  # processus qui traite l'élément ("running")
+    heartbeat_at = Column(DateTime, nullable=True, index=True)
+    finished_at = Column(DateTime, nullable=True)
+
+    job = relationship("TranscriptionJob", back_populates="items")
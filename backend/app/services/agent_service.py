@@ -1,10 +1,32 @@
 # app/services/agent_service.py
-from typing import Dict, Any, List
+import asyncio
+import os
+from typing import Dict, Any, List, AsyncIterator, Optional, Tuple
 from app.services.llm_service import LLMService
+from app.services.conversation_store import ConversationStore
+from app.services.keyword_classifier import health_classifier
+from app.services.conversation_persistence import ConversationPersistence
 
 class HealthAgent:
     def __init__(self):
-        self.context_memory = {}
+        # Mémoire bornée (LRU + TTL) : une seule instance par processus
+        self.context_memory = ConversationStore(
+            max_users=int(os.getenv("CONVERSATION_MAX_USERS", "100000")),
+            max_messages_per_user=int(os.getenv("CONVERSATION_MAX_MESSAGES", "20")),
+            max_total_bytes=int(os.getenv("CONVERSATION_MAX_BYTES", str(256 * 1024 * 1024))),
+            ttl_seconds=float(os.getenv("CONVERSATION_TTL_SECONDS", "3600"))
+        )
+        # Persistance différée (write-behind) : survit aux redémarrages et aux workers multiples
+        self.persistence = None
+        if os.getenv("CONVERSATION_PERSISTENCE", "1") == "1":
+            self.persistence = ConversationPersistence(
+                flush_every=int(os.getenv("CONVERSATION_FLUSH_EVERY", "50")),
+                flush_interval_ms=float(os.getenv("CONVERSATION_FLUSH_INTERVAL_MS", "500")),
+                max_batch_retries=int(os.getenv("CONVERSATION_MAX_BATCH_RETRIES", "3"))
+            )
+        # Au-delà de ce délai, la mémoire locale est confrontée à la base : un autre
+        # worker a pu enregistrer des tours de la même conversation entre-temps
+        self.sync_seconds = float(os.getenv("CONVERSATION_SYNC_SECONDS", "2"))
         self.llm_service = LLMService()
         print("✅ Agent santé avec IA initialisé !")
     
@@ -12,56 +34,173 @@ class HealthAgent:
         """
         Traite le message utilisateur avec IA
         """
-        # Initialise la mémoire de contexte
-        if user_id not in self.context_memory:
-            self.context_memory[user_id] = {
-                "conversation_history": [],
-                "user_profile": {},
-                "last_intent": None
-            }
+        await self._load_memory(user_id)
+        chat_context, prompt = self._prepare_prompt(user_id, message)
         
-        # Construit le contexte pour l'IA
-        chat_context = {
-            "user_profile": self.context_memory[user_id]["user_profile"],
-            "conversation_history": self.context_memory[user_id]["conversation_history"][-5:]  # Derniers 5 messages
-        }
+        # Appel à l'IA pour une réponse intelligente (prompt construit seulement sans réponse en cache)
+        ai_response = await self.llm_service.generate_health_response(message, chat_context, prompt=prompt)
         
-        # Appel à l'IA pour une réponse intelligente
-        ai_response = await self.llm_service.generate_health_response(message, chat_context)
+        # Met à jour l'historique (plafonné par utilisateur dans le store)
+        self._record_turn(user_id, message, ai_response)
         
-        # Met à jour l'historique
-        self.context_memory[user_id]["conversation_history"].extend([
+        analysis = health_classifier.analyze(message)
+        return {
+            "answer": ai_response,
+            "type": "ai_generated",
+            "urgency": analysis["urgency"],
+            "suggestions": analysis["suggestions"],
+            "usage": prompt.token_counts
+        }
+    
+    async def prepare(self, user_id: int):
+        """
+        Préparation d'un message imminent (ex. pendant une transcription vocale) :
+        historique chargé depuis la base et connexion LLM ouverte en parallèle
+        """
+        await asyncio.gather(self._load_memory(user_id), self.llm_service.prewarm())
+    
+    async def _load_memory(self, user_id: int):
+        """
+        Lecture à deux niveaux : mémoire d'abord, base de données en cas d'absence
+        ou si la mémoire n'a pas été resynchronisée depuis `sync_seconds`
+        """
+        if self.persistence is None or self.context_memory.is_fresh(user_id, self.sync_seconds):
+            return
+        try:
+            version = await self.persistence.external_version(user_id)
+            if self.context_memory.confirm(user_id, version):
+                return
+            history = await self.persistence.load_history(user_id, self.context_memory.max_messages_per_user)
+        except Exception as e:
+            print(f"❌ Erreur chargement historique: {e}")
+            return
+        self.context_memory.sync(user_id, history, version)
+    
+    def _record_turn(self, user_id: int, message: str, ai_response: str):
+        turn = [
             {"role": "user", "message": message},
             {"role": "assistant", "message": ai_response}
-        ])
+        ]
+        self.context_memory.append_messages(user_id, turn)
+        if self.persistence is not None:
+            self.persistence.enqueue(user_id, turn)
+    
+    def _prepare_prompt(self, user_id: int, message: str):
+        """
+        Construit le contexte, et le prompt à la demande (voir LazyPrompt)
+        """
+        memory = self.context_memory.get_or_create(user_id)
+        chat_context = {
+            "user_profile": memory["user_profile"],
+            "conversation_history": list(memory["conversation_history"]),
+            "conversation_summary": memory["conversation_summary"]
+        }
+        return chat_context, LazyPrompt(self, user_id, message, chat_context)
+    
+    async def stream_user_message(self, user_id: int, message: str, context: Dict = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Variante streaming de process_user_message : relaie les événements du LLM
+        puis termine par un événement "done" contenant la réponse complète
+        """
+        await self._load_memory(user_id)
+        chat_context, prompt = self._prepare_prompt(user_id, message)
         
-        # Limite l'historique à 20 messages
-        if len(self.context_memory[user_id]["conversation_history"]) > 20:
-            self.context_memory[user_id]["conversation_history"] = self.context_memory[user_id]["conversation_history"][-20:]
+        ai_response = ""
+        async for event in self.llm_service.stream_health_response(message, chat_context, prompt=prompt):
+            if event["event"] == "done":
+                ai_response = event["text"]
+                break
+            yield event
         
-        return {
+        self._record_turn(user_id, message, ai_response)
+        
+        analysis = health_classifier.analyze(message)
+        yield {
+            "event": "done",
             "answer": ai_response,
             "type": "ai_generated",
-            "urgency": "low",
-            "suggestions": self._generate_suggestions(message)
+            "urgency": analysis["urgency"],
+            "suggestions": analysis["suggestions"],
+            "usage": prompt.token_counts
         }
     
+    async def process_batch(self, items: List[Dict[str, Any]], concurrency: int) -> AsyncIterator[Tuple[int, Any]]:
+        """
+        Traite plusieurs messages en parallèle (au plus `concurrency` à la fois).
+        Produit des tuples (index, réponse ou exception) dans l'ordre de complétion.
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+        
+        async def run(index: int, item: Dict[str, Any]) -> Tuple[int, Any]:
+            async with semaphore:
+                try:
+                    return index, await self.process_user_message(**item)
+                except Exception as e:
+                    return index, e
+        
+        tasks = [asyncio.ensure_future(run(i, item)) for i, item in enumerate(items)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            # Client parti en cours de route : on n'abandonne pas de tâches orphelines
+            for task in tasks:
+                task.cancel()
+    
     def _generate_suggestions(self, message: str) -> List[str]:
         """Génère des suggestions contextuelles"""
-        message_lower = message.lower()
-        
-        if any(word in message_lower for word in ["stress", "anxiété"]):
-            return ["Exercice respiration", "Méditation guidée", "Conseil sommeil"]
-        elif any(word in message_lower for word in ["sommeil", "fatigue"]):
-            return ["Routine sommeil", "Conseil literie", "Relaxation"]
-        elif any(word in message_lower for word in ["manger", "alimentation"]):
-            return ["Recette santé", "Plan repas", "Conseil hydratation"]
-        else:
-            return ["Sommeil", "Nutrition", "Activité physique", "Santé mentale"]
+        return health_classifier.analyze(message)["suggestions"]
+    
+    async def get_conversation_history(self, user_id: int) -> List[Dict]:
+        await self._load_memory(user_id)
+        return self.context_memory.get_history(user_id)
+    
+    async def clear_conversation_history(self, user_id: int):
+        self.context_memory.clear_history(user_id)
+        if self.persistence is not None:
+            await self.persistence.clear(user_id)
     
-    def get_conversation_history(self, user_id: int) -> List[Dict]:
-        return self.context_memory.get(user_id, {}).get("conversation_history", [])
+    async def start(self):
+        """Création des tables de conversation, hors boucle d'événements (appelé au démarrage)"""
+        if self.persistence is not None:
+            await self.persistence.start()
     
-    def clear_conversation_history(self, user_id: int):
-        if user_id in self.context_memory:
-            self.context_memory[user_id]["conversation_history"] = []
\ No newline at end of file
+    async def aclose(self):
+        if self.persistence is not None:
+            await self.persistence.aclose()
+        await self.llm_service.aclose()
+    
+    def memory_stats(self) -> Dict[str, Any]:
+        stats = self.context_memory.stats()
+        if self.persistence is not None:
+            stats["persistence"] = self.persistence.stats()
+        return stats
+
+
+class LazyPrompt:
+    """
+    Prompt (budget de tokens) construit au premier appel seulement : une réponse servie
+    par le cache n'en a pas besoin. Les tours compactés par le PromptBuilder quittent
+    alors l'historique et vivent dans le résumé glissant.
+    """
+
+    def __init__(self, agent: HealthAgent, user_id: int, message: str, chat_context: Dict):
+        self.agent = agent
+        self.user_id = user_id
+        self.message = message
+        self.chat_context = chat_context
+        self.prompt = None
+
+    def __call__(self) -> Dict[str, Any]:
+        if self.prompt is None:
+            self.prompt = self.agent.llm_service.build_health_prompt(self.message, self.chat_context)
+            if self.prompt["compacted_messages"]:
+                self.agent.context_memory.compact_history(
+                    self.user_id, self.prompt["compacted_messages"], self.prompt["summary"]
+                )
+        return self.prompt
+
+    @property
+    def token_counts(self) -> Optional[Dict[str, int]]:
+        """Tokens du prompt, None s'il n'a pas été construit (réponse en cache, mode démo)"""
+        return self.prompt["token_counts"] if self.prompt is not None else None
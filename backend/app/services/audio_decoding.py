@@ -0,0 +1,291 @@
+# app/services/audio_decoding.py
+import asyncio
+import hashlib
+import os
+import struct
+from typing import AsyncIterator, List, Optional
+
+import numpy as np
+
+from app.services.audio_preprocessing import SAMPLE_RATE, downmix, resample
+
+CHUNK_SIZE = 64 * 1024
+
+MAX_UPLOAD_BYTES = int(os.getenv("VOICE_MAX_UPLOAD_BYTES", str(25 * 1024 * 1024)))
+MAX_AUDIO_SECONDS = float(os.getenv("VOICE_MAX_AUDIO_SECONDS", "600"))
+
+# Formats PCM décodés en mémoire : (format WAV, bits) -> (dtype, décalage, échelle)
+_WAV_PCM = 1
+_WAV_FLOAT = 3
+_WAV_EXTENSIBLE = 0xFFFE
+_WAV_STREAMING_SIZE = 0xFFFFFFFF
+_PCM_DTYPES = {
+    (_WAV_PCM, 8): (np.uint8, 128.0, 128.0),
+    (_WAV_PCM, 16): (np.dtype("<i2"), 0.0, 32768.0),
+    (_WAV_PCM, 32): (np.dtype("<i4"), 0.0, 2147483648.0),
+    (_WAV_FLOAT, 32): (np.dtype("<f4"), 0.0, 1.0),
+}
+
+
+class AudioDecodingError(Exception):
+    """Fichier audio illisible ou format non supporté"""
+
+
+class AudioTooLargeError(Exception):
+    """Fichier audio au-delà de la taille ou de la durée maximale"""
+
+
+async def iter_upload(upload, chunk_size: int = CHUNK_SIZE) -> AsyncIterator[bytes]:
+    """Lit un UploadFile par morceaux (jamais en entier)"""
+    while True:
+        chunk = await upload.read(chunk_size)
+        if not chunk:
+            return
+        yield chunk
+
+
+async def hash_upload(upload, max_bytes: int = MAX_UPLOAD_BYTES) -> str:
+    """SHA-256 d'un UploadFile (déjà sur disque), puis retour au début pour le décodage"""
+    hasher = hashlib.sha256()
+    total = 0
+    async for chunk in iter_upload(upload):
+        total += len(chunk)
+        if total > max_bytes:
+            raise AudioTooLargeError(f"Fichier audio trop volumineux (max {max_bytes} octets)")
+        hasher.update(chunk)
+    await upload.seek(0)
+    return hasher.hexdigest()
+
+
+def hash_file(path: str) -> str:
+    """SHA-256 d'un fichier (appelé dans un thread)"""
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+async def decode_audio(chunks: AsyncIterator[bytes], max_bytes: int = MAX_UPLOAD_BYTES,
+                       max_seconds: float = MAX_AUDIO_SECONDS) -> np.ndarray:
+    """
+    Décode un flux audio en tableau float32 mono 16 kHz (l'entrée attendue par Whisper),
+    sans fichier temporaire :
+    - WAV PCM : décodé en mémoire au fil des morceaux
+    - autres formats : envoyés au fil de l'eau dans un pipe ffmpeg
+    Les limites de taille et de durée sont vérifiées pendant la lecture.
+    """
+    limiter = _SizeLimiter(chunks, max_bytes)
+    first = await limiter.read_head(12)
+    if first[:4] == b"RIFF" and first[8:12] == b"WAVE":
+        decoder = _WavStreamDecoder(max_seconds)
+        if await decoder.feed_header(first, limiter):
+            return await decoder.decode(limiter)
+        # WAV compressé (ADPCM, µ-law...) : ffmpeg s'en charge
+        return await _decode_with_ffmpeg(decoder.raw_prefix, limiter, max_seconds)
+    return await _decode_with_ffmpeg(first, limiter, max_seconds)
+
+
+class _SizeLimiter:
+    """Itérateur de morceaux qui compte les octets et refuse au-delà de `max_bytes`"""
+
+    def __init__(self, chunks: AsyncIterator[bytes], max_bytes: int):
+        self._chunks = chunks.__aiter__()
+        self.max_bytes = max_bytes
+        self.total = 0
+
+    async def read_head(self, size: int) -> bytes:
+        """Premiers octets du flux (pour identifier le format)"""
+        head = b""
+        while len(head) < size:
+            chunk = await self._next()
+            if chunk is None:
+                break
+            head += chunk
+        return head
+
+    async def _next(self) -> Optional[bytes]:
+        try:
+            chunk = await self._chunks.__anext__()
+        except StopAsyncIteration:
+            return None
+        self.total += len(chunk)
+        if self.total > self.max_bytes:
+            raise AudioTooLargeError(f"Fichier audio trop volumineux (max {self.max_bytes} octets)")
+        return chunk
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> bytes:
+        chunk = await self._next()
+        if chunk is None:
+            raise StopAsyncIteration
+        return chunk
+
+
+class _WavStreamDecoder:
+    """Décodeur WAV incrémental : en-tête, puis conversion des échantillons morceau par morceau"""
+
+    def __init__(self, max_seconds: float):
+        self.max_seconds = max_seconds
+        self.data_remaining: Optional[int] = None
+        self.raw_prefix = b""
+        self._buffer = b""
+
+    async def feed_header(self, first: bytes, chunks: _SizeLimiter) -> bool:
+        """Lit les blocs jusqu'à `data`. Retourne False si l'encodage n'est pas du PCM simple"""
+        self.raw_prefix = first
+        self._buffer = first[12:]
+        fmt = None
+        while True:
+            while len(self._buffer) < 8:
+                chunk = await chunks._next()
+                if chunk is None:
+                    raise AudioDecodingError("En-tête WAV incomplet")
+                self.raw_prefix += chunk
+                self._buffer += chunk
+            chunk_id, chunk_size = self._buffer[:4], struct.unpack("<I", self._buffer[4:8])[0]
+            if chunk_id == b"data":
+                self._buffer = self._buffer[8:]
+                # 0 / 0xFFFFFFFF : taille inconnue (WAV écrit en flux), lu jusqu'à la fin
+                self.data_remaining = None if chunk_size in (0, _WAV_STREAMING_SIZE) else chunk_size
+                break
+            # Bloc complet (fmt, LIST...) nécessaire avant de passer au suivant
+            padded = chunk_size + (chunk_size & 1)
+            while len(self._buffer) < 8 + padded:
+                chunk = await chunks._next()
+                if chunk is None:
+                    raise AudioDecodingError("En-tête WAV incomplet")
+                self.raw_prefix += chunk
+                self._buffer += chunk
+            if chunk_id == b"fmt ":
+                fmt = self._buffer[8:8 + chunk_size]
+            self._buffer = self._buffer[8 + padded:]
+
+        if fmt is None or len(fmt) < 16:
+            raise AudioDecodingError("Bloc 'fmt' WAV manquant")
+        audio_format, self.channels, self.sample_rate = struct.unpack("<HHI", fmt[:8])
+        bits = struct.unpack("<H", fmt[14:16])[0]
+        if audio_format == _WAV_EXTENSIBLE and len(fmt) >= 26:
+            audio_format = struct.unpack("<H", fmt[24:26])[0]
+        layout = _PCM_DTYPES.get((audio_format, bits))
+        if layout is None or self.channels == 0 or self.sample_rate == 0:
+            return False
+        dtype, self.offset, self.scale = layout
+        self.dtype = np.dtype(dtype)
+        self.frame_bytes = self.dtype.itemsize * self.channels
+        # Le préfixe brut ne sert plus (il n'était gardé que pour le repli ffmpeg)
+        self.raw_prefix = b""
+        return True
+
+    async def decode(self, chunks: _SizeLimiter) -> np.ndarray:
+        max_frames = int(self.max_seconds * self.sample_rate)
+        parts: List[np.ndarray] = []
+        frames = 0
+        pending = self._take(self._buffer)
+        self._buffer = b""
+        while True:
+            usable = len(pending) - len(pending) % self.frame_bytes
+            if usable:
+                parts.append(self._convert(pending[:usable]))
+                frames += usable // self.frame_bytes
+                if frames > max_frames:
+                    raise AudioTooLargeError(f"Audio trop long (max {int(self.max_seconds)} s)")
+                pending = pending[usable:]
+            chunk = await chunks._next()
+            if chunk is None:
+                break
+            pending += self._take(chunk)
+
+        if not parts:
+            raise AudioDecodingError("Fichier WAV sans échantillons")
+        audio = np.concatenate(parts)
+        if self.sample_rate != SAMPLE_RATE:
+            audio = resample(audio, self.sample_rate, SAMPLE_RATE)
+        return audio
+
+    def _take(self, data: bytes) -> bytes:
+        """Part de `data` qui appartient encore au bloc `data` (les blocs suivants, LIST, id3..., sont ignorés)"""
+        if self.data_remaining is None:
+            return data
+        data = data[:self.data_remaining]
+        self.data_remaining -= len(data)
+        return data
+
+    def _convert(self, data: bytes) -> np.ndarray:
+        samples = np.frombuffer(data, dtype=self.dtype).astype(np.float32)
+        if self.offset:
+            samples -= self.offset
+        if self.scale != 1.0:
+            samples /= self.scale
+        if self.channels > 1:
+            samples = downmix(samples.reshape(-1, self.channels))
+        return samples
+
+
+async def _decode_with_ffmpeg(prefix: bytes, chunks: _SizeLimiter, max_seconds: float) -> np.ndarray:
+    """Pipe ffmpeg : les morceaux entrent sur stdin, le PCM 16 kHz sort sur stdout"""
+    try:
+        process = await asyncio.create_subprocess_exec(
+            "ffmpeg", "-nostdin", "-threads", "0", "-i", "pipe:0",
+            "-f", "s16le", "-ac", "1", "-acodec", "pcm_s16le", "-ar", str(SAMPLE_RATE), "pipe:1",
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
+    except FileNotFoundError:
+        raise AudioDecodingError("ffmpeg introuvable : seuls les fichiers WAV PCM sont décodables")
+
+    max_bytes_out = int(max_seconds * SAMPLE_RATE) * 2
+
+    async def feed():
+        try:
+            if prefix:
+                process.stdin.write(prefix)
+                await process.stdin.drain()
+            async for chunk in chunks:
+                process.stdin.write(chunk)
+                await process.stdin.drain()
+        except (BrokenPipeError, ConnectionResetError):
+            # ffmpeg a abandonné : son code de retour dira pourquoi
+            pass
+        finally:
+            if not process.stdin.is_closing():
+                process.stdin.close()
+
+    async def collect() -> bytearray:
+        output = bytearray()
+        while True:
+            block = await process.stdout.read(CHUNK_SIZE)
+            if not block:
+                return output
+            output += block
+            if len(output) > max_bytes_out:
+                raise AudioTooLargeError(f"Audio trop long (max {int(max_seconds)} s)")
+
+    async def drain_stderr() -> bytes:
+        return await process.stderr.read()
+
+    feeder = asyncio.ensure_future(feed())
+    reader = asyncio.ensure_future(collect())
+    errors = asyncio.ensure_future(drain_stderr())
+    try:
+        # gather : une erreur côté lecture (durée max) interrompt aussi l'écriture
+        _, pcm, stderr = await asyncio.gather(feeder, reader, errors)
+        return_code = await process.wait()
+    except BaseException:
+        for task in (feeder, reader, errors):
+            task.cancel()
+        if process.returncode is None:
+            process.kill()
+            await process.wait()
+        raise
+
+    if return_code != 0 or not pcm:
+        message = stderr.decode("utf-8", errors="replace").strip().splitlines()
+        raise AudioDecodingError(f"Décodage audio impossible: {message[-1] if message else return_code}")
+    # Lecture directe du bytearray : une seule copie (la conversion float32), normalisée sur place
+    audio = np.frombuffer(pcm, np.int16).astype(np.float32)
+    audio /= 32768.0
+    return audio
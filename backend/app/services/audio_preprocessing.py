@@ -0,0 +1,137 @@
+# app/services/audio_preprocessing.py
+import os
+from typing import List, Tuple
+
+import numpy as np
+
+SAMPLE_RATE = 16000            # fréquence attendue par Whisper
+WHISPER_WINDOW_SECONDS = 30    # fenêtre d'entrée de Whisper : un morceau = une ligne du batch
+
+# Seuil de silence (RMS en dBFS) et marges gardées autour de la parole
+SILENCE_DB = float(os.getenv("VOICE_SILENCE_DB", "-45"))
+FRAME_MS = 30
+PADDING_MS = 200
+# Un silence intérieur plus long que ceci est coupé (seules les marges restent)
+MIN_GAP_MS = int(os.getenv("VOICE_MIN_SILENCE_GAP_MS", "600"))
+
+
+class PreparedAudio:
+    """Audio prêt pour l'inférence : morceaux de parole ≤ 30 s et bilan du silence retiré"""
+
+    def __init__(self, chunks: List[np.ndarray], original_seconds: float):
+        self.chunks = chunks
+        self.original_seconds = original_seconds
+        self.speech_seconds = sum(len(chunk) for chunk in chunks) / SAMPLE_RATE
+
+    @property
+    def skipped_seconds(self) -> float:
+        return max(0.0, self.original_seconds - self.speech_seconds)
+
+    @property
+    def is_silent(self) -> bool:
+        return not self.chunks
+
+    def audio(self) -> np.ndarray:
+        """Morceaux mis bout à bout (transcription non découpée)"""
+        return np.concatenate(self.chunks) if self.chunks else np.zeros(0, dtype=np.float32)
+
+
+def downmix(audio: np.ndarray) -> np.ndarray:
+    """(échantillons, canaux) -> mono float32"""
+    if audio.ndim == 1:
+        return audio.astype(np.float32, copy=False)
+    return audio.mean(axis=1, dtype=np.float32)
+
+
+def resample(audio: np.ndarray, source_rate: int, target_rate: int) -> np.ndarray:
+    """Rééchantillonnage linéaire (suffisant pour la parole)"""
+    duration = len(audio) / source_rate
+    target_length = int(round(duration * target_rate))
+    positions = np.linspace(0, len(audio) - 1, num=target_length, dtype=np.float64)
+    return np.interp(positions, np.arange(len(audio)), audio).astype(np.float32)
+
+
+def frame_rms(audio: np.ndarray, frame_size: int) -> np.ndarray:
+    """RMS de chaque trame (la dernière, incomplète, est complétée par des zéros)"""
+    padded = np.pad(audio, (0, -len(audio) % frame_size))
+    frames = padded.reshape(-1, frame_size)
+    return np.sqrt(np.mean(frames * frames, axis=1, dtype=np.float64))
+
+
+def preprocess(audio: np.ndarray, sample_rate: int = SAMPLE_RATE, silence_db: float = SILENCE_DB,
+               padding_ms: int = PADDING_MS, min_gap_ms: int = MIN_GAP_MS,
+               max_chunk_seconds: float = WHISPER_WINDOW_SECONDS) -> PreparedAudio:
+    """
+    Mono 16 kHz, silences de début/fin retirés, silences intérieurs longs coupés,
+    puis découpage en morceaux ≤ `max_chunk_seconds` aux silences (décodables en un batch).
+    """
+    audio = downmix(np.asarray(audio))
+    if sample_rate != SAMPLE_RATE and len(audio):
+        audio = resample(audio, sample_rate, SAMPLE_RATE)
+    original_seconds = len(audio) / SAMPLE_RATE
+    if not len(audio):
+        return PreparedAudio([], original_seconds)
+
+    frame_size = SAMPLE_RATE * FRAME_MS // 1000
+    rms = frame_rms(audio, frame_size)
+    voiced = rms > 10 ** (silence_db / 20)
+    segments = _speech_segments(voiced, padding_ms // FRAME_MS, max(1, min_gap_ms // FRAME_MS))
+    if not segments:
+        return PreparedAudio([], original_seconds)
+
+    max_frames = max(1, int(max_chunk_seconds * 1000) // FRAME_MS)
+    chunks = [
+        np.concatenate([audio[start * frame_size:end * frame_size] for start, end in pieces])
+        for pieces in _pack_segments(segments, rms, max_frames)
+    ]
+    return PreparedAudio(chunks, original_seconds)
+
+
+def _speech_segments(voiced: np.ndarray, padding: int, min_gap: int) -> List[Tuple[int, int]]:
+    """Intervalles de trames [début, fin) contenant de la parole, marges comprises"""
+    if not voiced.any():
+        return []
+    # Débuts et fins des plages voisées (différences du masque)
+    edges = np.diff(np.concatenate([[0], voiced.astype(np.int8), [0]]))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    # Les silences courts font partie de la parole : on fusionne
+    # (et un écart qui serait recouvert par les marges de part et d'autre)
+    keep = np.concatenate([[True], starts[1:] - ends[:-1] >= max(min_gap, 2 * padding)])
+    group = np.cumsum(keep) - 1
+    merged_starts = starts[keep]
+    merged_ends = np.zeros(len(merged_starts), dtype=np.int64)
+    np.maximum.at(merged_ends, group, ends)
+    merged_starts = np.maximum(merged_starts - padding, 0)
+    merged_ends = np.minimum(merged_ends + padding, len(voiced))
+    return list(zip(merged_starts.tolist(), merged_ends.tolist()))
+
+
+def _pack_segments(segments: List[Tuple[int, int]], rms: np.ndarray,
+                   max_frames: int) -> List[List[Tuple[int, int]]]:
+    """
+    Regroupe les segments en morceaux d'au plus `max_frames` trames.
+    Un segment trop long est coupé à la trame la plus calme de la fin de fenêtre.
+    """
+    search = max(1, max_frames // 6)
+    pieces: List[Tuple[int, int]] = []
+    for start, end in segments:
+        while end - start > max_frames:
+            window_end = start + max_frames
+            cut = window_end - search + int(np.argmin(rms[window_end - search:window_end]))
+            pieces.append((start, cut))
+            start = cut
+        pieces.append((start, end))
+
+    chunks: List[List[Tuple[int, int]]] = []
+    current: List[Tuple[int, int]] = []
+    length = 0
+    for start, end in pieces:
+        if current and length + (end - start) > max_frames:
+            chunks.append(current)
+            current, length = [], 0
+        current.append((start, end))
+        length += end - start
+    if current:
+        chunks.append(current)
+    return chunks
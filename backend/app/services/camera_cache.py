@@ -0,0 +1,151 @@
+# app/services/camera_cache.py
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+
+from sqlalchemy import text
+
+from app.core.database import SessionLocal
+
+# Type de consentement autorisant la réutilisation des résultats d'un utilisateur
+CONSENT_TYPE = "camera_cache"
+CONSENT_TTL_SECONDS = 60
+
+Scope = Tuple[int, Tuple[str, ...]]   # utilisateur, analyses demandées
+
+
+class CameraResultCache:
+    """
+    Cache mémoire des analyses caméra, par utilisateur, adressé par empreinte perceptuelle.
+
+    Une image dont l'empreinte diffère d'au plus `max_distance` bits (distance de Hamming)
+    d'une image déjà analysée pour le même utilisateur et les mêmes analyses reprend son
+    résultat, sans nouvelle détection. Seuls les utilisateurs ayant donné le consentement
+    `camera_cache` en profitent ; les entrées expirent après `ttl_seconds` et les moins
+    récemment utilisées sont évincées au-delà de `max_entries`.
+    """
+
+    def __init__(self, max_entries: int = 2048, max_distance: int = 5, ttl_seconds: float = 120):
+        self.max_entries = max_entries
+        self.max_distance = max_distance
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.expired = 0
+        self.no_consent = 0
+        self._entries: "OrderedDict[Tuple[Scope, int], tuple]" = OrderedDict()   # -> (résultat, instant), ordre LRU
+        self._hashes: Dict[Scope, set] = {}
+        self._consents: Dict[int, tuple] = {}   # user_id -> (consentement, instant de lecture)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> Optional["CameraResultCache"]:
+        if os.getenv("CAMERA_CACHE_ENABLED", "1") != "1":
+            return None
+        return cls(
+            max_entries=int(os.getenv("CAMERA_CACHE_MAX_ENTRIES", "2048")),
+            max_distance=int(os.getenv("CAMERA_CACHE_MAX_DISTANCE", "5")),
+            ttl_seconds=float(os.getenv("CAMERA_CACHE_TTL_SECONDS", "120"))
+        )
+
+    async def allowed(self, user_id: int) -> bool:
+        """Consentement `camera_cache` de l'utilisateur (lecture en base mise en mémoire une minute)"""
+        cached = self._consents.get(user_id)
+        if cached is not None and time.monotonic() - cached[1] < CONSENT_TTL_SECONDS:
+            consent = cached[0]
+        else:
+            consent = await asyncio.to_thread(_load_consent, user_id)
+            if len(self._consents) > 10000:
+                self._consents.clear()
+            self._consents[user_id] = (consent, time.monotonic())
+        if not consent:
+            self.no_consent += 1
+            # Consentement absent ou retiré : rien n'est gardé pour cet utilisateur
+            self.forget(user_id)
+        return consent
+
+    def get(self, scope: Scope, image_hash: int) -> Optional[Dict[str, Any]]:
+        """Résultat d'une image assez proche (la plus proche), ou None"""
+        now = time.monotonic()
+        with self._lock:
+            best, best_distance = None, self.max_distance + 1
+            for known in list(self._hashes.get(scope, ())):
+                key = (scope, known)
+                if now - self._entries[key][1] > self.ttl_seconds:
+                    self._remove(key)
+                    self.expired += 1
+                    continue
+                distance = bin(known ^ image_hash).count("1")
+                if distance < best_distance:
+                    best, best_distance = key, distance
+            if best is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(best)
+            self.hits += 1
+            return self._entries[best][0]
+
+    def put(self, scope: Scope, image_hash: int, result: Dict[str, Any]):
+        key = (scope, image_hash)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (result, time.monotonic())
+            self._hashes.setdefault(scope, set()).add(image_hash)
+            self.stores += 1
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def forget(self, user_id: int):
+        with self._lock:
+            for scope in [scope for scope in self._hashes if scope[0] == user_id]:
+                for image_hash in list(self._hashes[scope]):
+                    self._remove((scope, image_hash))
+
+    def _remove(self, key: Tuple[Scope, int]):
+        scope, image_hash = key
+        self._entries.pop(key, None)
+        hashes = self._hashes.get(scope)
+        if hashes is not None:
+            hashes.discard(image_hash)
+            if not hashes:
+                del self._hashes[scope]
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "max_distance": self.max_distance,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "stores": self.stores,
+            "evictions": self.evictions,
+            "expired": self.expired,
+            "no_consent": self.no_consent,
+        }
+
+
+def _load_consent(user_id: int) -> bool:
+    # Requête SQL directe : le modèle Consent n'est pas relié à User (relation désactivée)
+    db = SessionLocal()
+    try:
+        row = db.execute(
+            text("SELECT 1 FROM consents WHERE user_id = :user_id AND consent_type = :consent_type LIMIT 1"),
+            {"user_id": user_id, "consent_type": CONSENT_TYPE}
+        ).first()
+        return row is not None
+    except Exception as e:
+        # Table absente ou base indisponible : pas de consentement, pas de cache
+        print(f"⚠️  Consentement caméra de l'utilisateur {user_id} illisible: {e}")
+        return False
+    finally:
+        db.close()
@@ -0,0 +1,725 @@
+# app/services/camera_pipeline.py
+import asyncio
+import os
+import queue
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from app.services.camera_cache import CameraResultCache
+
+# OpenCV est optionnel : sans lui, les routes caméra répondent 503
+try:
+    import cv2
+    CV2_AVAILABLE = True
+except ImportError:
+    CV2_AVAILABLE = False
+
+MAX_IMAGE_BYTES = int(os.getenv("CAMERA_MAX_UPLOAD_BYTES", str(10 * 1024 * 1024)))
+
+READY = "ready"
+UNAVAILABLE = "unavailable"
+
+EMOTIONS = "emotions"
+FATIGUE = "fatigue"
+ADVANCED = "advanced"
+ANALYSES = (EMOTIONS, FATIGUE, ADVANCED)
+
+Box = Tuple[int, int, int, int]   # x, y, largeur, hauteur
+
+# Côté (px) du visage recadré et normalisé : tous les visages d'un lot s'empilent en un tenseur
+FACE_CROP_SIZE = 128
+
+
+class ImageDecodingError(Exception):
+    """Image illisible ou format non supporté"""
+
+
+class ImageTooLargeError(Exception):
+    """Image au-delà de la taille maximale"""
+
+
+class CameraUnavailableError(Exception):
+    """Aucun détecteur de visage disponible (OpenCV ou modèles absents)"""
+
+
+class FaceDetectors:
+    """
+    Détecteurs d'un worker. Les cascades OpenCV ne se partagent pas entre threads :
+    chaque worker a les siens, tous chargés au démarrage.
+    """
+
+    def __init__(self, face_model: Optional[str] = None):
+        self.face_dnn = None
+        if face_model:
+            # Détecteur DNN (YuNet, .onnx) : plus robuste que Haar aux angles et à l'éclairage
+            self.face_dnn = cv2.FaceDetectorYN.create(face_model, "", (320, 320), 0.7)
+        self.face = None if self.face_dnn is not None else _cascade("haarcascade_frontalface_default.xml")
+        self.eyes = _cascade("haarcascade_eye_tree_eyeglasses.xml")
+        self.smile = _cascade("haarcascade_smile.xml")
+        if self.face_dnn is None and self.face is None:
+            raise CameraUnavailableError(
+                "Aucun détecteur de visage : cascades Haar absentes de cette version d'OpenCV "
+                "et CAMERA_FACE_DNN_MODEL non défini"
+            )
+
+    def detect_faces(self, image: np.ndarray, gray: np.ndarray) -> List[Tuple[Box, float]]:
+        if self.face_dnn is not None:
+            height, width = image.shape[:2]
+            self.face_dnn.setInputSize((width, height))
+            _, faces = self.face_dnn.detect(image)
+            if faces is None:
+                return []
+            return [((int(f[0]), int(f[1]), int(f[2]), int(f[3])), float(f[-1])) for f in faces]
+        min_side = max(24, min(gray.shape) // 8)
+        boxes = self.face.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5, minSize=(min_side, min_side))
+        return [(tuple(int(v) for v in box), 1.0) for box in boxes]
+
+
+def _cascade(name: str):
+    """Cascade Haar livrée avec opencv-python (None si absente de cette version)"""
+    if not hasattr(cv2, "CascadeClassifier"):
+        return None
+    path = os.path.join(getattr(getattr(cv2, "data", None), "haarcascades", ""), name)
+    if not os.path.exists(path):
+        return None
+    cascade = cv2.CascadeClassifier(path)
+    return None if cascade.empty() else cascade
+
+
+class FrameDetections:
+    """Une image décodée et réduite, avec les détections partagées par toutes les analyses"""
+
+    def __init__(self, image: np.ndarray, gray: np.ndarray, original_size: Tuple[int, int]):
+        self.image = image
+        self.gray = gray
+        self.original_size = original_size
+        self.face: Optional[Box] = None
+        self.face_score = 0.0
+        self.eyes: List[Box] = []
+        self.eyes_detected: Optional[int] = None   # None : pas de cascade d'yeux
+        self.smile: Optional[Box] = None
+        self.brightness = 0.0
+        self.crop: Optional[np.ndarray] = None
+
+    @property
+    def has_face(self) -> bool:
+        return self.face is not None
+
+    def region(self, box: Box, channel: Optional[np.ndarray] = None) -> np.ndarray:
+        x, y, w, h = box
+        source = self.gray if channel is None else channel
+        return source[max(0, y):max(0, y + h), max(0, x):max(0, x + w)]
+
+    def face_part(self, left: float, top: float, right: float, bottom: float) -> Box:
+        """Zone du visage en proportions (0-1) de sa boîte"""
+        x, y, w, h = self.face
+        return int(x + left * w), int(y + top * h), max(1, int((right - left) * w)), max(1, int((bottom - top) * h))
+
+    def eye_boxes(self) -> List[Box]:
+        """Yeux détectés, ou positions anatomiques moyennes à défaut"""
+        if len(self.eyes) == 2:
+            return self.eyes
+        return [self.face_part(0.2, 0.28, 0.45, 0.48), self.face_part(0.55, 0.28, 0.8, 0.48)]
+
+    def normalize(self, size: int = FACE_CROP_SIZE):
+        """Luminosité globale et visage recadré à taille fixe (empilable avec ceux d'autres images)"""
+        self.brightness = float(cv2.cvtColor(self.image, cv2.COLOR_BGR2GRAY).mean() / 255)
+        if not self.has_face:
+            return
+        face = self.region(self.face, self.image)
+        if face.shape[0] < 2 or face.shape[1] < 2:
+            # Boîte hors de l'image (détecteur DNN en bord de cadre)
+            self.face = None
+            return
+        self.crop = cv2.resize(face, (size, size), interpolation=cv2.INTER_AREA)
+
+
+def dhash(image: np.ndarray) -> int:
+    """
+    Empreinte perceptuelle 64 bits (dHash) : gradients horizontaux d'une vignette 9x8.
+    Deux prises presque identiques (même cadrage, compression différente) ne diffèrent
+    que de quelques bits.
+    """
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    thumbnail = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = thumbnail[:, 1:] > thumbnail[:, :-1]
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+class CameraPipeline:
+    """
+    Pipeline caméra partagé : un décodage (`cv2.imdecode` depuis les octets, sans fichier
+    temporaire), une réduction à la résolution de travail, une passe de détection
+    (visage, yeux, sourire), puis les analyses demandées sur ces mêmes détections.
+
+    Le travail OpenCV tourne sur un pool de threads borné, hors de la boucle d'événements.
+    Avec un `cache`, une image quasi identique à une précédente du même utilisateur
+    (empreinte perceptuelle) reprend son résultat sans nouvelle détection.
+    """
+
+    def __init__(self, workers: int = 2, work_width: int = 640, face_model: Optional[str] = None,
+                 cache: Optional[CameraResultCache] = None):
+        self.workers = workers
+        self.work_width = work_width
+        self.face_model = face_model
+        self.cache = cache
+        self.state = UNAVAILABLE
+        self.error: Optional[str] = None
+        self.detector = None
+        self.processed = 0
+        self.faces_found = 0
+        self.batches = 0
+        self._timings: Dict[str, deque] = {step: deque(maxlen=500) for step in ("decode", "detect", "analyze")}
+        self._detectors: queue.Queue = queue.Queue()
+        self._threads = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="camera")
+
+        if not CV2_AVAILABLE:
+            self.error = "opencv-python non installé"
+            print(f"⚠️  Pipeline caméra indisponible: {self.error}")
+            return
+        try:
+            for _ in range(workers):
+                self._detectors.put(FaceDetectors(face_model))
+        except Exception as e:
+            self.error = str(e)
+            print(f"⚠️  Pipeline caméra indisponible: {e}")
+            return
+        self.state = READY
+        self.detector = "yunet" if face_model else "haar"
+        print(f"✅ Pipeline caméra prêt ({workers} worker(s), détecteur {self.detector}, largeur {work_width}px)")
+
+    @classmethod
+    def from_env(cls) -> "CameraPipeline":
+        return cls(
+            workers=int(os.getenv("CAMERA_WORKERS", "2")),
+            work_width=int(os.getenv("CAMERA_WORK_WIDTH", "640")),
+            face_model=os.getenv("CAMERA_FACE_DNN_MODEL") or None,
+            cache=CameraResultCache.from_env()
+        )
+
+    @property
+    def ready(self) -> bool:
+        return self.state == READY
+
+    async def analyze(self, data: bytes, analyses: Iterable[str] = ANALYSES,
+                      user_id: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Décode, détecte une seule fois, puis exécute les analyses demandées.
+        `user_id` (avec son consentement) : résultats réutilisables pour ses images quasi identiques.
+        """
+        if not self.ready:
+            raise CameraUnavailableError(self.error or "Pipeline caméra indisponible")
+        if len(data) > MAX_IMAGE_BYTES:
+            raise ImageTooLargeError(f"Image trop volumineuse (max {MAX_IMAGE_BYTES} octets)")
+        analyses = tuple(analyses)
+        scope = None
+        if self.cache is not None and user_id is not None and await self.cache.allowed(user_id):
+            scope = (user_id, analyses)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._threads, self._run, data, analyses, scope)
+
+    def _run(self, data: bytes, analyses: Tuple[str, ...], scope=None) -> Dict[str, Any]:
+        start = time.perf_counter()
+        image, original_size = self.decode(data)
+        image_hash = None
+        if scope is not None:
+            image_hash = dhash(image)
+            cached = self.cache.get(scope, image_hash)
+            if cached is not None:
+                decoded_at = time.perf_counter()
+                return {
+                    **cached,
+                    "cached": True,
+                    "timings_ms": {"decode": round((decoded_at - start) * 1000, 2), "detect": 0.0, "analyze": 0.0},
+                }
+        decoded_at = time.perf_counter()
+        detections = self.detect(image, original_size)
+        detections.normalize()
+        detected_at = time.perf_counter()
+        results = run_analyses(detections, analyses)
+        done_at = time.perf_counter()
+
+        self.processed += 1
+        self.faces_found += detections.has_face
+        self._timings["decode"].append(decoded_at - start)
+        self._timings["detect"].append(detected_at - decoded_at)
+        self._timings["analyze"].append(done_at - detected_at)
+        results["face_detected"] = detections.has_face
+        results["timings_ms"] = {
+            "decode": round((decoded_at - start) * 1000, 2),
+            "detect": round((detected_at - decoded_at) * 1000, 2),
+            "analyze": round((done_at - detected_at) * 1000, 2),
+        }
+        if image_hash is not None:
+            self.cache.put(scope, image_hash, {name: value for name, value in results.items() if name != "timings_ms"})
+        results["cached"] = False
+        return results
+
+    async def analyze_batch(self, images: List[bytes], analyses: Iterable[str] = ANALYSES) -> List[Dict[str, Any]]:
+        """
+        Plusieurs images : décodage et détection en parallèle sur le pool de threads
+        (OpenCV libère le GIL), puis mesures et scores calculés d'un bloc sur les visages
+        empilés. Une image illisible ou trop lourde n'interrompt pas le lot : son entrée
+        ne contient que `error`.
+        """
+        if not self.ready:
+            raise CameraUnavailableError(self.error or "Pipeline caméra indisponible")
+        analyses = tuple(analyses)
+        loop = asyncio.get_running_loop()
+        prepared = await asyncio.gather(
+            *(loop.run_in_executor(self._threads, self._prepare, data) for data in images),
+            return_exceptions=True
+        )
+        for outcome in prepared:
+            if isinstance(outcome, Exception) and not isinstance(outcome, (ImageDecodingError, ImageTooLargeError)):
+                raise outcome
+        frames = [outcome for outcome in prepared if isinstance(outcome, FrameDetections)]
+        analyzed = iter(await loop.run_in_executor(self._threads, self._analyze_frames, frames, analyses))
+
+        self.batches += 1
+        results = []
+        for outcome in prepared:
+            if isinstance(outcome, FrameDetections):
+                result = next(analyzed)
+                result["face_detected"] = outcome.has_face
+            else:
+                result = {"error": str(outcome)}
+            results.append(result)
+        return results
+
+    def _prepare(self, data: bytes, track: Optional["FaceTrack"] = None) -> FrameDetections:
+        """Décodage, détection et normalisation du visage d'une image (dans un thread du pool)"""
+        if len(data) > MAX_IMAGE_BYTES:
+            raise ImageTooLargeError(f"Image trop volumineuse (max {MAX_IMAGE_BYTES} octets)")
+        image, original_size = self.decode(data)
+        detections = self.detect(image, original_size, track)
+        detections.normalize()
+        return detections
+
+    def _analyze_frames(self, frames: List[FrameDetections], analyses: Tuple[str, ...]) -> List[Dict[str, Any]]:
+        start = time.perf_counter()
+        results = analyze_batch_measures(measure_batch(frames), analyses)
+        self.processed += len(frames)
+        self.faces_found += sum(frame.has_face for frame in frames)
+        if frames:
+            self._timings["analyze"].append((time.perf_counter() - start) / len(frames))
+        return results
+
+    def decode(self, data: bytes) -> Tuple[np.ndarray, Tuple[int, int]]:
+        """Octets -> image BGR à la résolution de travail (et taille d'origine)"""
+        image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if image is None:
+            raise ImageDecodingError("Image illisible (formats acceptés : JPEG, PNG, WebP, BMP)")
+        height, width = image.shape[:2]
+        if width > self.work_width:
+            # INTER_AREA : la réduction la plus fidèle pour de la détection
+            scale = self.work_width / width
+            image = cv2.resize(image, (self.work_width, max(1, int(height * scale))), interpolation=cv2.INTER_AREA)
+        return image, (width, height)
+
+    def detect(self, image: np.ndarray, original_size: Tuple[int, int],
+               track: Optional["FaceTrack"] = None) -> FrameDetections:
+        """
+        Une passe : le plus grand visage (ou, en flux, le visage suivi depuis l'image
+        précédente), puis yeux et sourire dans ses sous-zones
+        """
+        gray = cv2.equalizeHist(cv2.cvtColor(image, cv2.COLOR_BGR2GRAY))
+        detections = FrameDetections(image, gray, original_size)
+        detectors = self._detectors.get()
+        try:
+            followed = track.follow(gray) if track is not None else None
+            if followed is not None:
+                detections.face, detections.face_score = followed, track.score
+            else:
+                faces = detectors.detect_faces(image, gray)
+                if not faces:
+                    if track is not None:
+                        track.lose()
+                    return detections
+                detections.face, detections.face_score = max(faces, key=lambda f: f[0][2] * f[0][3])
+                if track is not None:
+                    track.reset(gray, detections.face, detections.face_score)
+            x, y, w, h = detections.face
+
+            if detectors.eyes is not None:
+                upper = detections.region(detections.face_part(0.0, 0.15, 1.0, 0.6))
+                side = max(8, w // 10)
+                eyes = detectors.eyes.detectMultiScale(upper, scaleFactor=1.1, minNeighbors=5, minSize=(side, side))
+                eyes = sorted(eyes, key=lambda e: e[2] * e[3], reverse=True)[:2]
+                top = y + int(0.15 * h)
+                detections.eyes = sorted(
+                    [(x + int(ex), top + int(ey), int(ew), int(eh)) for ex, ey, ew, eh in eyes]
+                )
+                detections.eyes_detected = len(detections.eyes)
+
+            if detectors.smile is not None:
+                lower = detections.region(detections.face_part(0.15, 0.6, 0.85, 1.0))
+                smiles = detectors.smile.detectMultiScale(
+                    lower, scaleFactor=1.5, minNeighbors=15, minSize=(max(8, w // 5), max(4, h // 12))
+                )
+                if len(smiles):
+                    sx, sy, sw, sh = max(smiles, key=lambda s: s[2])
+                    left, top = detections.face_part(0.15, 0.6, 0.85, 1.0)[:2]
+                    detections.smile = (left + int(sx), top + int(sy), int(sw), int(sh))
+        finally:
+            self._detectors.put(detectors)
+        return detections
+
+    async def analyze_frame(self, data: bytes, track: "FaceTrack") -> Dict[str, Any]:
+        """Image d'un flux : mesures brutes du visage (à lisser par l'appelant)"""
+        if not self.ready:
+            raise CameraUnavailableError(self.error or "Pipeline caméra indisponible")
+        if len(data) > MAX_IMAGE_BYTES:
+            raise ImageTooLargeError(f"Image trop volumineuse (max {MAX_IMAGE_BYTES} octets)")
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._threads, self._run_frame, data, track)
+
+    def _run_frame(self, data: bytes, track: "FaceTrack") -> Dict[str, Any]:
+        start = time.perf_counter()
+        detections = self._prepare(data, track)
+        measures = face_measures(detections)
+        self.processed += 1
+        self.faces_found += detections.has_face
+        measures["latency_ms"] = round((time.perf_counter() - start) * 1000, 2)
+        return measures
+
+    def shutdown(self):
+        self._threads.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "detector": self.detector,
+            "workers": self.workers,
+            "work_width": self.work_width,
+            "processed": self.processed,
+            "faces_found": self.faces_found,
+            "batches": self.batches,
+            "cache": self.cache.stats() if self.cache is not None else None,
+            "avg_ms": {
+                step: round(sum(samples) / len(samples) * 1000, 2) if samples else 0.0
+                for step, samples in self._timings.items()
+            },
+            "error": self.error,
+        }
+
+
+class FaceTrack:
+    """
+    Suivi du visage d'un flux vidéo : entre deux détections complètes, le visage est
+    retrouvé par corrélation (matchTemplate) autour de sa position précédente.
+    Détection complète toutes les `redetect_every` images ou dès que le suivi décroche.
+    """
+
+    def __init__(self, redetect_every: int = 15, min_correlation: float = 0.5):
+        self.redetect_every = redetect_every
+        self.min_correlation = min_correlation
+        self.box: Optional[Box] = None
+        self.score = 0.0
+        self.since_detection = 0
+        self.detections = 0
+        self.followed = 0
+        self._template: Optional[np.ndarray] = None
+
+    def reset(self, gray: np.ndarray, box: Box, score: float):
+        x, y, w, h = box
+        self.box, self.score = box, score
+        self._template = gray[y:y + h, x:x + w].copy()
+        self.since_detection = 0
+        self.detections += 1
+
+    def lose(self):
+        self.box = None
+        self._template = None
+
+    def follow(self, gray: np.ndarray) -> Optional[Box]:
+        """Nouvelle position du visage, ou None (détection complète nécessaire)"""
+        if self.box is None or self.since_detection >= self.redetect_every:
+            return None
+        x, y, w, h = self.box
+        # Fenêtre de recherche : la boîte élargie de moitié de chaque côté
+        left, top = max(0, x - w // 2), max(0, y - h // 2)
+        right, bottom = min(gray.shape[1], x + w + w // 2), min(gray.shape[0], y + h + h // 2)
+        window = gray[top:bottom, left:right]
+        if window.shape[0] < h or window.shape[1] < w or self._template.shape != (h, w):
+            return None
+        _, correlation, _, (dx, dy) = cv2.minMaxLoc(cv2.matchTemplate(window, self._template, cv2.TM_CCOEFF_NORMED))
+        if correlation < self.min_correlation:
+            return None
+        self.box = (left + dx, top + dy, w, h)
+        self.since_detection += 1
+        self.followed += 1
+        return self.box
+
+
+# ----------------------------------------------------------------------
+# Analyses (heuristiques visuelles), calculées d'un bloc sur des visages empilés
+# ----------------------------------------------------------------------
+# Zones du visage en proportions (0-1) de sa boîte : gauche, haut, droite, bas
+CHEEKS = ((0.15, 0.55, 0.35, 0.7), (0.65, 0.55, 0.85, 0.7))
+FOREHEAD = (0.3, 0.08, 0.7, 0.25)
+
+FACE_MEASURES = (
+    "face_ratio", "face_score", "openness", "dark_circles", "redness", "tension",
+    "smile", "roll_degrees", "posture", "skin_uniformity"
+)
+EMOTION_NAMES = ("joy", "calm", "focus", "fatigue", "stress")
+
+
+def _part_mask(parts: Iterable[Tuple[float, float, float, float]], size: int = FACE_CROP_SIZE) -> np.ndarray:
+    """Masque (size, size) de zones du visage normalisé (mêmes arrondis que `face_part`)"""
+    mask = np.zeros((size, size), dtype=bool)
+    for left, top, right, bottom in parts:
+        x, y = int(left * size), int(top * size)
+        mask[y:y + max(1, int((bottom - top) * size)), x:x + max(1, int((right - left) * size))] = True
+    return mask
+
+
+CHEEK_MASK = _part_mask(CHEEKS)
+FOREHEAD_MASK = _part_mask([FOREHEAD])
+
+
+def _box_masks(boxes: np.ndarray, size: int = FACE_CROP_SIZE) -> np.ndarray:
+    """Boîtes (n, k, 4) en pixels du visage normalisé -> masques (n, size, size), union des k boîtes"""
+    grid = np.arange(size)
+    x0, y0 = boxes[..., 0], boxes[..., 1]
+    rows = (grid >= y0[..., None]) & (grid < (y0 + boxes[..., 3])[..., None])
+    cols = (grid >= x0[..., None]) & (grid < (x0 + boxes[..., 2])[..., None])
+    return (rows[..., :, None] & cols[..., None, :]).any(axis=1)
+
+
+def _masked_mean(values: np.ndarray, masks: np.ndarray) -> np.ndarray:
+    """Moyenne de chaque image (n, h, w) sous son masque ; NaN si masque vide"""
+    counts = masks.sum(axis=(1, 2))
+    sums = np.einsum("nhw,nhw->n", values, masks.astype(values.dtype))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(counts > 0, sums / counts, np.nan)
+
+
+def measure_batch(frames: List[FrameDetections]) -> List[Dict[str, Any]]:
+    """
+    Mesures de base (0-1) dont dérivent toutes les analyses, pour plusieurs images à la fois :
+    les visages normalisés sont empilés en un tenseur (n, 128, 128, 3) et chaque mesure
+    est une opération sur tout le tenseur.
+    """
+    rows: List[Dict[str, Any]] = [
+        {"face_detected": frame.has_face, "brightness": frame.brightness} for frame in frames
+    ]
+    faces = [frame for frame in frames if frame.has_face]
+    if not faces:
+        return rows
+    size = FACE_CROP_SIZE
+
+    crops = np.stack([frame.crop for frame in faces]).astype(np.float32)        # BGR, 0-255
+    gray = crops @ np.float32([0.114, 0.587, 0.299])                           # luminance
+    boxes = np.array([frame.face for frame in faces], dtype=np.float64)        # x, y, l, h
+    image_widths = np.array([frame.gray.shape[1] for frame in faces], dtype=np.float64)
+    eyes = np.array([frame.eye_boxes() for frame in faces], dtype=np.float64)  # (n, 2, 4)
+    two_eyes = np.array([len(frame.eyes) == 2 for frame in faces])
+
+    # Yeux dans le repère du visage normalisé
+    scale = size / boxes[:, None, 2:]
+    eyes_crop = np.concatenate([(eyes[..., :2] - boxes[:, None, :2]) * scale, eyes[..., 2:] * scale], axis=-1)
+    eye_masks = _box_masks(eyes_crop)
+
+    # Ouverture des yeux : yeux ouverts détectés par la cascade (inconnue sans cascade)
+    openness = np.array([
+        np.nan if frame.eyes_detected is None else min(frame.eyes_detected, 2) / 2 for frame in faces
+    ])
+
+    # Cernes : bande sous les yeux plus sombre que les joues
+    cheek_pixels = gray[:, CHEEK_MASK]
+    cheek_level = cheek_pixels.mean(axis=1)
+    under_eyes = eyes_crop.copy()
+    under_eyes[..., 1] += eyes_crop[..., 3]
+    under_eyes[..., 3] = np.maximum(2, eyes_crop[..., 3] / 3)
+    under_level = _masked_mean(gray, _box_masks(under_eyes))
+    under_level = np.where(np.isnan(under_level), cheek_level, under_level)
+    dark_circles = np.clip((cheek_level - under_level) / np.maximum(cheek_level, 1.0) * 4, 0, 1)
+
+    # Rougeur des yeux : excès de rouge sur le vert dans les zones oculaires
+    eye_counts = eye_masks.sum(axis=(1, 2))
+    eye_colors = np.einsum("nhwc,nhw->nc", crops, eye_masks.astype(np.float32)) / np.maximum(eye_counts, 1)[:, None]
+    green, red = eye_colors[:, 1], eye_colors[:, 2]
+    redness = np.where(eye_counts > 0, np.clip((red / np.maximum(green, 1.0) - 1.25) / 0.5, 0, 1), 0.0)
+
+    # Tension : texture (rides) du front comparée à celle des joues (laplacien sur tout le lot)
+    laplacian = (gray[:, :-2, 1:-1] + gray[:, 2:, 1:-1] + gray[:, 1:-1, :-2] + gray[:, 1:-1, 2:]
+                 - 4 * gray[:, 1:-1, 1:-1])
+    forehead_var = laplacian[:, FOREHEAD_MASK[1:-1, 1:-1]].var(axis=1)
+    cheek_var = laplacian[:, CHEEK_MASK[1:-1, 1:-1]].var(axis=1)
+    tension = np.clip((forehead_var / np.maximum(cheek_var, 1e-6) - 1.0) / 3.0, 0, 1)
+
+    # Sourire : largeur détectée rapportée à la largeur du visage
+    smile_widths = np.array([frame.smile[2] if frame.smile is not None else 0 for frame in faces])
+    smile = np.clip(smile_widths / (0.45 * boxes[:, 2]), 0, 1)
+
+    # Posture : inclinaison de la tête (axe des yeux), centrage et distance à la caméra
+    centers = eyes[..., :2] + eyes[..., 2:] / 2
+    delta = centers[:, 1] - centers[:, 0]
+    roll = np.where(two_eyes, np.degrees(np.arctan2(delta[:, 1], delta[:, 0])), 0.0)
+    offset = np.abs(boxes[:, 0] + boxes[:, 2] / 2 - image_widths / 2) / (image_widths / 2)
+    face_ratio = boxes[:, 2] / image_widths
+    distance_penalty = np.clip((0.15 - face_ratio) / 0.15, 0, 1) + np.clip((face_ratio - 0.6) / 0.4, 0, 1)
+    posture = np.clip(1.0 - 0.4 * np.clip(np.abs(roll) / 20, 0, 1) - 0.3 * offset - 0.3 * distance_penalty, 0, 1)
+
+    # Uniformité de la peau (joues) : variation relative de luminance
+    uniformity = np.clip(1.0 - (cheek_pixels.std(axis=1) / np.maximum(cheek_level, 1.0)) / 0.25, 0, 1)
+
+    face_rows = [row for row in rows if row["face_detected"]]
+    for i, (row, frame) in enumerate(zip(face_rows, faces)):
+        row.update({
+            "face_box": [int(v) for v in frame.face],
+            "face_score": round(frame.face_score, 3),
+            "face_ratio": float(face_ratio[i]),
+            "openness": None if np.isnan(openness[i]) else float(openness[i]),
+            "dark_circles": float(dark_circles[i]),
+            "redness": float(redness[i]),
+            "tension": float(tension[i]),
+            "smile": float(smile[i]),
+            "roll_degrees": float(roll[i]),
+            "posture": float(posture[i]),
+            "skin_uniformity": float(uniformity[i]),
+        })
+    return rows
+
+
+def face_measures(detections: FrameDetections) -> Dict[str, Any]:
+    """Mesures d'une seule image"""
+    if detections.crop is None and detections.has_face:
+        detections.normalize()
+    return measure_batch([detections])[0]
+
+
+def score_batch(rows: List[Dict[str, Any]]) -> Dict[str, np.ndarray]:
+    """Scores (fatigue, émotions, hydratation...) de toutes les lignes de mesures en opérations vectorisées"""
+    def column(name: str) -> np.ndarray:
+        return np.array([np.nan if row.get(name) is None else row[name] for row in rows], dtype=np.float64)
+
+    openness, dark_circles, redness = column("openness"), column("dark_circles"), column("redness")
+    tension, smile, roll = column("tension"), column("smile"), column("roll_degrees")
+    known = ~np.isnan(openness)
+    fatigue = np.clip(np.where(
+        known,
+        0.5 * (1 - openness) + 0.3 * dark_circles + 0.2 * redness,
+        0.6 * dark_circles + 0.4 * redness
+    ), 0, 1)
+    emotions = np.round(np.stack([
+        np.clip(0.15 + 0.8 * smile, 0, 1),
+        np.clip(1.0 - 0.7 * tension - 0.3 * fatigue, 0, 1),
+        np.clip(np.where(known, openness, 0.5) * (1 - np.clip(np.abs(roll) / 30, 0, 1)), 0, 1),
+        fatigue,
+        tension,
+    ], axis=1), 2)
+    fatigue_score = np.round(fatigue, 2)
+    # Fiabilité : visage assez grand, image assez éclairée
+    confidence = np.clip(
+        0.3 + 0.7 * np.clip(column("face_ratio") / 0.3, 0, 1) * np.clip(column("brightness") / 0.3, 0, 1), 0, 1
+    ) * column("face_score")
+    return {
+        "fatigue": fatigue_score,
+        "emotions": emotions,
+        "dominant": emotions.argmax(axis=1),
+        "confidence": np.round(confidence, 2),
+        # Indicateur visuel indirect : teint uniforme et absence de cernes
+        "hydration": np.round(np.clip(0.5 * column("skin_uniformity") + 0.5 * (1 - dark_circles), 0, 1), 2),
+        "vitality": np.round(np.clip(1 - 0.6 * fatigue_score - 0.4 * tension, 0, 1), 2),
+    }
+
+
+def run_analyses(detections: FrameDetections, analyses: Iterable[str]) -> Dict[str, Any]:
+    """Chaque mesure n'est calculée qu'une fois, même si plusieurs analyses s'en servent"""
+    return analyze_measures(face_measures(detections), analyses)
+
+
+def analyze_measures(measures: Dict[str, Any], analyses: Iterable[str]) -> Dict[str, Any]:
+    """Analyses à partir de mesures (éventuellement lissées dans le temps)"""
+    return analyze_batch_measures([measures], analyses)[0]
+
+
+def analyze_batch_measures(rows: List[Dict[str, Any]], analyses: Iterable[str]) -> List[Dict[str, Any]]:
+    """Analyses de plusieurs lignes de mesures ; les scores sont calculés une fois pour tout le lot"""
+    analyses = tuple(analyses)
+    for name in analyses:
+        if name not in ANALYSES:
+            raise ValueError(f"Analyse inconnue: {name}")
+    scores = score_batch(rows)
+    builders = {EMOTIONS: _emotions, FATIGUE: _fatigue, ADVANCED: _advanced}
+    return [
+        {name: builders[name](row, scores, i) for name in analyses}
+        for i, row in enumerate(rows)
+    ]
+
+
+def _emotions(measures: Dict[str, Any], scores: Dict[str, np.ndarray], i: int) -> Dict[str, Any]:
+    if not measures["face_detected"]:
+        return {"dominant": "unknown", "breakdown": {}, "confidence": 0.0}
+    return {
+        "dominant": EMOTION_NAMES[int(scores["dominant"][i])],
+        "breakdown": dict(zip(EMOTION_NAMES, scores["emotions"][i].tolist())),
+        "confidence": float(scores["confidence"][i]),
+    }
+
+
+def _fatigue(measures: Dict[str, Any], scores: Dict[str, np.ndarray], i: int) -> Dict[str, Any]:
+    if not measures["face_detected"]:
+        return {
+            "score": 0.0,
+            "indicators": ["visage_non_detecte"],
+            "recommendations": ["Placez votre visage face à la caméra, dans un endroit bien éclairé"]
+        }
+    indicators, recommendations = [], []
+    if measures["openness"] is not None and measures["openness"] < 0.75:
+        indicators.append("yeux_mi_clos")
+        recommendations.append("Faites une pause écran de quelques minutes")
+    if measures["dark_circles"] > 0.4:
+        indicators.append("cernes")
+        recommendations.append("Visez 7 à 9 heures de sommeil régulier")
+    if measures["redness"] > 0.4:
+        indicators.append("yeux_rouges")
+        recommendations.append("Reposez vos yeux (règle 20-20-20)")
+    if not indicators:
+        indicators.append("yeux_clairs")
+        recommendations.append("Continuez à préserver votre sommeil et vos pauses")
+    return {"score": float(scores["fatigue"][i]), "indicators": indicators, "recommendations": recommendations}
+
+
+def _advanced(measures: Dict[str, Any], scores: Dict[str, np.ndarray], i: int) -> Dict[str, Any]:
+    fatigue = _fatigue(measures, scores, i)
+    recommendations = list(fatigue["recommendations"])
+    if measures["brightness"] < 0.25:
+        recommendations.append("Éclairage insuffisant : l'analyse sera plus fiable face à une fenêtre 💡")
+    if not measures["face_detected"]:
+        return {
+            "emotions": {},
+            "fatigue_score": 0.0,
+            "posture_quality": 0.0,
+            "hydration_level": 0.0,
+            "health_metrics": {"face_detected": False, "brightness": round(measures["brightness"], 2)},
+            "recommendations": recommendations
+        }
+    if measures["posture"] < 0.6:
+        recommendations.append("Redressez-vous et centrez l'écran à hauteur des yeux 🪑")
+    hydration = float(scores["hydration"][i])
+    if hydration < 0.5:
+        recommendations.append("Pensez à boire régulièrement dans la journée 💧")
+    return {
+        "emotions": _emotions(measures, scores, i)["breakdown"],
+        "fatigue_score": fatigue["score"],
+        "posture_quality": round(measures["posture"], 2),
+        "hydration_level": hydration,
+        "health_metrics": {
+            "face_detected": True,
+            "face_box": measures["face_box"],
+            "head_roll_degrees": round(measures["roll_degrees"], 1),
+            "skin_health": round(measures["skin_uniformity"], 2),
+            "vitality_index": float(scores["vitality"][i]),
+            "brightness": round(measures["brightness"], 2),
+            "confidence": float(scores["confidence"][i]),
+        },
+        "recommendations": recommendations
+    }
@@ -0,0 +1,138 @@
+# app/services/camera_streaming.py
+import asyncio
+from typing import Dict, Any, Optional
+
+from app.services.camera_pipeline import (
+    CameraPipeline, FaceTrack, ImageDecodingError, ImageTooLargeError, analyze_measures,
+    EMOTIONS, FATIGUE, ADVANCED
+)
+
+# Mesures lissées dans le temps (les autres sont reprises telles quelles)
+SMOOTHED_MEASURES = (
+    "openness", "dark_circles", "redness", "tension", "smile",
+    "roll_degrees", "posture", "skin_uniformity", "brightness", "face_ratio"
+)
+
+
+class CameraStreamSession:
+    """
+    Session d'analyse caméra en continu (une par connexion WebSocket).
+
+    - une seule image analysée à la fois : si l'analyse prend du retard, seules les
+      images les plus récentes sont gardées (les autres sont ignorées)
+    - le visage est suivi d'une image à l'autre (re-détection périodique)
+    - les mesures sont lissées par moyenne mobile exponentielle (`alpha`)
+    - un résultat n'est envoyé que s'il change de façon notable (`min_change`)
+    """
+
+    def __init__(self, pipeline: CameraPipeline, send, alpha: float = 0.3, min_change: float = 0.05,
+                 redetect_every: int = 15):
+        self.pipeline = pipeline
+        self.send = send
+        self.alpha = alpha
+        self.min_change = min_change
+        self.track = FaceTrack(redetect_every=redetect_every)
+        self.received = 0
+        self.analyzed = 0
+        self.dropped = 0
+        self.pushed = 0
+        self._latest: Optional[bytes] = None
+        self._closing = False
+        self._wakeup = asyncio.Event()
+        self._smoothed: Dict[str, float] = {}
+        self._last_pushed: Optional[Dict[str, Any]] = None
+        self._worker = asyncio.ensure_future(self._analyze_frames())
+
+    def feed(self, data: bytes):
+        """Image encodée du client ; remplace celle en attente si elle n'a pas encore été analysée"""
+        self.received += 1
+        if self._latest is not None:
+            self.dropped += 1
+        self._latest = data
+        self._wakeup.set()
+
+    async def finish(self):
+        """Fin du flux : analyse l'image en attente puis s'arrête"""
+        self._closing = True
+        self._wakeup.set()
+        await self._worker
+
+    async def aclose(self):
+        if not self._worker.done():
+            self._worker.cancel()
+
+    async def _analyze_frames(self):
+        while True:
+            if self._latest is None:
+                # Plus rien en attente : fin du flux ou prochaine image
+                if self._closing:
+                    return
+                await self._wakeup.wait()
+                self._wakeup.clear()
+                continue
+            data, self._latest = self._latest, None
+            try:
+                measures = await self.pipeline.analyze_frame(data, self.track)
+            except (ImageDecodingError, ImageTooLargeError) as e:
+                await self.send({"event": "error", "frame": self.received, "detail": str(e)})
+                continue
+            self.analyzed += 1
+            payload = self._summarize(self._smooth(measures))
+            payload["latency_ms"] = measures["latency_ms"]
+            if self._changed(payload):
+                self._last_pushed = payload
+                self.pushed += 1
+                await self.send({"event": "analysis", "frame": self.received, **payload, **self.stats()})
+
+    def _smooth(self, measures: Dict[str, Any]) -> Dict[str, Any]:
+        if not measures["face_detected"]:
+            # Visage perdu : le lissage repart de zéro au prochain visage
+            self._smoothed = {}
+            return measures
+        smoothed = dict(measures)
+        for name in SMOOTHED_MEASURES:
+            value = measures.get(name)
+            if value is None:
+                continue
+            previous = self._smoothed.get(name)
+            self._smoothed[name] = value if previous is None else previous + self.alpha * (value - previous)
+            smoothed[name] = self._smoothed[name]
+        return smoothed
+
+    @staticmethod
+    def _summarize(measures: Dict[str, Any]) -> Dict[str, Any]:
+        results = analyze_measures(measures, (EMOTIONS, FATIGUE, ADVANCED))
+        return {
+            "face_detected": measures["face_detected"],
+            "dominant_emotion": results[EMOTIONS]["dominant"],
+            "emotions": results[EMOTIONS]["breakdown"],
+            "fatigue_score": results[FATIGUE]["score"],
+            "indicators": results[FATIGUE]["indicators"],
+            "posture_quality": results[ADVANCED]["posture_quality"],
+            "hydration_level": results[ADVANCED]["hydration_level"],
+            "recommendations": results[ADVANCED]["recommendations"],
+        }
+
+    def _changed(self, payload: Dict[str, Any]) -> bool:
+        last = self._last_pushed
+        if last is None:
+            return True
+        for key in ("face_detected", "dominant_emotion", "indicators"):
+            if payload[key] != last[key]:
+                return True
+        for key in ("fatigue_score", "posture_quality", "hydration_level"):
+            if abs(payload[key] - last[key]) >= self.min_change:
+                return True
+        return any(
+            abs(value - last["emotions"].get(name, 0.0)) >= self.min_change
+            for name, value in payload["emotions"].items()
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "received_frames": self.received,
+            "analyzed_frames": self.analyzed,
+            "dropped_frames": self.dropped,
+            "full_detections": self.track.detections,
+            "tracked_frames": self.track.followed,
+        }
@@ -0,0 +1,204 @@
+# app/services/circuit_breaker.py
+import threading
+import time
+from collections import deque
+from typing import Dict, Any, Optional
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Le disjoncteur est ouvert : l'appel amont n'est pas tenté"""
+
+
+class CircuitBreaker:
+    """
+    Disjoncteur sur fenêtre glissante.
+
+    - closed    : les appels passent ; s'ouvre si le taux d'erreurs ou d'appels
+                  lents dépasse son seuil (avec un minimum d'appels dans la fenêtre)
+    - open      : les appels sont refusés immédiatement pendant `open_seconds`
+    - half_open : quelques appels de test ; un succès referme, un échec rouvre
+    """
+
+    def __init__(
+        self,
+        window_seconds: float = 30.0,
+        min_requests: int = 10,
+        error_rate_threshold: float = 0.5,
+        slow_call_seconds: float = 5.0,
+        slow_call_rate_threshold: float = 0.5,
+        open_seconds: float = 15.0,
+        half_open_max_calls: int = 1,
+        latency_samples: int = 500,
+    ):
+        self.window_seconds = window_seconds
+        self.min_requests = min_requests
+        self.error_rate_threshold = error_rate_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate_threshold = slow_call_rate_threshold
+        self.open_seconds = open_seconds
+        self.half_open_max_calls = half_open_max_calls
+
+        self.state = CLOSED
+        self._opened_at = 0.0
+        self._half_open_since = 0.0
+        self._half_open_in_flight = 0
+        self._outcomes: deque = deque()  # (horodatage, succès, lent)
+        self._latencies: deque = deque(maxlen=latency_samples)
+        self._lock = threading.Lock()
+
+        self.transitions: Dict[str, int] = {}
+        self.rejected = 0
+
+    # ------------------------------------------------------------------
+    # API
+    # ------------------------------------------------------------------
+    def allow_request(self) -> bool:
+        with self._lock:
+            if self.state == OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+                self._transition(HALF_OPEN)
+            if self.state == OPEN:
+                self.rejected += 1
+                return False
+            if self.state == HALF_OPEN:
+                # Appel de test jamais conclu (client parti) : on en autorise un nouveau
+                if time.monotonic() - self._half_open_since >= self.open_seconds:
+                    self._half_open_in_flight = 0
+                    self._half_open_since = time.monotonic()
+                if self._half_open_in_flight >= self.half_open_max_calls:
+                    self.rejected += 1
+                    return False
+                self._half_open_in_flight += 1
+            return True
+
+    def record_success(self, latency: float):
+        with self._lock:
+            self._latencies.append(latency)
+            slow = latency >= self.slow_call_seconds
+            if self.state == HALF_OPEN:
+                self._half_open_in_flight = max(0, self._half_open_in_flight - 1)
+                self._transition(OPEN if slow else CLOSED)
+                return
+            self._record(True, slow)
+
+    def record_failure(self, latency: float):
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._half_open_in_flight = max(0, self._half_open_in_flight - 1)
+                self._transition(OPEN)
+                return
+            self._record(False, latency >= self.slow_call_seconds)
+
+    def latency_percentile(self, q: float) -> Optional[float]:
+        """Percentile des latences des appels réussis récents (None si aucun)"""
+        with self._lock:
+            if not self._latencies:
+                return None
+            ordered = sorted(self._latencies)
+        index = min(len(ordered) - 1, int(q * len(ordered)))
+        return ordered[index]
+
+    def sample_count(self) -> int:
+        return len(self._latencies)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._prune(time.monotonic())
+            total = len(self._outcomes)
+            errors = sum(1 for _, ok, _ in self._outcomes if not ok)
+            slow = sum(1 for _, _, is_slow in self._outcomes if is_slow)
+            state = self.state
+            transitions = dict(self.transitions)
+        return {
+            "state": state,
+            "transitions": transitions,
+            "rejected": self.rejected,
+            "window_requests": total,
+            "window_error_rate": round(errors / total, 4) if total else 0.0,
+            "window_slow_rate": round(slow / total, 4) if total else 0.0,
+            "latency_p50": self.latency_percentile(0.50),
+            "latency_p95": self.latency_percentile(0.95),
+            "latency_p99": self.latency_percentile(0.99),
+        }
+
+    # ------------------------------------------------------------------
+    # Interne (appelé sous verrou)
+    # ------------------------------------------------------------------
+    def _record(self, ok: bool, slow: bool):
+        now = time.monotonic()
+        self._outcomes.append((now, ok, slow))
+        self._prune(now)
+        total = len(self._outcomes)
+        if self.state != CLOSED or total < self.min_requests:
+            return
+        error_rate = sum(1 for _, success, _ in self._outcomes if not success) / total
+        slow_rate = sum(1 for _, _, is_slow in self._outcomes if is_slow) / total
+        if error_rate >= self.error_rate_threshold or slow_rate >= self.slow_call_rate_threshold:
+            self._transition(OPEN)
+
+    def _prune(self, now: float):
+        deadline = now - self.window_seconds
+        while self._outcomes and self._outcomes[0][0] < deadline:
+            self._outcomes.popleft()
+
+    def _transition(self, state: str):
+        if state == self.state:
+            return
+        key = f"{self.state}->{state}"
+        self.transitions[key] = self.transitions.get(key, 0) + 1
+        print(f"⚡ Disjoncteur LLM: {key}")
+        self.state = state
+        if state == OPEN:
+            self._opened_at = time.monotonic()
+        if state == HALF_OPEN:
+            self._half_open_since = time.monotonic()
+        if state != HALF_OPEN:
+            self._half_open_in_flight = 0
+        if state == CLOSED:
+            self._outcomes.clear()
+
+
+class RetryBudget:
+    """
+    Budget de nouvelles tentatives : chaque requête dépose `ratio` jeton,
+    chaque retry (ou requête doublée) en consomme un. Un petit débit minimal
+    garantit quelques retries même à faible trafic.
+    """
+
+    def __init__(self, ratio: float = 0.1, min_per_second: float = 1.0, max_tokens: float = 20.0):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.max_tokens = max_tokens
+        self._tokens = max_tokens
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+        self.granted = 0
+        self.denied = 0
+
+    def deposit(self):
+        with self._lock:
+            self._refill()
+            self._tokens = min(self.max_tokens, self._tokens + self.ratio)
+
+    def try_withdraw(self) -> bool:
+        with self._lock:
+            self._refill()
+            if self._tokens >= 1.0:
+                self._tokens -= 1.0
+                self.granted += 1
+                return True
+            self.denied += 1
+            return False
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.max_tokens, self._tokens + (now - self._last_refill) * self.min_per_second)
+        self._last_refill = now
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._refill()
+            return {"tokens": round(self._tokens, 2), "granted": self.granted, "denied": self.denied}
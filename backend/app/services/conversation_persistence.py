@@ -0,0 +1,307 @@
+# app/services/conversation_persistence.py
+import asyncio
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Any, List, Tuple, Optional
+
+from sqlalchemy import func
+from sqlalchemy.exc import DataError, IntegrityError
+
+from app.core.database import Base, SessionLocal, engine
+from app.models.user import User
+from app.models.chat_session import ChatSession, Message
+
+
+class ConversationPersistence:
+    """
+    Écriture différée (write-behind) des tours de conversation dans les tables
+    chat_sessions / messages.
+
+    Les messages sont mis en tampon en mémoire puis insérés par lots, dans un
+    thread, toutes les `flush_every` entrées ou toutes les `flush_interval_ms` :
+    la requête de chat ne paie jamais un commit synchrone.
+
+    Un lot refusé `max_batch_retries` fois de suite est réécrit ligne par ligne :
+    les lignes que la base rejette (utilisateur supprimé, message invalide) sont
+    écartées et journalisées au lieu de bloquer toute la persistance.
+    """
+
+    def __init__(self, session_factory=SessionLocal, flush_every: int = 50,
+                 flush_interval_ms: float = 500.0, max_buffer: int = 10_000,
+                 max_batch_retries: int = 3):
+        self.session_factory = session_factory
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.max_buffer = max_buffer
+        self.max_batch_retries = max_batch_retries
+        self._failed_attempts = 0   # échecs consécutifs du lot en tête de tampon
+
+        self._buffer: List[Tuple[int, str, str, datetime]] = []
+        self._flush_requested: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._write_lock = asyncio.Lock()
+        self._session_ids: Dict[int, int] = {}
+        self._session_lock = threading.Lock()
+        self._written: Dict[int, int] = {}   # messages écrits par ce processus, par utilisateur
+
+        self.flushes = 0
+        self.flushed_messages = 0
+        self.dropped_messages = 0
+        self.rejected_messages = 0
+        self.errors = 0
+        self.db_loads = 0
+        self.last_flush_ms = 0.0
+
+    async def start(self):
+        """Crée les tables de conversation (et `users`, référencée) si elles n'existent pas encore"""
+        await asyncio.to_thread(
+            Base.metadata.create_all, bind=self.session_factory.kw.get("bind") or engine,
+            tables=[User.__table__, ChatSession.__table__, Message.__table__]
+        )
+
+    # ------------------------------------------------------------------
+    # Écriture
+    # ------------------------------------------------------------------
+    def enqueue(self, user_id: int, messages: List[Dict]):
+        """Met des messages en tampon (non bloquant)"""
+        self._ensure_started()
+        now = datetime.utcnow()
+        for message in messages:
+            self._buffer.append((user_id, message.get("role", "user"), message.get("message") or "", now))
+
+        overflow = len(self._buffer) - self.max_buffer
+        if overflow > 0:
+            # Base indisponible depuis trop longtemps : on sacrifie les plus anciens
+            del self._buffer[:overflow]
+            self.dropped_messages += overflow
+        if len(self._buffer) >= self.flush_every:
+            self._flush_requested.set()
+
+    async def flush(self):
+        """Écrit immédiatement le contenu du tampon"""
+        async with self._write_lock:
+            if not self._buffer:
+                return
+            batch, self._buffer = self._buffer, []
+            start = time.perf_counter()
+            if self._failed_attempts >= self.max_batch_retries:
+                await self._flush_rows(batch, start)
+                return
+            try:
+                await asyncio.to_thread(self._write_batch, batch)
+            except Exception as e:
+                # On remet le lot en tête du tampon : il sera retenté au prochain flush
+                # (session éventuellement supprimée par un autre worker : on oublie le cache)
+                self.errors += 1
+                self._failed_attempts += 1
+                self._buffer = batch + self._buffer
+                with self._session_lock:
+                    self._session_ids.clear()
+                print(f"❌ Erreur écriture conversations (tentative {self._failed_attempts}"
+                      f"/{self.max_batch_retries}): {e}")
+                return
+            self._failed_attempts = 0
+            for user_id, *_ in batch:
+                self._written[user_id] = self._written.get(user_id, 0) + 1
+            self.flushes += 1
+            self.flushed_messages += len(batch)
+            self.last_flush_ms = round((time.perf_counter() - start) * 1000, 2)
+
+    async def _flush_rows(self, batch: List[Tuple[int, str, str, datetime]], start: float):
+        """Lot refusé à répétition : écriture ligne par ligne, lignes rejetées écartées"""
+        try:
+            written, rejected, remaining = await asyncio.to_thread(self._write_rows, batch)
+        except Exception as e:
+            written, rejected, remaining = [], [], batch
+            print(f"❌ Erreur écriture conversations: {e}")
+        for user_id, *_ in written:
+            self._written[user_id] = self._written.get(user_id, 0) + 1
+        for (user_id, role, _, _), error in rejected:
+            print(f"⚠️  Message {role} de l'utilisateur {user_id} rejeté par la base, abandonné: {error}")
+        self.rejected_messages += len(rejected)
+        self.flushed_messages += len(written)
+        if remaining:
+            # Base indisponible (et non ligne invalide) : le reste sera retenté
+            self.errors += 1
+            self._buffer = remaining + self._buffer
+            return
+        self._failed_attempts = 0
+        self.flushes += 1
+        self.last_flush_ms = round((time.perf_counter() - start) * 1000, 2)
+
+    def _write_batch(self, batch: List[Tuple[int, str, str, datetime]]):
+        db = self.session_factory()
+        try:
+            db.bulk_insert_mappings(Message, self._rows(db, batch))
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _write_rows(self, batch: List[Tuple[int, str, str, datetime]]):
+        """
+        Un commit par message. Renvoie (messages écrits, [(message, erreur)] rejetés par
+        la base, messages non tentés) : une erreur autre qu'une contrainte ou une donnée
+        invalide (connexion perdue...) interrompt l'écriture.
+        """
+        written, rejected = [], []
+        db = self.session_factory()
+        try:
+            for position, item in enumerate(batch):
+                try:
+                    db.bulk_insert_mappings(Message, self._rows(db, [item]))
+                    db.commit()
+                    written.append(item)
+                except (IntegrityError, DataError) as e:
+                    db.rollback()
+                    with self._session_lock:
+                        self._session_ids.pop(item[0], None)
+                    rejected.append((item, e))
+                except Exception:
+                    db.rollback()
+                    with self._session_lock:
+                        self._session_ids.clear()
+                    return written, rejected, batch[position:]
+        finally:
+            db.close()
+        return written, rejected, []
+
+    def _rows(self, db, batch: List[Tuple[int, str, str, datetime]]) -> List[Dict[str, Any]]:
+        return [
+            {"session_id": self._session_id(db, user_id), "role": role, "content": content, "timestamp": timestamp}
+            for user_id, role, content, timestamp in batch
+        ]
+
+    def _session_id(self, db, user_id: int) -> int:
+        """Session de chat courante de l'utilisateur (créée au premier message)"""
+        with self._session_lock:
+            session_id = self._session_ids.get(user_id)
+        if session_id is not None:
+            return session_id
+
+        session = (
+            db.query(ChatSession)
+            .filter(ChatSession.user_id == user_id)
+            .order_by(ChatSession.id.desc())
+            .first()
+        )
+        if session is None:
+            session = ChatSession(user_id=user_id)
+            db.add(session)
+            db.flush()
+        with self._session_lock:
+            self._session_ids[user_id] = session.id
+        return session.id
+
+    # ------------------------------------------------------------------
+    # Lecture / effacement
+    # ------------------------------------------------------------------
+    async def load_history(self, user_id: int, limit: int) -> List[Dict]:
+        """Derniers messages persistés, complétés par ceux encore en tampon"""
+        self.db_loads += 1
+        rows = await asyncio.to_thread(self._read_history, user_id, limit)
+        pending = [{"role": role, "message": content} for uid, role, content, _ in self._buffer if uid == user_id]
+        return (rows + pending)[-limit:]
+
+    async def external_version(self, user_id: int) -> int:
+        """
+        Messages persistés de l'utilisateur moins ceux écrits par ce processus : la valeur
+        change dès qu'un autre worker écrit (ou efface) des tours de cette conversation.
+        """
+        written = self._written.get(user_id, 0)
+        return await asyncio.to_thread(self._count_history, user_id) - written
+
+    def _count_history(self, user_id: int) -> int:
+        db = self.session_factory()
+        try:
+            return (
+                db.query(func.count(Message.id))
+                .join(ChatSession, Message.session_id == ChatSession.id)
+                .filter(ChatSession.user_id == user_id)
+                .scalar()
+            )
+        finally:
+            db.close()
+
+    def _read_history(self, user_id: int, limit: int) -> List[Dict]:
+        db = self.session_factory()
+        try:
+            messages = (
+                db.query(Message.role, Message.content)
+                .join(ChatSession, Message.session_id == ChatSession.id)
+                .filter(ChatSession.user_id == user_id)
+                .order_by(Message.id.desc())
+                .limit(limit)
+                .all()
+            )
+            return [{"role": role, "message": content} for role, content in reversed(messages)]
+        finally:
+            db.close()
+
+    async def clear(self, user_id: int):
+        """Supprime l'historique persisté (et en attente) d'un utilisateur"""
+        async with self._write_lock:
+            self._buffer = [item for item in self._buffer if item[0] != user_id]
+            self._written.pop(user_id, None)
+            await asyncio.to_thread(self._delete_history, user_id)
+
+    def _delete_history(self, user_id: int):
+        db = self.session_factory()
+        try:
+            session_ids = [row.id for row in db.query(ChatSession.id).filter(ChatSession.user_id == user_id)]
+            if session_ids:
+                db.query(Message).filter(Message.session_id.in_(session_ids)).delete(synchronize_session=False)
+                db.query(ChatSession).filter(ChatSession.id.in_(session_ids)).delete(synchronize_session=False)
+            db.commit()
+            with self._session_lock:
+                self._session_ids.pop(user_id, None)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    # ------------------------------------------------------------------
+    # Cycle de vie
+    # ------------------------------------------------------------------
+    def _ensure_started(self):
+        if self._task is None:
+            self._flush_requested = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_requested.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_requested.clear()
+            await self.flush()
+
+    async def aclose(self):
+        """Arrête la tâche de fond et écrit ce qui reste en tampon"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "buffered": len(self._buffer),
+            "flush_every": self.flush_every,
+            "flush_interval_ms": round(self.flush_interval * 1000),
+            "flushes": self.flushes,
+            "flushed_messages": self.flushed_messages,
+            "dropped_messages": self.dropped_messages,
+            "rejected_messages": self.rejected_messages,
+            "errors": self.errors,
+            "db_loads": self.db_loads,
+            "last_flush_ms": self.last_flush_ms,
+        }
@@ -0,0 +1,235 @@
+# app/services/conversation_store.py
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional
+
+# Surcoût approximatif d'un message en mémoire (dict + chaînes Python)
+MESSAGE_OVERHEAD_BYTES = 120
+
+
+class ConversationStore:
+    """
+    Mémoire de conversation bornée, partagée par tout le processus.
+
+    - LRU : les utilisateurs les moins récemment actifs sont évincés en premier
+    - TTL : une conversation inactive depuis `ttl_seconds` expire
+    - Plafond global (nombre d'utilisateurs et octets approximatifs)
+    - Plafond de messages par utilisateur
+    """
+
+    def __init__(
+        self,
+        max_users: int = 100_000,
+        max_messages_per_user: int = 20,
+        max_total_bytes: int = 256 * 1024 * 1024,
+        ttl_seconds: float = 3600.0,
+    ):
+        self.max_users = max_users
+        self.max_messages_per_user = max_messages_per_user
+        self.max_total_bytes = max_total_bytes
+        self.ttl_seconds = ttl_seconds
+
+        self._entries: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.RLock()
+        self._counters = {
+            "evicted_lru": 0,
+            "evicted_ttl": 0,
+            "evicted_memory": 0,
+            "trimmed_messages": 0,
+        }
+
+    # ------------------------------------------------------------------
+    # Accès
+    # ------------------------------------------------------------------
+    def get(self, user_id: int) -> Optional[Dict[str, Any]]:
+        """Retourne l'entrée d'un utilisateur (ou None) et la marque comme récente"""
+        with self._lock:
+            self._expire()
+            entry = self._entries.get(user_id)
+            if entry is not None:
+                self._touch(user_id, entry)
+            return entry
+
+    def get_or_create(self, user_id: int) -> Dict[str, Any]:
+        """Retourne l'entrée d'un utilisateur, en la créant si besoin"""
+        with self._lock:
+            entry = self.get(user_id)
+            if entry is None:
+                entry = {
+                    "conversation_history": [],
+                    "user_profile": {},
+                    "conversation_summary": "",
+                    "last_intent": None,
+                    "last_access": time.monotonic(),
+                    "synced_at": 0.0,   # dernière confrontation à l'historique persisté
+                    "version": None,                    "size": 0,
+                }
+                self._entries[user_id] = entry
+                self._enforce_limits()
+            return entry
+
+    def hydrate(self, user_id: int, messages: List[Dict]) -> Dict[str, Any]:
+        """
+        Crée l'entrée d'un utilisateur à partir d'un historique persisté.
+        Sans effet si l'entrée existe déjà (une requête concurrente l'a chargée).
+        """
+        with self._lock:
+            entry = self.get(user_id)
+            if entry is not None:
+                return entry
+            entry = self.get_or_create(user_id)
+            history = list(messages[-self.max_messages_per_user:]) if self.max_messages_per_user > 0 else []
+            entry["conversation_history"] = history
+            added = sum(self._message_size(m) for m in history)
+            entry["size"] += added
+            self._total_bytes += added
+            entry["synced_at"] = time.monotonic()
+            self._enforce_limits()
+            return entry
+
+    def is_fresh(self, user_id: int, max_age_seconds: float) -> bool:
+        """Vrai si l'entrée existe et a été confrontée à la base il y a moins de `max_age_seconds`"""
+        with self._lock:
+            entry = self.get(user_id)
+            return entry is not None and time.monotonic() - entry["synced_at"] < max_age_seconds
+
+    def sync(self, user_id: int, messages: List[Dict], version: Any = None):
+        """
+        Remplace l'historique local par l'historique persisté (écrit aussi par d'autres
+        workers), en conservant le résumé glissant, et note sa `version`.
+        """
+        with self._lock:
+            entry = self.get(user_id)
+            if entry is None:
+                entry = self.hydrate(user_id, messages)
+            else:
+                history = list(messages[-self.max_messages_per_user:]) if self.max_messages_per_user > 0 else []
+                delta = (sum(self._message_size(m) for m in history)
+                         - sum(self._message_size(m) for m in entry["conversation_history"]))
+                entry["conversation_history"] = history
+                entry["size"] += delta
+                self._total_bytes += delta
+                self._enforce_limits()
+            entry["synced_at"] = time.monotonic()
+            entry["version"] = version
+
+    def confirm(self, user_id: int, version: Any) -> bool:
+        """Vrai (et l'entrée est considérée comme à jour) si sa version persistée n'a pas changé"""
+        with self._lock:
+            entry = self.get(user_id)
+            if entry is None or entry.get("version") != version:
+                return False
+            entry["synced_at"] = time.monotonic()
+            return True
+
+    def get_history(self, user_id: int) -> List[Dict]:
+        entry = self.get(user_id)
+        return list(entry["conversation_history"]) if entry else []
+
+    def append_messages(self, user_id: int, messages: List[Dict]):
+        """Ajoute des messages à l'historique en respectant les plafonds"""
+        with self._lock:
+            entry = self.get_or_create(user_id)
+            history = entry["conversation_history"]
+            history.extend(messages)
+            added = sum(self._message_size(m) for m in messages)
+            entry["size"] += added
+            self._total_bytes += added
+
+            overflow = len(history) - self.max_messages_per_user
+            if overflow > 0:
+                dropped = history[:overflow]
+                del history[:overflow]
+                freed = sum(self._message_size(m) for m in dropped)
+                entry["size"] -= freed
+                self._total_bytes -= freed
+                self._counters["trimmed_messages"] += overflow
+
+            self._enforce_limits()
+
+    def compact_history(self, user_id: int, compacted_count: int, summary: str):
+        """Remplace les `compacted_count` plus anciens messages par un résumé glissant"""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return
+            history = entry["conversation_history"]
+            dropped = history[:compacted_count]
+            del history[:compacted_count]
+            freed = sum(self._message_size(m) for m in dropped)
+            added = len(summary.encode("utf-8")) - len(entry["conversation_summary"].encode("utf-8"))
+            entry["conversation_summary"] = summary
+            entry["size"] += added - freed
+            self._total_bytes += added - freed
+
+    def clear_history(self, user_id: int):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None:
+                self._total_bytes -= entry["size"]
+                entry["size"] = 0
+                entry["conversation_history"] = []
+                entry["conversation_summary"] = ""
+
+    def remove(self, user_id: int):
+        with self._lock:
+            entry = self._entries.pop(user_id, None)
+            if entry is not None:
+                self._total_bytes -= entry["size"]
+
+    def __contains__(self, user_id: int) -> bool:
+        return self.get(user_id) is not None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        """Compteurs d'occupation et d'éviction"""
+        with self._lock:
+            self._expire()
+            return {
+                "users": len(self._entries),
+                "total_bytes": self._total_bytes,
+                "max_users": self.max_users,
+                "max_total_bytes": self.max_total_bytes,
+                "max_messages_per_user": self.max_messages_per_user,
+                "ttl_seconds": self.ttl_seconds,
+                **self._counters,
+            }
+
+    # ------------------------------------------------------------------
+    # Interne
+    # ------------------------------------------------------------------
+    def _touch(self, user_id: int, entry: Dict[str, Any]):
+        entry["last_access"] = time.monotonic()
+        self._entries.move_to_end(user_id)
+
+    def _expire(self):
+        """Évince les entrées expirées : l'ordre LRU garantit qu'elles sont en tête"""
+        if self.ttl_seconds <= 0:
+            return
+        deadline = time.monotonic() - self.ttl_seconds
+        while self._entries:
+            entry = next(iter(self._entries.values()))
+            if entry["last_access"] > deadline:
+                break
+            self._evict_oldest("evicted_ttl")
+
+    def _enforce_limits(self):
+        # On garde toujours l'entrée la plus récente (celle en cours d'utilisation)
+        while len(self._entries) > self.max_users:
+            self._evict_oldest("evicted_lru")
+        while self._total_bytes > self.max_total_bytes and len(self._entries) > 1:
+            self._evict_oldest("evicted_memory")
+
+    def _evict_oldest(self, counter: str):
+        _, entry = self._entries.popitem(last=False)
+        self._total_bytes -= entry["size"]
+        self._counters[counter] += 1
+
+    @staticmethod
+    def _message_size(message: Dict) -> int:
+        content = message.get("message") or ""
+        return len(content.encode("utf-8")) + MESSAGE_OVERHEAD_BYTES
@@ -0,0 +1,215 @@
+# app/services/keyword_classifier.py
+import re
+from collections import defaultdict
+from typing import Dict, Any, List, Tuple, Set, FrozenSet, Optional
+
+# Automate Aho-Corasick en C (`pyahocorasick`, dans requirements.txt) ; repli regex s'il manque
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
+
+# Vocabulaires de mots-clés, par usage. L'ordre des labels est l'ordre de priorité
+# (le premier label qui correspond l'emporte, comme les anciens if/elif).
+HEALTH_VOCABULARIES: Dict[str, List[Tuple[str, List[str]]]] = {
+    # VoiceService._basic_analysis
+    "urgency": [
+        ("high", ["urgence", "grave", "douleur intense", "saignement", "étouffe"]),
+    ],
+    "category": [
+        ("sleep", ["sommeil", "dormir", "nuit", "insomnie"]),
+        ("nutrition", ["manger", "aliment", "nourriture", "faim"]),
+        ("stress", ["stress", "anxiété", "nerveux", "panique"]),
+        ("exercise", ["exercice", "sport", "marche", "entraînement"]),
+        ("mental", ["triste", "déprimé", "heureux", "émotion"]),
+    ],
+    # VoiceService._detect_intent
+    "intent": [
+        ("advice_request", ["conseil", "recommande", "suggestion"]),
+        ("symptom_report", ["symptôme", "douleur", "problème", "mal"]),
+        ("information_request", ["question", "pourquoi", "comment"]),
+    ],
+    # HealthAgent._generate_suggestions
+    "suggestions": [
+        ("stress", ["stress", "anxiété"]),
+        ("sleep", ["sommeil", "fatigue"]),
+        ("nutrition", ["manger", "alimentation"]),
+    ],
+    # LLMService._get_demo_response
+    "demo_topic": [
+        ("stress", ["stress", "anxiété", "nerveux"]),
+        ("sommeil", ["sommeil", "dormir", "nuit", "fatigue"]),
+        ("nutrition", ["manger", "aliment", "nourriture", "régime"]),
+        ("exercice", ["exercice", "sport", "marche", "activité"]),
+    ],
+    # KnowledgeService._matches_category
+    "knowledge_category": [
+        ("sommeil", ["sommeil", "dormir", "nuit", "fatigue", "réveil", "insomnie"]),
+        ("nutrition", ["manger", "aliment", "nourriture", "régime", "repas", "diète", "calories"]),
+        ("exercice", ["exercice", "sport", "marche", "activité", "musculation", "entraînement"]),
+        ("stress", ["stress", "anxiété", "relaxation", "détente", "nerveux", "angoisse"]),
+        ("mental", ["mental", "émotion", "bien-être", "humeur", "dépression", "psychologie"]),
+    ],
+    # ai_routes.get_recommendation
+    "recommendation": [
+        ("stress", ["stress"]),
+        ("fatigue", ["fatigue"]),
+    ],
+}
+
+SUGGESTIONS: Dict[str, List[str]] = {
+    "stress": ["Exercice respiration", "Méditation guidée", "Conseil sommeil"],
+    "sleep": ["Routine sommeil", "Conseil literie", "Relaxation"],
+    "nutrition": ["Recette santé", "Plan repas", "Conseil hydratation"],
+    "default": ["Sommeil", "Nutrition", "Activité physique", "Santé mentale"],
+}
+
+
+def _trie_pattern(words: List[str]) -> str:
+    """Compile une liste de mots en expression régulière factorisée en trie"""
+    trie: Dict[str, Any] = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def build(node: Dict[str, Any]) -> str:
+        is_end = "" in node
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        if len(branches) == 1 and not is_end:
+            return branches[0]
+        group = "(?:" + "|".join(branches) + ")"
+        # Quantificateur gourmand : on préfère toujours le mot le plus long
+        return group + "?" if is_end else group
+
+    return build(trie)
+
+
+class KeywordMatches:
+    """Résultat d'une analyse : labels trouvés pour chaque vocabulaire"""
+
+    def __init__(self, found: Set[Tuple[str, str]], order: Dict[str, List[str]]):
+        self._found = found
+        self._order = order
+
+    def labels(self, vocabulary: str) -> Set[str]:
+        return {label for vocab, label in self._found if vocab == vocabulary}
+
+    def has(self, vocabulary: str, label: str) -> bool:
+        return (vocabulary, label) in self._found
+
+    def first(self, vocabulary: str, default: Optional[str] = None) -> Optional[str]:
+        """Premier label trouvé selon l'ordre de priorité du vocabulaire"""
+        for label in self._order.get(vocabulary, []):
+            if (vocabulary, label) in self._found:
+                return label
+        return default
+
+
+class KeywordClassifier:
+    """
+    Classifieur par mots-clés compilé une seule fois.
+
+    Tous les vocabulaires sont fusionnés dans un seul automate, parcouru une
+    seule fois sur le texte :
+    - "aho-corasick" (moteur par défaut) : automate C (pyahocorasick), toutes les
+      occurrences en un passage
+    - "regex" (repli si pyahocorasick n'est pas installé) : expression régulière factorisée en trie. Le texte est
+      découpé une fois en mots ; chaque mot distinct n'est analysé qu'une fois
+      puis mis en cache. Les mots-clés contenant un espace ("douleur intense")
+      sont cherchés directement dans le texte.
+
+    Le résultat est identique à `any(mot in texte for mot in liste)` pour
+    chaque liste : un mot-clé sans espace est forcément contenu dans un seul
+    mot du texte, et un mot-clé long implique tous ceux qu'il contient.
+    """
+
+    def __init__(self, vocabularies: Dict[str, List[Tuple[str, List[str]]]], token_cache_size: int = 50_000,
+                 use_automaton: bool = AHOCORASICK_AVAILABLE):
+        self._order = {vocab: [label for label, _ in entries] for vocab, entries in vocabularies.items()}
+
+        labels_by_keyword: Dict[str, Set[Tuple[str, str]]] = defaultdict(set)
+        for vocab, entries in vocabularies.items():
+            for label, keywords in entries:
+                for keyword in keywords:
+                    labels_by_keyword[keyword.lower()].add((vocab, label))
+
+        keywords = sorted(labels_by_keyword, key=len, reverse=True)
+        closure = {
+            keyword: frozenset().union(*(labels_by_keyword[k] for k in keywords if k in keyword))
+            for keyword in keywords
+        }
+        words = [k for k in keywords if len(k.split()) == 1 and k == k.strip()]
+        self._labels: Dict[str, FrozenSet[Tuple[str, str]]] = {k: closure[k] for k in words}
+        self._phrases: List[Tuple[str, FrozenSet[Tuple[str, str]]]] = [
+            (k, closure[k]) for k in keywords if k not in self._labels
+        ]
+        self._pattern = re.compile(_trie_pattern(words))
+
+        self._token_cache: Dict[str, FrozenSet[Tuple[str, str]]] = {}
+        self._token_cache_size = token_cache_size
+
+        self._automaton = None
+        if use_automaton:
+            self._automaton = ahocorasick.Automaton()
+            for keyword in keywords:
+                self._automaton.add_word(keyword, frozenset(labels_by_keyword[keyword]))
+            self._automaton.make_automaton()
+        self.engine = "aho-corasick" if self._automaton is not None else "regex"
+
+    def classify(self, text: str) -> KeywordMatches:
+        """Un seul passage sur le texte pour tous les vocabulaires"""
+        text_lower = text.lower()
+        found: Set[Tuple[str, str]] = set()
+
+        if self._automaton is not None:
+            for _, labels in self._automaton.iter(text_lower):
+                found |= labels
+            return KeywordMatches(found, self._order)
+
+        cache = self._token_cache
+        for token in set(text_lower.split()):
+            labels = cache.get(token)
+            if labels is None:
+                labels = self._scan_token(token)
+                if len(cache) >= self._token_cache_size:
+                    cache.clear()
+                cache[token] = labels
+            if labels:
+                found |= labels
+
+        for phrase, labels in self._phrases:
+            if phrase in text_lower:
+                found |= labels
+
+        return KeywordMatches(found, self._order)
+
+    def _scan_token(self, token: str) -> FrozenSet[Tuple[str, str]]:
+        """Mots-clés contenus dans un mot (y compris qui se chevauchent)"""
+        labels: Set[Tuple[str, str]] = set()
+        position = 0
+        while True:
+            match = self._pattern.search(token, position)
+            if match is None:
+                return frozenset(labels)
+            labels |= self._labels[match.group()]
+            position = match.start() + 1
+
+    def analyze(self, text: str) -> Dict[str, Any]:
+        """Catégorie, intention, urgence et suggestions en une seule analyse"""
+        matches = self.classify(text)
+        return {
+            "category": matches.first("category", "general"),
+            "intent": matches.first("intent", "general_message"),
+            "urgency": matches.first("urgency", "low"),
+            "suggestions": SUGGESTIONS[matches.first("suggestions", "default")],
+            "matches": matches,
+        }
+
+
+# Instance partagée : les vocabulaires sont compilés une seule fois à l'import
+health_classifier = KeywordClassifier(HEALTH_VOCABULARIES)
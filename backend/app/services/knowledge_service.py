@@ -1,13 +1,59 @@
 # app/services/knowledge_service.py
+import asyncio
+import os
 import requests
 from bs4 import BeautifulSoup
 import json
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
+from app.services.keyword_classifier import health_classifier
+from app.services.search_index import BM25Index
+from app.services.vector_index import VectorIndex, HashingEmbedder
+
+BASE_SOURCE = "Base Connaissances Auriance"
+
+SEARCH_MODES = ("lexical", "semantic", "hybrid")
+# Similarité cosinus minimale d'un résultat sémantique
+MIN_SIMILARITY = float(os.getenv("KNOWLEDGE_MIN_SIMILARITY", "0.2"))
+# Fusion des classements (reciprocal rank fusion) en mode hybride
+RRF_K = 60
 
 class KnowledgeService:
-    def __init__(self):
+    """
+    Base de conseils santé indexée une seule fois au démarrage : index inversé BM25
+    (recherche lexicale) et index vectoriel (recherche sémantique).
+
+    Les index vivent dans chaque processus. Les conseils ajoutés (`add_tip`) sont
+    écrits dans un fichier JSON Lines commun : avant chaque recherche, un worker
+    indexe les lignes ajoutées depuis sa dernière lecture (par lui ou par un autre
+    worker), si bien que tous les workers voient les mêmes conseils dans le même ordre.
+    """
+    
+    def __init__(self, tips_path: Optional[str] = None, vectors: Optional[VectorIndex] = None):
         self.knowledge_base = self._initialize_knowledge_base()
-        print("✅ Service Knowledge (version simplifiée) initialisé !")
+        self.tips_path = tips_path
+        self.documents: List[Dict[str, Any]] = []
+        self.index = BM25Index()
+        self._tips_offset = 0                  # octets du fichier de conseils déjà indexés
+        self._tip_lines: Dict[int, int] = {}   # début de ligne dans le fichier -> document
+        self._sync_lock = asyncio.Lock()
+        for category, tips in self.knowledge_base.items():
+            for tip in tips:
+                self._index_tip(category, tip, BASE_SOURCE)
+        tips, self._tips_offset = self._read_new_tips()
+        for start, tip in tips:
+            self._index_file_tip(start, tip)
+        added = len(tips)
+        self.vectors = vectors if vectors is not None else VectorIndex(HashingEmbedder())
+        self.vectors.build([_document_text(document) for document in self.documents])
+        print(f"✅ Service Knowledge initialisé ({len(self.documents)} conseils indexés, dont {added} ajoutés ; "
+              f"vecteurs {self.vectors.embedder.name}{', réutilisés' if self.vectors.reused else ''})")
+    
+    @classmethod
+    def from_env(cls) -> "KnowledgeService":
+        return cls(
+            tips_path=os.getenv("KNOWLEDGE_TIPS_PATH", "./knowledge_tips.jsonl") or None,
+            vectors=VectorIndex.from_env()
+        )
     
     def _initialize_knowledge_base(self) -> Dict[str, List[str]]:
         """Base de connaissances santé prédéfinie"""
@@ -44,59 +90,161 @@ class KnowledgeService:
             ]
         }
     
-    async def search_health_resources(self, query: str, max_results: int = 3) -> List[Dict[str, Any]]:
+    async def search_health_resources(self, query: str, max_results: int = 3, mode: str = "lexical") -> List[Dict[str, Any]]:
         """
         Recherche intelligente dans les connaissances santé
+        
+        - "lexical" : BM25 sur les termes de la question
+        - "semantic" : similarité cosinus des embeddings
+        - "hybrid" : fusion des deux classements
         """
         try:
-            query_lower = query.lower()
-            results = []
-            
-            # Recherche par catégorie
-            for category, tips in self.knowledge_base.items():
-                if self._matches_category(query_lower, category):
-                    for i, tip in enumerate(tips[:max_results]):
-                        results.append({
-                            "content": tip,
-                            "metadata": {
-                                "source": "Base Connaissances Auriance",
-                                "category": category,
-                                "confidence": 0.9 - (i * 0.1)  # Score décroissant
-                            },
-                            "score": 0.9 - (i * 0.1)
-                        })
-            
-            # Si pas de résultats par catégorie, recherche dans tout
-            if not results:
-                for category, tips in self.knowledge_base.items():
-                    for tip in tips:
-                        if any(keyword in query_lower for keyword in tip.lower().split()[:3]):
-                            results.append({
-                                "content": tip,
-                                "metadata": {"source": "Base Connaissances", "category": category},
-                                "score": 0.7
-                            })
-                            if len(results) >= max_results:
-                                break
+            await self.sync_tips()
+            if mode == "semantic":
+                hits = await self._semantic_hits(query, max_results)
+            elif mode == "hybrid":
+                candidates = 3 * max_results
+                hits = _fuse_rankings(
+                    [self._lexical_hits(query, candidates), await self._semantic_hits(query, candidates)], max_results
+                )
+            else:
+                hits = self._lexical_hits(query, max_results)
             
-            return results[:max_results]
+            best = hits[0][1] if hits else 1.0
+            results = []
+            for doc_id, score in hits:
+                document = self.documents[doc_id]
+                results.append({
+                    "content": document["content"],
+                    "metadata": {
+                        "source": document["source"],
+                        "category": document["category"],
+                        "confidence": round(score / best, 2)  # relative au meilleur résultat
+                    },
+                    "score": round(score, 4)
+                })
+            return results
             
         except Exception as e:
             print(f"❌ Erreur recherche: {e}")
             return []
     
+    def _lexical_hits(self, query: str, limit: int) -> List[tuple]:
+        # Les catégories reconnues dans la question ("dormir" -> sommeil) s'ajoutent
+        # à la requête : chaque conseil est indexé avec le nom de sa catégorie
+        matches = health_classifier.classify(query.lower())
+        categories = sorted(matches.labels("knowledge_category"))
+        return self.index.search(" ".join([query, *categories]), limit)
+    
+    async def _semantic_hits(self, query: str, limit: int) -> List[tuple]:
+        # Embedding de la requête et produit matriciel hors de la boucle d'événements
+        hits = await asyncio.to_thread(self.vectors.search, query, limit)
+        return [(doc_id, score) for doc_id, score in hits if score >= MIN_SIMILARITY]
+    
+    async def add_tip(self, category: str, content: str, source: str = "Contribution") -> Dict[str, Any]:
+        """Ajoute un conseil : écrit dans le fichier commun, puis indexé en le relisant comme les autres"""
+        tip = {"category": category, "content": content, "source": source}
+        if not self.tips_path:
+            async with self._sync_lock:
+                return (await self._index_new_tips([(None, tip)]))[0]
+        start = await asyncio.to_thread(self._append_tip, tip)
+        # Toujours sous le verrou : une relecture concurrente a pu lire notre ligne et
+        # être encore en train de l'indexer
+        async with self._sync_lock:
+            await self._sync_locked()
+            return self.documents[self._tip_lines[start]]
+    
+    async def sync_tips(self) -> int:
+        """Indexe les conseils ajoutés au fichier depuis la dernière lecture ; renvoie leur nombre"""
+        if not self.tips_path or not self._tips_pending():
+            return 0
+        async with self._sync_lock:
+            return await self._sync_locked()
+    
+    def _tips_pending(self) -> bool:
+        try:
+            return os.path.getsize(self.tips_path) > self._tips_offset
+        except OSError:
+            return False
+    
+    async def _sync_locked(self) -> int:
+        # Nouvelle vérification une fois le verrou pris : une autre relecture a pu tout indexer
+        if not self._tips_pending():
+            return 0
+        tips, offset = await asyncio.to_thread(self._read_new_tips)
+        await self._index_new_tips(tips)
+        # Position avancée seulement une fois les lignes indexées (un échec les relira)
+        self._tips_offset = offset
+        return len(tips)
+    
+    async def _index_new_tips(self, tips: List[tuple]) -> List[Dict[str, Any]]:
+        if not tips:
+            return []
+        # Embeddings hors de la boucle d'événements, puis ajout simultané aux deux index
+        vectors = await asyncio.to_thread(self.vectors.embedder.embed, [_document_text(tip) for _, tip in tips])
+        documents = []
+        for (start, tip), vector in zip(tips, vectors):
+            documents.append(self._index_file_tip(start, tip))
+            self.vectors.add_vector(vector)
+        return documents
+    
+    def _index_file_tip(self, start: Optional[int], tip: Dict[str, Any]) -> Dict[str, Any]:
+        document = self._index_tip(tip["category"], tip["content"], tip.get("source", "Contribution"))
+        self.knowledge_base.setdefault(tip["category"], []).append(tip["content"])
+        if start is not None:
+            self._tip_lines[start] = document["id"]
+        return document
+    
+    def _index_tip(self, category: str, content: str, source: str) -> Dict[str, Any]:
+        document = {"id": len(self.documents), "category": category, "content": content, "source": source}
+        self.documents.append(document)
+        self.index.add(document["id"], _document_text(document))
+        return document
+    
+    def _read_new_tips(self) -> Tuple[List[tuple], int]:
+        """
+        (début de ligne, conseil) des lignes complètes écrites après `_tips_offset`,
+        et la position qui suit la dernière
+        """
+        if not self.tips_path or not os.path.exists(self.tips_path):
+            return [], self._tips_offset
+        with open(self.tips_path, "rb") as f:
+            f.seek(self._tips_offset)
+            data = f.read()
+        tips = []
+        position = self._tips_offset
+        for line in data.splitlines(keepends=True):
+            if not line.endswith(b"\n"):
+                break   # ligne en cours d'écriture par un autre worker : lue au prochain passage
+            start, position = position, position + len(line)
+            try:
+                tip = json.loads(line)
+                tips.append((start, {"category": tip["category"], "content": tip["content"],
+                                     "source": tip.get("source", "Contribution")}))
+            except (ValueError, KeyError, TypeError):
+                # Ligne tronquée (arrêt pendant une écriture) : ignorée
+                continue
+        return tips, position
+    
+    def _append_tip(self, tip: Dict[str, Any]) -> int:
+        """Ajoute une ligne (une seule écriture en mode ajout) ; renvoie son début dans le fichier"""
+        line = (json.dumps(tip, ensure_ascii=False) + "\n").encode("utf-8")
+        with open(self.tips_path, "ab") as f:
+            f.write(line)
+            f.flush()   # position réelle après l'écriture (d'autres workers ajoutent aussi)
+            return f.tell() - len(line)
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "documents": len(self.documents),
+            "categories": sorted(self.knowledge_base),
+            "lexical_index": self.index.stats(),
+            "vector_index": self.vectors.stats(),
+        }
+    
     def _matches_category(self, query: str, category: str) -> bool:
         """Vérifie si la query correspond à une catégorie"""
-        category_keywords = {
-            "sommeil": ["sommeil", "dormir", "nuit", "fatigue", "réveil", "insomnie"],
-            "nutrition": ["manger", "aliment", "nourriture", "régime", "repas", "diète", "calories"],
-            "exercice": ["exercice", "sport", "marche", "activité", "musculation", "entraînement"],
-            "stress": ["stress", "anxiété", "relaxation", "détente", "nerveux", "angoisse"],
-            "mental": ["mental", "émotion", "bien-être", "humeur", "dépression", "psychologie"]
-        }
-        
-        keywords = category_keywords.get(category, [])
-        return any(keyword in query for keyword in keywords)
+        return health_classifier.classify(query).has("knowledge_category", category)
     
     async def scrape_health_resources(self, topic: str) -> List[Dict[str, Any]]:
         """
@@ -124,4 +272,17 @@ class KnowledgeService:
             ]
         }
         
-        return simulated_resources.get(topic.lower(), [])
\ No newline at end of file
+        return simulated_resources.get(topic.lower(), [])
+
+
+def _document_text(document: Dict[str, Any]) -> str:
+    return f"{document['category']} {document['content']}"
+
+
+def _fuse_rankings(rankings: List[List[tuple]], limit: int) -> List[tuple]:
+    """Reciprocal rank fusion : un document bien classé par les deux recherches passe devant"""
+    fused: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, (doc_id, _) in enumerate(ranking):
+            fused[doc_id] = fused.get(doc_id, 0.0) + 1.0 / (RRF_K + rank + 1)
+    return sorted(fused.items(), key=lambda item: item[1], reverse=True)[:limit]
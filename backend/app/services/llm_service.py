@@ -1,66 +1,198 @@
 # app/services/llm_service.py
 import os
-import requests
+import asyncio
+import hashlib
+import random
+import time
+import httpx
 import json
-from typing import Dict, Any
+import re
+from contextlib import aclosing
+from typing import Dict, Any, AsyncIterator, Callable, List, Union
 from dotenv import load_dotenv
+from app.services.response_cache import ResponseCache, normalize_message
+from app.services.single_flight import SingleFlight
+from app.services.keyword_classifier import health_classifier
+from app.services.prompt_builder import PromptBuilder
+from app.services.circuit_breaker import CircuitBreaker, CircuitOpenError, RetryBudget, CLOSED
 
 load_dotenv()
 
+TIMEOUT_RESPONSE = "Désolé, le service est temporairement indisponible. Veuillez réessayer."
+SAFETY_REDIRECT_RESPONSE = "Je vous recommande de consulter un professionnel de santé pour une évaluation personnalisée. Je peux vous aider sur les aspects bien-être et prévention. 🩺"
+FORBIDDEN_TERMS = ["diagnostic", "médicament", "prescrire", "guérir", "maladie"]
+
+DEMO_RESPONSES = {
+    "stress": "Je comprends que le stress peut être éprouvant. La cohérence cardiaque (respiration 5-5-6) est une technique simple : inspirez 5s, expirez 5s, pendant 5 minutes. Cela peut aider à réguler le système nerveux. 🧘‍♀️",
+    "sommeil": "Pour un sommeil réparateur, une routine régulière est clé. Chambre fraîche (18-20°C), obscurité totale, et pas d'écrans 1h avant le coucher peuvent faire une grande différence. 😴",
+    "nutrition": "Une assiette équilibrée avec des légumes colorés, des protéines maigres et des céréales complètes est idéale. Pensez à varier les couleurs pour diversifier les nutriments ! 🥗",
+    "exercice": "L'activité physique régulière est excellente pour la santé. Même 30 minutes de marche quotidienne peuvent améliorer l'humeur et l'énergie. Quel est votre niveau d'activité actuel ? 🚶‍♂️",
+    "default": "Je suis là pour vous accompagner vers un meilleur bien-être. De quel aspect de votre santé aimeriez-vous parler ? (sommeil, nutrition, activité, gestion du stress...) 🌟"
+}
+
+# HTTP/2 uniquement si le paquet optionnel `h2` est installé (httpx[http2])
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+class StreamingSafetyGuard:
+    """
+    Vérification incrémentale de _validate_health_response sur une fenêtre glissante :
+    on ne garde que la fin du texte déjà reçu, juste assez longue pour détecter
+    un terme interdit coupé entre deux tokens.
+    """
+    
+    def __init__(self, forbidden_terms: List[str]):
+        self.forbidden_terms = forbidden_terms
+        self.window_size = max(len(term) for term in forbidden_terms) - 1
+        self._tail = ""
+    
+    def feed(self, token: str) -> bool:
+        """Ajoute un token ; retourne False dès qu'un terme interdit apparaît"""
+        window = (self._tail + token).lower()
+        if any(term in window for term in self.forbidden_terms):
+            return False
+        self._tail = window[-self.window_size:] if self.window_size else ""
+        return True
+
+
+def _split_words(text: str) -> List[str]:
+    return re.findall(r"\S+\s*", text)
+
+
 class LLMService:
     def __init__(self):
         self.api_key = os.getenv("OPENAI_API_KEY")
-        self.base_url = "https://api.openai.com/v1"
-        print("✅ Service ChatGPT initialisé !")
+        self.base_url = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
+        self.client = self._build_http_client()
+        self.response_cache = ResponseCache.from_env()
+        self.single_flight = SingleFlight()
+        self.prompt_builder = PromptBuilder(
+            max_prompt_tokens=int(os.getenv("LLM_PROMPT_TOKEN_BUDGET", "1500")),
+            max_summary_tokens=int(os.getenv("LLM_SUMMARY_TOKEN_BUDGET", "200"))
+        )
+        self.prompt_tokens_total = 0
+        self.prompts_built = 0
+        
+        # Résilience : disjoncteur, budget de retries, requêtes doublées (hedging)
+        self.circuit_breaker = CircuitBreaker(
+            window_seconds=float(os.getenv("LLM_BREAKER_WINDOW_SECONDS", "30")),
+            min_requests=int(os.getenv("LLM_BREAKER_MIN_REQUESTS", "10")),
+            error_rate_threshold=float(os.getenv("LLM_BREAKER_ERROR_RATE", "0.5")),
+            slow_call_seconds=float(os.getenv("LLM_BREAKER_SLOW_CALL_SECONDS", "5")),
+            slow_call_rate_threshold=float(os.getenv("LLM_BREAKER_SLOW_CALL_RATE", "0.5")),
+            open_seconds=float(os.getenv("LLM_BREAKER_OPEN_SECONDS", "15"))
+        )
+        self.retry_budget = RetryBudget(ratio=float(os.getenv("LLM_RETRY_BUDGET_RATIO", "0.1")))
+        self.max_retries = int(os.getenv("LLM_MAX_RETRIES", "1"))
+        self.hedging_enabled = os.getenv("LLM_HEDGING", "0") == "1"
+        self.hedge_min_delay = float(os.getenv("LLM_HEDGE_MIN_DELAY", "0.5"))
+        self.hedge_min_samples = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+        self.retries = 0
+        self.hedges_sent = 0
+        self.hedges_won = 0
+        self.prewarms = 0
+        self._last_request_at = 0.0
+        print(f"✅ Service ChatGPT initialisé ! (HTTP/2: {HTTP2_AVAILABLE})")
+    
+    def _build_http_client(self) -> httpx.AsyncClient:
+        """Client HTTP asynchrone partagé (keep-alive + pool de connexions)"""
+        # Toutes les requêtes visent le même hôte : les limites du pool sont donc par hôte
+        self.client_keepalive_expiry = float(os.getenv("LLM_KEEPALIVE_EXPIRY", "30"))
+        limits = httpx.Limits(
+            max_connections=int(os.getenv("LLM_MAX_CONNECTIONS_PER_HOST", "200")),
+            max_keepalive_connections=int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "50")),
+            keepalive_expiry=self.client_keepalive_expiry
+        )
+        timeout = httpx.Timeout(
+            connect=float(os.getenv("LLM_CONNECT_TIMEOUT", "3")),
+            read=float(os.getenv("LLM_READ_TIMEOUT", "10")),
+            write=float(os.getenv("LLM_WRITE_TIMEOUT", "5")),
+            pool=float(os.getenv("LLM_POOL_TIMEOUT", "5"))
+        )
+        return httpx.AsyncClient(http2=HTTP2_AVAILABLE, limits=limits, timeout=timeout)
     
-    async def generate_health_response(self, user_message: str, context: Dict) -> str:
+    async def aclose(self):
+        """Ferme les connexions du pool (arrêt de l'application)"""
+        await self.client.aclose()
+    
+    async def prewarm(self):
         """
-        Utilise ChatGPT pour générer des réponses santé personnalisées
+        Ouvre (ou rafraîchit) une connexion keep-alive vers l'API avant un appel imminent :
+        DNS, TCP et TLS sont payés pendant que l'appelant prépare le message.
+        Inutile si une requête récente a laissé une connexion vivante.
+        """
+        if not self.api_key or self.circuit_breaker.state != CLOSED:
+            return
+        if time.monotonic() - self._last_request_at < self.client_keepalive_expiry / 2:
+            return
+        self._last_request_at = time.monotonic()
+        self.prewarms += 1
+        try:
+            await self.client.head(f"{self.base_url}/models", headers={"Authorization": f"Bearer {self.api_key}"})
+        except Exception as e:
+            # Simple optimisation : l'appel réel gérera l'erreur
+            print(f"⚠️  Préchauffage connexion LLM impossible: {e}")
+    
+    async def generate_health_response(self, user_message: str, context: Dict,
+                                       prompt: Union[Dict, Callable[[], Dict], None] = None) -> str:
+        """
+        Utilise ChatGPT pour générer des réponses santé personnalisées.
+        `prompt` : résultat de build_health_prompt, ou fonction qui le construit ; il n'est
+        construit qu'en cas d'appel réel à l'API (pas pour une réponse en cache)
         """
-        prompt = self._build_health_prompt(user_message, context)
-        
         try:
             if self.api_key:
-                # Appel réel à l'API ChatGPT
-                response = await self._call_chatgpt_api(prompt)
+                cache_key = ResponseCache.make_key(user_message, context)
+                if self.response_cache:
+                    cached = await self.response_cache.get(cache_key)
+                    if cached is not None:
+                        return cached
+                
+                messages = self._resolve_prompt(prompt, user_message, context)["messages"]
+                # Appel réel à l'API ChatGPT, partagé entre requêtes concurrentes identiques
+                response = await self.single_flight.do(
+                    self._prompt_key(messages),
+                    lambda: self._call_chatgpt_api(messages)
+                )
+                
+                # Seules les réponses validées telles quelles sont mises en cache
+                if self.response_cache and response != TIMEOUT_RESPONSE and self._is_safe_health_response(response):
+                    await self.response_cache.set(cache_key, response)
                 return self._validate_health_response(response)
             else:
                 # Mode démo si pas de clé API
                 return self._get_demo_response(user_message, context)
                 
+        except CircuitOpenError:
+            # Amont en difficulté : réponse immédiate plutôt qu'attendre le timeout
+            return self._get_demo_response(user_message, context)
         except Exception as e:
             print(f"❌ Erreur ChatGPT: {e}")
             return self._get_fallback_response(user_message)
     
-    def _build_health_prompt(self, user_message: str, context: Dict) -> str:
-        """Construit un prompt sécurisé pour ChatGPT"""
-        return f"""
-        Tu es Auriance, un assistant santé bienveillant et prudent spécialisé dans l'accompagnement quotidien des patients et soignants.
-
-        CONTEXTE UTILISATEUR: {context.get('user_profile', {})}
-        HISTORIQUE CONVERSATION: {context.get('conversation_history', [])}
-        DERNIER MESSAGE: {user_message}
-
-        🔒 RÈGLES STRICTES À RESPECTER:
-        - NE JAMAIS faire de diagnostic médical
-        - NE JAMAIS recommander de médicaments spécifiques
-        - Toujours orienter vers un professionnel de santé pour les symptômes sérieux
-        - Donner des conseils généraux de bien-être basés sur des preuves scientifiques
-        - Être empathique, encourageant et personnalisé
-        - Répondre en français naturel et chaleureux
-        - Limiter la réponse à 2-3 phrases maximum
-
-        💡 DOMAINES D'EXPERTISE AUTORISÉS:
-        - Hygiène de vie (sommeil, nutrition, activité physique)
-        - Gestion du stress et bien-être mental
-        - Conseils généraux de prévention
-        - Accompagnement des habitudes santé
-
-        🎯 TA RÉPONSE (ton professionnel et bienveillant):
-        """
+    def _resolve_prompt(self, prompt, user_message: str, context: Dict) -> Dict[str, Any]:
+        if callable(prompt):
+            return prompt()
+        return prompt or self.build_health_prompt(user_message, context)
+    
+    def build_health_prompt(self, user_message: str, context: Dict) -> Dict[str, Any]:
+        """Construit un prompt sécurisé pour ChatGPT, dans le budget de tokens"""
+        prompt = self.prompt_builder.build(user_message, context)
+        self.prompt_tokens_total += prompt["token_counts"]["total"]
+        self.prompts_built += 1
+        return prompt
+    
+    @staticmethod
+    def _prompt_key(messages: List[Dict[str, str]]) -> str:
+        """Clé de regroupement : empreinte des messages normalisés"""
+        normalized = "\x1f".join(f"{m['role']}:{normalize_message(m['content'])}" for m in messages)
+        return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
     
-    async def _call_chatgpt_api(self, prompt: str) -> str:
-        """Appel réel à l'API ChatGPT"""
+    def _build_chat_request(self, messages: List[Dict[str, str]]) -> Dict[str, Any]:
+        """En-têtes et corps de la requête chat/completions"""
         headers = {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json"
@@ -68,69 +200,214 @@ class LLMService:
         
         data = {
             "model": "gpt-3.5-turbo",  # ou "gpt-4" si tu as accès
-            "messages": [
-                {
-                    "role": "system", 
-                    "content": "Tu es un assistant santé bienveillant et prudent. Tu donnes des conseils généraux de bien-être sans jamais faire de diagnostic médical."
-                },
-                {
-                    "role": "user", 
-                    "content": prompt
-                }
-            ],
+            "messages": messages,
             "max_tokens": 150,
             "temperature": 0.7,
             "top_p": 0.9
         }
+        return {"headers": headers, "json": data}
+    
+    async def _call_chatgpt_api(self, messages: List[Dict[str, str]]) -> str:
+        """
+        Appel réel à l'API ChatGPT, protégé par le disjoncteur.
+        Les erreurs transitoires sont retentées dans la limite du budget de retries.
+        """
+        if not self.circuit_breaker.allow_request():
+            raise CircuitOpenError("Disjoncteur LLM ouvert")
+        self.retry_budget.deposit()
+        
+        attempt = 0
+        while True:
+            start = time.monotonic()
+            try:
+                result = await self._hedged_post(messages)
+                self.circuit_breaker.record_success(time.monotonic() - start)
+                return result
+            except Exception as e:
+                self.circuit_breaker.record_failure(time.monotonic() - start)
+                if not self._is_retryable(e) or attempt >= self.max_retries or not self.retry_budget.try_withdraw():
+                    if isinstance(e, httpx.TimeoutException):
+                        return TIMEOUT_RESPONSE
+                    print(f"Erreur API ChatGPT: {e}")
+                    raise e
+                if not self.circuit_breaker.allow_request():
+                    raise CircuitOpenError("Disjoncteur LLM ouvert") from e
+                attempt += 1
+                self.retries += 1
+                # Backoff exponentiel avec jitter
+                await asyncio.sleep(random.uniform(0, 0.1 * 2 ** attempt))
+    
+    async def _hedged_post(self, messages: List[Dict[str, str]]) -> str:
+        """
+        Envoie la requête ; si elle n'a pas répondu après le p95 de latence observé,
+        envoie une seconde requête identique et garde la première réponse arrivée.
+        """
+        p95 = self.circuit_breaker.latency_percentile(0.95)
+        if not self.hedging_enabled or p95 is None or self.circuit_breaker.sample_count() < self.hedge_min_samples:
+            return await self._post_chat_completion(messages)
         
+        first = asyncio.ensure_future(self._post_chat_completion(messages))
+        done, _ = await asyncio.wait({first}, timeout=max(self.hedge_min_delay, p95))
+        if done or not self.retry_budget.try_withdraw():
+            return await first
+        
+        self.hedges_sent += 1
+        second = asyncio.ensure_future(self._post_chat_completion(messages))
+        pending = {first, second}
+        error = None
         try:
-            response = requests.post(
-                f"{self.base_url}/chat/completions", 
-                headers=headers, 
-                json=data,
-                timeout=10
-            )
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is second:
+                            self.hedges_won += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+    
+    async def _post_chat_completion(self, messages: List[Dict[str, str]]) -> str:
+        """Une tentative HTTP unique vers chat/completions"""
+        self._last_request_at = time.monotonic()
+        request = self._build_chat_request(messages)
+        response = await self.client.post(
+            f"{self.base_url}/chat/completions", 
+            headers=request["headers"], 
+            json=request["json"]
+        )
+        response.raise_for_status()
+        
+        result = response.json()
+        return result["choices"][0]["message"]["content"]
+    
+    @staticmethod
+    def _is_retryable(error: Exception) -> bool:
+        """Erreurs réseau, 429 et 5xx : transitoires"""
+        if isinstance(error, httpx.HTTPStatusError):
+            return error.response.status_code == 429 or error.response.status_code >= 500
+        return isinstance(error, httpx.TransportError)
+    
+    async def _stream_chatgpt_api(self, messages: List[Dict[str, str]]) -> AsyncIterator[str]:
+        """Appel à l'API ChatGPT en mode streaming : produit les tokens au fil de l'eau"""
+        self._last_request_at = time.monotonic()
+        request = self._build_chat_request(messages)
+        request["json"]["stream"] = True
+        
+        async with self.client.stream(
+            "POST",
+            f"{self.base_url}/chat/completions",
+            headers=request["headers"],
+            json=request["json"]
+        ) as response:
             response.raise_for_status()
-            
-            result = response.json()
-            return result["choices"][0]["message"]["content"]
-            
-        except requests.exceptions.Timeout:
-            return "Désolé, le service est temporairement indisponible. Veuillez réessayer."
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                payload = line[5:].strip()
+                if payload == "[DONE]":
+                    break
+                delta = json.loads(payload)["choices"][0].get("delta", {})
+                if delta.get("content"):
+                    yield delta["content"]
+    
+    async def stream_health_response(self, user_message: str, context: Dict,
+                                     prompt: Union[Dict, Callable[[], Dict], None] = None) -> AsyncIterator[Dict[str, str]]:
+        """
+        Version streaming de generate_health_response.
+        Produit des événements {"event": "token" | "replace" | "done", "text": ...} :
+        - token   : morceau de réponse à ajouter
+        - replace : la réponse affichée doit être remplacée (contenu non sûr ou erreur)
+        - done    : réponse finale complète
+        """
+        if not self.api_key:
+            # Mode démo : on découpe la réponse pour garder le même protocole
+            answer = self._get_demo_response(user_message, context)
+            for chunk in _split_words(answer):
+                yield {"event": "token", "text": chunk}
+            yield {"event": "done", "text": answer}
+            return
+        
+        cache_key = ResponseCache.make_key(user_message, context)
+        if self.response_cache:
+            cached = await self.response_cache.get(cache_key)
+            if cached is not None:
+                yield {"event": "token", "text": cached}
+                yield {"event": "done", "text": cached}
+                return
+        
+        if not self.circuit_breaker.allow_request():
+            # Disjoncteur ouvert : réponse de démo immédiate
+            answer = self._get_demo_response(user_message, context)
+            yield {"event": "token", "text": answer}
+            yield {"event": "done", "text": answer}
+            return
+        
+        prompt = self._resolve_prompt(prompt, user_message, context)
+        guard = StreamingSafetyGuard(FORBIDDEN_TERMS)
+        parts = []
+        start = time.monotonic()
+        try:
+            # aclosing : quitter la boucle ferme immédiatement la connexion amont
+            async with aclosing(self._stream_chatgpt_api(prompt["messages"])) as tokens:
+                async for token in tokens:
+                    if not guard.feed(token):
+                        # Terme interdit détecté : on coupe le flux et on remplace
+                        self.circuit_breaker.record_success(time.monotonic() - start)
+                        yield {"event": "replace", "text": SAFETY_REDIRECT_RESPONSE}
+                        yield {"event": "done", "text": SAFETY_REDIRECT_RESPONSE}
+                        return
+                    parts.append(token)
+                    yield {"event": "token", "text": token}
         except Exception as e:
-            print(f"Erreur API ChatGPT: {e}")
-            raise e
+            self.circuit_breaker.record_failure(time.monotonic() - start)
+            print(f"❌ Erreur streaming ChatGPT: {e}")
+            fallback = self._get_fallback_response(user_message)
+            yield {"event": "replace", "text": fallback}
+            yield {"event": "done", "text": fallback}
+            return
+        
+        self.circuit_breaker.record_success(time.monotonic() - start)
+        answer = "".join(parts)
+        if self.response_cache and answer:
+            await self.response_cache.set(cache_key, answer)
+        yield {"event": "done", "text": answer}
     
     def _get_demo_response(self, user_message: str, context: Dict) -> str:
         """Réponses intelligentes en mode démo (si pas d'API Key)"""
-        message_lower = user_message.lower()
-        
-        demo_responses = {
-            "stress": "Je comprends que le stress peut être éprouvant. La cohérence cardiaque (respiration 5-5-6) est une technique simple : inspirez 5s, expirez 5s, pendant 5 minutes. Cela peut aider à réguler le système nerveux. 🧘‍♀️",
-            "sommeil": "Pour un sommeil réparateur, une routine régulière est clé. Chambre fraîche (18-20°C), obscurité totale, et pas d'écrans 1h avant le coucher peuvent faire une grande différence. 😴",
-            "nutrition": "Une assiette équilibrée avec des légumes colorés, des protéines maigres et des céréales complètes est idéale. Pensez à varier les couleurs pour diversifier les nutriments ! 🥗",
-            "exercice": "L'activité physique régulière est excellente pour la santé. Même 30 minutes de marche quotidienne peuvent améliorer l'humeur et l'énergie. Quel est votre niveau d'activité actuel ? 🚶‍♂️",
-            "default": "Je suis là pour vous accompagner vers un meilleur bien-être. De quel aspect de votre santé aimeriez-vous parler ? (sommeil, nutrition, activité, gestion du stress...) 🌟"
-        }
-        
-        if any(word in message_lower for word in ["stress", "anxiété", "nerveux"]):
-            return demo_responses["stress"]
-        elif any(word in message_lower for word in ["sommeil", "dormir", "nuit", "fatigue"]):
-            return demo_responses["sommeil"]
-        elif any(word in message_lower for word in ["manger", "aliment", "nourriture", "régime"]):
-            return demo_responses["nutrition"]
-        elif any(word in message_lower for word in ["exercice", "sport", "marche", "activité"]):
-            return demo_responses["exercice"]
-        else:
-            return demo_responses["default"]
+        topic = health_classifier.classify(user_message).first("demo_topic", "default")
+        return DEMO_RESPONSES[topic]
     
     def _get_fallback_response(self, user_message: str) -> str:
         """Réponse de secours ultra-sécurisée"""
         return "Je comprends votre préoccupation. Pour des conseils personnalisés, je recommande de consulter un professionnel de santé. En attendant, je peux vous aider sur le bien-être général et les habitudes santé. 🌿"
     
+    def _is_safe_health_response(self, response: str) -> bool:
+        """Vrai si la réponse ne contient aucun terme interdit"""
+        response_lower = response.lower()
+        return not any(term in response_lower for term in FORBIDDEN_TERMS)
+    
     def _validate_health_response(self, response: str) -> str:
         """Valide que la réponse est sécuritaire"""
-        forbidden_terms = ["diagnostic", "médicament", "prescrire", "guérir", "maladie"]
-        if any(term in response.lower() for term in forbidden_terms):
-            return "Je vous recommande de consulter un professionnel de santé pour une évaluation personnalisée. Je peux vous aider sur les aspects bien-être et prévention. 🩺"
-        return response
\ No newline at end of file
+        if not self._is_safe_health_response(response):
+            return SAFETY_REDIRECT_RESPONSE
+        return response
+    
+    def stats(self) -> Dict[str, Any]:
+        """Métriques du service (cache de réponses, regroupement des appels, tokens)"""
+        return {
+            "response_cache": self.response_cache.stats() if self.response_cache else None,
+            "single_flight": self.single_flight.stats(),
+            "prompts": {
+                "built": self.prompts_built,
+                "prompt_tokens_total": self.prompt_tokens_total,
+                "avg_prompt_tokens": round(self.prompt_tokens_total / self.prompts_built, 1) if self.prompts_built else 0.0,
+                "token_budget": self.prompt_builder.max_prompt_tokens
+            },
+            "circuit_breaker": self.circuit_breaker.stats(),
+            "retries": {"performed": self.retries, "max_per_request": self.max_retries, "budget": self.retry_budget.stats()},
+            "hedging": {"enabled": self.hedging_enabled, "sent": self.hedges_sent, "won": self.hedges_won},
+            "prewarms": self.prewarms
+        }
\ No newline at end of file
@@ -0,0 +1,146 @@
+# app/services/prompt_builder.py
+import math
+import re
+from typing import Dict, Any, List, Optional
+
+# Comptage exact si le paquet optionnel `tiktoken` est installé, estimation sinon
+try:
+    import tiktoken
+    _ENCODING = tiktoken.get_encoding("cl100k_base")
+except ImportError:
+    _ENCODING = None
+
+# Coût fixe d'un message dans le format chat (rôle + séparateurs)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# Préfixe système statique : identique pour toutes les requêtes,
+# il peut donc être mis en cache côté fournisseur (prompt caching)
+SYSTEM_PREFIX = """Tu es Auriance, un assistant santé bienveillant et prudent spécialisé dans l'accompagnement quotidien des patients et soignants.
+
+🔒 RÈGLES STRICTES À RESPECTER:
+- NE JAMAIS faire de diagnostic médical
+- NE JAMAIS recommander de médicaments spécifiques
+- Toujours orienter vers un professionnel de santé pour les symptômes sérieux
+- Donner des conseils généraux de bien-être basés sur des preuves scientifiques
+- Être empathique, encourageant et personnalisé
+- Répondre en français naturel et chaleureux
+- Limiter la réponse à 2-3 phrases maximum
+
+💡 DOMAINES D'EXPERTISE AUTORISÉS:
+- Hygiène de vie (sommeil, nutrition, activité physique)
+- Gestion du stress et bien-être mental
+- Conseils généraux de prévention
+- Accompagnement des habitudes santé"""
+
+SUMMARY_HEADER = "Résumé de la conversation précédente:"
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s")
+
+
+def count_tokens(text: str) -> int:
+    """Nombre de tokens d'un texte (estimation ~4 caractères/token sans tiktoken)"""
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text))
+    return math.ceil(len(text) / 4)
+
+
+def count_message_tokens(message: Dict[str, str]) -> int:
+    return count_tokens(message["content"]) + MESSAGE_OVERHEAD_TOKENS
+
+
+class PromptBuilder:
+    """
+    Construit les messages chat dans un budget de tokens :
+    préfixe système statique, profil, résumé glissant, historique récent, message.
+    Les tours les plus anciens qui ne tiennent pas dans le budget sont compactés
+    dans le résumé.
+    """
+
+    def __init__(self, max_prompt_tokens: int = 1500, max_summary_tokens: int = 200,
+                 summary_line_chars: int = 120):
+        self.max_prompt_tokens = max_prompt_tokens
+        self.max_summary_tokens = max_summary_tokens
+        self.summary_line_chars = summary_line_chars
+        self._system_message = {"role": "system", "content": SYSTEM_PREFIX}
+        self._system_tokens = count_message_tokens(self._system_message)
+        self._summary_overhead = count_tokens(SUMMARY_HEADER) + MESSAGE_OVERHEAD_TOKENS + 1
+
+    def build(self, user_message: str, context: Dict) -> Dict[str, Any]:
+        """
+        Retourne {"messages", "summary", "compacted_messages", "token_counts"}.
+        `compacted_messages` = nombre de messages d'historique (les plus anciens)
+        passés dans le résumé.
+        """
+        profile_message = self._render_profile(context.get("user_profile") or {})
+        user = {"role": "user", "content": user_message}
+        history = [
+            {"role": turn.get("role", "user"), "content": turn.get("message", "")}
+            for turn in context.get("conversation_history", [])
+        ]
+
+        fixed_tokens = self._system_tokens + count_message_tokens(user)
+        if profile_message:
+            fixed_tokens += count_message_tokens(profile_message)
+
+        # On garde les tours les plus récents tant qu'ils tiennent dans le budget,
+        # en réservant la place du résumé
+        summary = context.get("conversation_summary") or ""
+        budget = self.max_prompt_tokens - fixed_tokens - self.max_summary_tokens - self._summary_overhead
+        kept: List[Dict[str, str]] = []
+        for message in reversed(history):
+            cost = count_message_tokens(message)
+            if cost > budget:
+                break
+            kept.append(message)
+            budget -= cost
+        kept.reverse()
+
+        compacted = history[:len(history) - len(kept)]
+        if compacted:
+            summary = self._compact(summary, compacted)
+        summary_message = {"role": "system", "content": f"{SUMMARY_HEADER}\n{summary}"} if summary else None
+
+        messages = [self._system_message]
+        if profile_message:
+            messages.append(profile_message)
+        if summary_message:
+            messages.append(summary_message)
+        messages.extend(kept)
+        messages.append(user)
+
+        token_counts = {
+            "system": self._system_tokens,
+            "profile": count_message_tokens(profile_message) if profile_message else 0,
+            "summary": count_message_tokens(summary_message) if summary_message else 0,
+            "history": sum(count_message_tokens(m) for m in kept),
+            "user": count_message_tokens(user),
+        }
+        token_counts["total"] = sum(token_counts.values())
+
+        return {
+            "messages": messages,
+            "summary": summary,
+            "compacted_messages": len(compacted),
+            "token_counts": token_counts,
+        }
+
+    def _render_profile(self, profile: Dict) -> Optional[Dict[str, str]]:
+        if not profile:
+            return None
+        lines = [f"- {key}: {value}" for key, value in profile.items() if value not in (None, "", [], {})]
+        if not lines:
+            return None
+        return {"role": "system", "content": "Profil utilisateur:\n" + "\n".join(lines)}
+
+    def _compact(self, summary: str, messages: List[Dict[str, str]]) -> str:
+        """Résumé extractif : première phrase de chaque message, en gardant les plus récents"""
+        lines = summary.splitlines() if summary else []
+        for message in messages:
+            speaker = "Utilisateur" if message["role"] == "user" else "Auriance"
+            first_sentence = _SENTENCE_END.split(message["content"].strip(), maxsplit=1)[0]
+            if len(first_sentence) > self.summary_line_chars:
+                first_sentence = first_sentence[:self.summary_line_chars].rstrip() + "…"
+            lines.append(f"- {speaker}: {first_sentence}")
+
+        while lines and count_tokens("\n".join(lines)) > self.max_summary_tokens:
+            lines.pop(0)
+        return "\n".join(lines)
@@ -0,0 +1,203 @@
+# app/services/response_cache.py
+import asyncio
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+
+_PUNCTUATION = re.compile(r"[^\w\s]+")
+_SPACES = re.compile(r"\s+")
+
+
+def normalize_message(message: str) -> str:
+    """Normalise un message pour le rendre comparable (casse, ponctuation, espaces)"""
+    text = unicodedata.normalize("NFKC", message).lower()
+    text = _PUNCTUATION.sub(" ", text)
+    return _SPACES.sub(" ", text).strip()
+
+
+def hash_context(context: Dict) -> str:
+    """Empreinte stable de la partie du contexte qui influence la réponse"""
+    relevant = {
+        "user_profile": context.get("user_profile", {}),
+        "conversation_history": context.get("conversation_history", []),
+        "conversation_summary": context.get("conversation_summary", ""),
+    }
+    payload = json.dumps(relevant, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+# ----------------------------------------------------------------------
+# Backends
+# ----------------------------------------------------------------------
+class InMemoryCacheBackend:
+    """Cache LRU + TTL local au processus"""
+
+    blocking = False
+
+    def __init__(self, max_entries: int = 10_000, ttl_seconds: float = 86400.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.evictions = 0
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[str]:
+        item = self._data.get(key)
+        if item is None:
+            return None
+        value, stored_at = item
+        if time.time() - stored_at > self.ttl_seconds:
+            del self._data[key]
+            self.evictions += 1
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: str):
+        self._data[key] = (value, time.time())
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def size(self) -> int:
+        return len(self._data)
+
+
+class SQLiteCacheBackend:
+    """Cache LRU + TTL dans un fichier SQLite partagé entre workers"""
+
+    blocking = True
+
+    def __init__(self, path: str, max_entries: int = 10_000, ttl_seconds: float = 86400.0):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=5)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_response_cache ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL,"
+            " stored_at REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS ix_llm_response_cache_last_access"
+            " ON llm_response_cache (last_access)"
+        )
+        # Nombre d'entrées, recompté à chaque écriture (le fichier est partagé entre workers) :
+        # stats() le lit sans requête depuis la boucle d'événements
+        self._size = self._count()
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, stored_at FROM llm_response_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if now - row[1] > self.ttl_seconds:
+                self._conn.execute("DELETE FROM llm_response_cache WHERE key = ?", (key,))
+                self.evictions += 1
+                self._size = max(0, self._size - 1)
+                return None
+            self._conn.execute(
+                "UPDATE llm_response_cache SET last_access = ? WHERE key = ?", (now, key)
+            )
+            return row[0]
+
+    def set(self, key: str, value: str):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_response_cache (key, value, stored_at, last_access)"
+                " VALUES (?, ?, ?, ?)",
+                (key, value, now, now),
+            )
+            self._size = self._count()
+            excess = self._size - self.max_entries
+            if excess > 0:
+                cursor = self._conn.execute(
+                    "DELETE FROM llm_response_cache WHERE key IN ("
+                    " SELECT key FROM llm_response_cache ORDER BY last_access LIMIT ?)",
+                    (excess,),
+                )
+                self.evictions += cursor.rowcount
+                self._size -= cursor.rowcount
+
+    def size(self) -> int:
+        return self._size
+
+    def _count(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM llm_response_cache").fetchone()[0]
+
+
+# ----------------------------------------------------------------------
+# Cache de réponses
+# ----------------------------------------------------------------------
+class ResponseCache:
+    """
+    Cache des réponses LLM, indexé par message normalisé + empreinte du contexte.
+    Seules les réponses validées comme sûres doivent y être stockées.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+
+    @classmethod
+    def from_env(cls) -> Optional["ResponseCache"]:
+        kind = os.getenv("LLM_CACHE_BACKEND", "memory").lower()
+        max_entries = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "10000"))
+        ttl_seconds = float(os.getenv("LLM_CACHE_TTL_SECONDS", "86400"))
+        if kind == "none":
+            return None
+        if kind == "sqlite":
+            path = os.getenv("LLM_CACHE_PATH", "./llm_cache.sqlite3")
+            return cls(SQLiteCacheBackend(path, max_entries, ttl_seconds))
+        return cls(InMemoryCacheBackend(max_entries, ttl_seconds))
+
+    @staticmethod
+    def make_key(user_message: str, context: Dict) -> str:
+        return f"{normalize_message(user_message)}|{hash_context(context)}"
+
+    async def get(self, key: str) -> Optional[str]:
+        value = await self._run(self.backend.get, key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def set(self, key: str, value: str):
+        await self._run(self.backend.set, key, value)
+        self.stores += 1
+
+    async def _run(self, fn, *args):
+        # Le backend SQLite fait des I/O disque : on le sort de la boucle d'événements
+        if self.backend.blocking:
+            return await asyncio.to_thread(fn, *args)
+        return fn(*args)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "stores": self.stores,
+            "evictions": self.backend.evictions,
+            "size": self.backend.size(),
+        }
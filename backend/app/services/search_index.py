@@ -0,0 +1,152 @@
+# app/services/search_index.py
+import math
+import re
+import unicodedata
+from array import array
+from collections import Counter
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Mots vides français (sans accents : comparés après normalisation)
+STOP_WORDS = frozenset("""
+    le la les un une des de du et ou au aux en dans par pour sur avec sans sous chez entre
+    ce cet cette ces se sa son ses mon ma mes ton ta tes notre nos votre vos leur leurs
+    je tu il elle on nous vous ils elles me te lui eux moi toi qui que quoi dont
+    ne pas plus moins est sont etre avoir ai as avez ont eu fait faire
+    tres comme mais donc car si tout tous toute toutes ca cela ceci celui celle
+    quand aussi encore deja meme alors puis
+""".split())
+
+# Suffixes retirés par la racinisation légère, du plus long au plus court
+SUFFIXES = tuple(sorted("""
+    issements issement atrices atrice ateurs ateur ations ation ements ement ments ment
+    ences ence ances ance ites ite iques ique ismes isme istes iste ables able
+    euses euse eux ives ive ifs if eurs eur ees ee es er ez ir e s x
+""".split(), key=len, reverse=True))
+MIN_STEM = 4
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def fold(text: str) -> str:
+    """Minuscules sans accents ("Été" -> "ete")"""
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+
+@lru_cache(maxsize=100_000)
+def stem(word: str) -> str:
+    """
+    Racinisation légère : un seul suffixe retiré (pluriel, féminin, dérivation courante),
+    en gardant au moins 4 lettres. "hydratation" et "hydrater" -> "hydrat".
+    """
+    if len(word) <= MIN_STEM or word.isdigit():
+        return word
+    for suffix in SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= MIN_STEM:
+            return word[:-len(suffix)]
+    return word
+
+
+def tokenize(text: str) -> List[str]:
+    """Texte -> termes indexés : accents retirés, mots vides et lettres isolées ignorés, racinisés"""
+    return [
+        stem(word) for word in _WORD.findall(fold(text))
+        if word not in STOP_WORDS and (len(word) > 1 or word.isdigit())
+    ]
+
+
+class BM25Index:
+    """
+    Index inversé classé par BM25, mis à jour au fil des ajouts.
+
+    Chaque terme pointe vers deux tableaux compacts (documents, fréquences) ; une
+    requête ne parcourt que les listes de ses termes et cumule les scores en NumPy.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.doc_ids: List[Any] = []      # position interne -> identifiant du document
+        self._lengths = array("i")        # nombre de termes de chaque document
+        self._total_length = 0
+        self._postings: Dict[str, Tuple[array, array]] = {}
+        self._norms: Optional[np.ndarray] = None   # k1 x normalisation de longueur, recalculée après ajout
+        self._weights: Dict[str, np.ndarray] = {}   # poids BM25 par terme interrogé, jusqu'au prochain ajout
+
+    def __len__(self) -> int:
+        return len(self.doc_ids)
+
+    @property
+    def terms(self) -> int:
+        return len(self._postings)
+
+    def add(self, doc_id: Any, text: str) -> int:
+        """Indexe un document ; renvoie sa position interne"""
+        tokens = tokenize(text)
+        position = len(self.doc_ids)
+        self.doc_ids.append(doc_id)
+        self._lengths.append(len(tokens))
+        self._total_length += len(tokens)
+        for term, frequency in Counter(tokens).items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = (array("i"), array("i"))
+            postings[0].append(position)
+            postings[1].append(frequency)
+        self._norms = None
+        self._weights.clear()
+        return position
+
+    def search(self, query: str, limit: int = 10) -> List[Tuple[Any, float]]:
+        """(identifiant, score) des `limit` meilleurs documents, score décroissant"""
+        count = len(self.doc_ids)
+        terms = [term for term in set(tokenize(query)) if term in self._postings]
+        if not count or not terms or limit <= 0:
+            return []
+
+        scores = np.zeros(count, dtype=np.float32)
+        matched = []
+        for term in terms:
+            # Vue sans copie sur le tableau (libérée avant tout nouvel ajout)
+            positions = np.frombuffer(self._postings[term][0], dtype=np.int32)
+            scores[positions] += self._term_weights(term, positions)
+            matched.append(positions)
+
+        # Candidats : les documents des listes parcourues, jamais tout l'index. Un document
+        # y figure au plus une fois par terme : les `limit` x termes meilleures entrées
+        # contiennent forcément les `limit` meilleurs documents.
+        candidates = np.concatenate(matched) if len(matched) > 1 else matched[0]
+        keep = limit * len(matched)
+        if len(candidates) > keep:
+            candidates = candidates[np.argpartition(scores[candidates], -keep)[-keep:]]
+        candidates = np.unique(candidates)
+        ranked = candidates[np.argsort(-scores[candidates], kind="stable")][:limit]
+        return [(self.doc_ids[position], float(scores[position])) for position in ranked]
+
+    def _term_weights(self, term: str, positions: np.ndarray) -> np.ndarray:
+        """Contribution BM25 du terme à chacun de ses documents (idf x saturation de tf)"""
+        weights = self._weights.get(term)
+        if weights is not None:
+            return weights
+        count = len(self.doc_ids)
+        if self._norms is None:
+            lengths = np.array(self._lengths, dtype=np.float32)
+            average = self._total_length / count or 1.0
+            self._norms = self.k1 * (1 - self.b + self.b * lengths / average)
+        tf = np.array(self._postings[term][1], dtype=np.float32)
+        df = len(positions)
+        idf = math.log(1 + (count - df + 0.5) / (df + 0.5))
+        weights = self._weights[term] = idf * tf * (self.k1 + 1) / (tf + self._norms[positions])
+        return weights
+
+    def stats(self) -> Dict[str, Any]:
+        count = len(self.doc_ids)
+        return {
+            "documents": count,
+            "terms": len(self._postings),
+            "postings": sum(len(docs) for docs, _ in self._postings.values()),
+            "avg_document_terms": round(self._total_length / count, 2) if count else 0.0,
+        }
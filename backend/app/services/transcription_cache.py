@@ -0,0 +1,172 @@
+# app/services/transcription_cache.py
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+
+
+class TranscriptionCache:
+    """
+    Cache disque des transcriptions, adressé par contenu.
+
+    Clé = empreinte SHA-256 de l'audio + langue demandée ; une entrée = un petit
+    fichier JSON (texte, langue, analyse, intention, modèle utilisé). La taille totale est bornée
+    et les entrées les moins récemment utilisées sont supprimées en premier.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 100 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.purged = 0
+        self._index: "OrderedDict[str, int]" = OrderedDict()   # clé -> taille, ordre LRU
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._load_index()
+
+    @classmethod
+    def from_env(cls) -> Optional["TranscriptionCache"]:
+        if os.getenv("VOICE_CACHE_ENABLED", "1") != "1":
+            return None
+        return cls(
+            directory=os.getenv("VOICE_CACHE_DIR", "./transcription_cache"),
+            max_bytes=int(os.getenv("VOICE_CACHE_MAX_BYTES", str(100 * 1024 * 1024)))
+        )
+
+    @staticmethod
+    def make_key(audio_hash: str, language: Optional[str]) -> str:
+        return f"{audio_hash}-{language or 'auto'}"
+
+    # ------------------------------------------------------------------
+    # API asynchrone (les accès disque sortent de la boucle d'événements)
+    # ------------------------------------------------------------------
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        value = await asyncio.to_thread(self._get, key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def set(self, key: str, value: Dict[str, Any]):
+        await asyncio.to_thread(self._set, key, value)
+        self.stores += 1
+
+    async def purge(self, audio_hash: Optional[str] = None) -> int:
+        """Supprime les entrées d'un audio (toutes langues), ou tout le cache"""
+        removed = await asyncio.to_thread(self._purge, audio_hash)
+        self.purged += removed
+        return removed
+
+    # ------------------------------------------------------------------
+    # Interne
+    # ------------------------------------------------------------------
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def _load_index(self):
+        """Reconstruit l'index LRU depuis le disque (date d'accès = mtime)"""
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith(".json"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, name[:-5], stat.st_size))
+        for _, key, size in sorted(entries):
+            self._index[key] = size
+            self._total_bytes += size
+        self._evict()
+
+    def _get(self, key: str) -> Optional[Dict[str, Any]]:
+        # Le fichier fait foi : une entrée peut avoir été écrite par un autre worker
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                value = json.load(f)
+            now = time.time()
+            os.utime(path, (now, now))
+            size = os.path.getsize(path)
+        except (OSError, ValueError):
+            self._forget(key)
+            return None
+        with self._lock:
+            self._total_bytes += size - self._index.pop(key, 0)
+            self._index[key] = size
+        return value
+
+    def _set(self, key: str, value: Dict[str, Any]):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        payload = json.dumps(value, ensure_ascii=False).encode("utf-8")
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(payload)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._total_bytes += len(payload) - self._index.pop(key, 0)
+            self._index[key] = len(payload)
+            self._evict()
+
+    def _evict(self):
+        while self._total_bytes > self.max_bytes and self._index:
+            key, size = self._index.popitem(last=False)
+            self._total_bytes -= size
+            self.evictions += 1
+            self._remove_file(key)
+
+    def _purge(self, audio_hash: Optional[str]) -> int:
+        # On parcourt le disque (et pas seulement l'index) : d'autres workers ont pu écrire
+        if audio_hash is None:
+            folders = [os.path.join(self.directory, name) for name in os.listdir(self.directory)]
+        else:
+            folders = [os.path.join(self.directory, audio_hash[:2])]
+        keys = []
+        for folder in folders:
+            if not os.path.isdir(folder):
+                continue
+            for name in os.listdir(folder):
+                if name.endswith(".json") and (audio_hash is None or name.startswith(f"{audio_hash}-")):
+                    keys.append(name[:-5])
+        with self._lock:
+            for key in keys:
+                self._total_bytes -= self._index.pop(key, 0)
+                self._remove_file(key)
+        return len(keys)
+
+    def _forget(self, key: str):
+        with self._lock:
+            size = self._index.pop(key, None)
+            if size is not None:
+                self._total_bytes -= size
+
+    def _remove_file(self, key: str):
+        try:
+            os.unlink(self._path(key))
+        except OSError:
+            pass
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._index),
+            "total_bytes": self._total_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "stores": self.stores,
+            "evictions": self.evictions,
+            "purged": self.purged,
+        }
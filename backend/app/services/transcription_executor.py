@@ -0,0 +1,153 @@
+# app/services/transcription_executor.py
+import asyncio
+import math
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Dict, Any, Callable, List, Optional
+
+import numpy as np
+
+from app.services.whisper_pool import WhisperModelPool, SAMPLE_RATE, transcribe_batch
+
+
+class TranscriptionQueueFullError(Exception):
+    """File d'attente de transcription pleine : le client doit réessayer plus tard"""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"File de transcription pleine, réessayer dans {retry_after}s")
+        self.retry_after = retry_after
+
+
+class TranscriptionTimeoutError(Exception):
+    """Attente d'un worker de transcription trop longue"""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Aucun worker de transcription libre, réessayer dans {retry_after}s")
+        self.retry_after = retry_after
+
+
+class TranscriptionExecutor:
+    """
+    Exécute l'inférence Whisper hors de la boucle d'événements.
+
+    - un thread par modèle du pool (torch relâche le GIL pendant l'inférence)
+    - file d'attente bornée : au-delà de `max_queue` requêtes en attente, refus immédiat
+    - attente bornée : au-delà de `max_wait_seconds` sans worker libre, refus
+    """
+
+    def __init__(self, model_pool: WhisperModelPool, max_queue: int = 16,
+                 max_wait_seconds: float = 30.0, wait_samples: int = 500, batch_size: int = 8):
+        self.model_pool = model_pool
+        self.max_queue = max_queue
+        self.max_wait_seconds = max_wait_seconds
+        self.batch_size = batch_size
+        self._threads = ThreadPoolExecutor(max_workers=model_pool.capacity, thread_name_prefix="whisper")
+
+        self.waiting = 0
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self._wait_times: deque = deque(maxlen=wait_samples)
+        self._run_times: deque = deque(maxlen=wait_samples)
+
+    @classmethod
+    def from_env(cls, model_pool: WhisperModelPool) -> "TranscriptionExecutor":
+        return cls(
+            model_pool,
+            max_queue=int(os.getenv("TRANSCRIPTION_MAX_QUEUE", "16")),
+            max_wait_seconds=float(os.getenv("TRANSCRIPTION_MAX_WAIT_SECONDS", "30")),
+            batch_size=int(os.getenv("TRANSCRIPTION_BATCH_SIZE", "8"))
+        )
+
+    async def transcribe(self, audio, tier: Optional[str] = None, **options) -> Dict[str, Any]:
+        """`model.transcribe(audio, **options)` sur un worker dédié (modèle du palier `tier`)"""
+        return await self._run(
+            lambda model: model.transcribe(audio, **options), len(audio) / SAMPLE_RATE, tier
+        )
+
+    async def transcribe_batch(self, chunks: List[np.ndarray], tier: Optional[str] = None,
+                               **options) -> Dict[str, Any]:
+        """Morceaux ≤ 30 s décodés en un passage batché sur un worker dédié"""
+        return await self._run(
+            lambda model: transcribe_batch(model, chunks, self.batch_size, **options),
+            sum(len(chunk) for chunk in chunks) / SAMPLE_RATE, tier
+        )
+
+    async def _run(self, inference: Callable, audio_seconds: float, tier: Optional[str]) -> Dict[str, Any]:
+        # Capacité totale : un job par worker + `max_queue` jobs en attente
+        if self.waiting + self.running >= self.model_pool.capacity + self.max_queue:
+            self.rejected += 1
+            raise TranscriptionQueueFullError(self.retry_after())
+
+        self.waiting += 1
+        start = time.perf_counter()
+        try:
+            model = await self.model_pool.acquire(timeout=self.max_wait_seconds, tier=tier)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise TranscriptionTimeoutError(self.retry_after())
+        finally:
+            self.waiting -= 1
+        self._wait_times.append(time.perf_counter() - start)
+
+        self.running += 1
+        run_start = time.perf_counter()
+        future = asyncio.get_running_loop().run_in_executor(self._threads, partial(inference, model))
+        # Le modèle n'est rendu qu'une fois l'inférence terminée : shield empêche
+        # une requête annulée (client parti) de le libérer pendant que le thread s'en sert
+        future.add_done_callback(lambda f: self._finish(model, f, run_start, audio_seconds))
+        result = await asyncio.shield(future)
+        return {**result, "model": self.model_pool.tier_of(model)}
+
+    def _finish(self, model, future: asyncio.Future, run_start: float, audio_seconds: float):
+        self.running -= 1
+        run_seconds = time.perf_counter() - run_start
+        self._run_times.append(run_seconds)
+        if future.cancelled() or future.exception() is not None:
+            self.failed += 1
+        else:
+            self.completed += 1
+            self.model_pool.record_run(self.model_pool.tier_of(model), audio_seconds, run_seconds)
+        self.model_pool.release(model)
+
+    def choose_tier(self, duration_seconds: float, latency_budget_ms: Optional[float] = None) -> str:
+        """Palier Whisper pour un clip, compte tenu de l'attente actuelle dans la file"""
+        return self.model_pool.select_tier(duration_seconds, latency_budget_ms, self.estimated_wait())
+
+    def estimated_wait(self) -> float:
+        """Attente estimée (secondes) avant qu'un worker se libère"""
+        if self.waiting + self.running < self.model_pool.capacity:
+            return 0.0
+        avg_run = sum(self._run_times) / len(self._run_times) if self._run_times else 5.0
+        return avg_run * (self.waiting + 1) / max(1, self.model_pool.capacity)
+
+    def retry_after(self) -> int:
+        """Estimation (secondes) du temps pour écouler la file actuelle"""
+        avg_run = sum(self._run_times) / len(self._run_times) if self._run_times else 5.0
+        backlog = (self.waiting + self.running) / max(1, self.model_pool.capacity)
+        return max(1, math.ceil(avg_run * max(1.0, backlog)))
+
+    def shutdown(self):
+        self._threads.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> Dict[str, Any]:
+        waits = sorted(self._wait_times)
+        return {
+            "workers": self.model_pool.capacity,
+            "queue_depth": self.waiting,
+            "running": self.running,
+            "max_queue": self.max_queue,
+            "max_wait_seconds": self.max_wait_seconds,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "timeouts": self.timeouts,
+            "avg_wait_ms": round(sum(waits) / len(waits) * 1000, 2) if waits else 0.0,
+            "p95_wait_ms": round(waits[min(len(waits) - 1, int(0.95 * len(waits)))] * 1000, 2) if waits else 0.0,
+            "avg_run_ms": round(sum(self._run_times) / len(self._run_times) * 1000, 2) if self._run_times else 0.0,
+        }
@@ -0,0 +1,495 @@
+# app/services/transcription_jobs.py
+import asyncio
+import json
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional, AsyncIterator, Set, Tuple
+
+import aiofiles
+
+from app.core.database import Base, SessionLocal, engine
+from app.models.transcription_job import TranscriptionJob, TranscriptionJobItem
+from app.services.audio_decoding import CHUNK_SIZE, MAX_UPLOAD_BYTES, AudioTooLargeError, hash_file
+from app.services.transcription_executor import TranscriptionQueueFullError, TranscriptionTimeoutError
+from app.services.voice_service import VoiceService
+from app.services.whisper_pool import ModelNotReadyError
+
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+CANCELLED = "cancelled"
+TERMINAL_STATES = (COMPLETED, FAILED, CANCELLED)
+
+# Éléments candidats lus à chaque tentative de prise (les premiers peuvent être pris par un autre worker)
+CLAIM_CANDIDATES = 8
+
+
+class JobNotFoundError(Exception):
+    """Job de transcription inconnu"""
+
+
+class TranscriptionJobManager:
+    """
+    Jobs de transcription par lots (notes vocales en masse).
+
+    Les fichiers sont déposés dans un répertoire de spool (partagé par les
+    processus) et la base sert de file : chaque worker, quel que soit le
+    processus qui a reçu le job, prend atomiquement l'élément en file le plus
+    prioritaire (puis le plus ancien) et le marque à son nom. Tant qu'il le
+    traite, son processus rafraîchit un heartbeat ; un élément "running" dont
+    le heartbeat a expiré (processus arrêté ou planté) est remis en file.
+    """
+
+    def __init__(self, voice_service: VoiceService, spool_dir: str, workers: int,
+                 session_factory=SessionLocal, poll_seconds: float = 1.0,
+                 heartbeat_seconds: float = 10.0, stale_seconds: float = 60.0):
+        self.voice_service = voice_service
+        self.spool_dir = spool_dir
+        self.workers = workers
+        self.session_factory = session_factory
+        self.poll_seconds = poll_seconds
+        self.heartbeat_seconds = heartbeat_seconds
+        self.stale_seconds = stale_seconds
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._wakeup = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+        self._changed: Dict[str, Set[asyncio.Event]] = {}   # job_id -> un événement par observateur
+
+        self.claimed = 0
+        self.processed = 0
+        self.failed = 0
+        self.requeued = 0
+        self.recovered = 0
+        self.lost = 0
+        os.makedirs(spool_dir, exist_ok=True)
+
+    @classmethod
+    def from_env(cls, voice_service: VoiceService) -> "TranscriptionJobManager":
+        return cls(
+            voice_service,
+            spool_dir=os.getenv("VOICE_JOB_SPOOL_DIR", "./transcription_spool"),
+            workers=int(os.getenv("VOICE_JOB_WORKERS", str(voice_service.model_pool.capacity))),
+            poll_seconds=float(os.getenv("VOICE_JOB_POLL_SECONDS", "1")),
+            heartbeat_seconds=float(os.getenv("VOICE_JOB_HEARTBEAT_SECONDS", "10")),
+            stale_seconds=float(os.getenv("VOICE_JOB_STALE_SECONDS", "60"))
+        )
+
+    # ------------------------------------------------------------------
+    # Cycle de vie
+    # ------------------------------------------------------------------
+    async def start(self):
+        """Crée les tables, reprend les éléments abandonnés, démarre les workers et le heartbeat"""
+        await asyncio.to_thread(
+            Base.metadata.create_all, bind=self.session_factory.kw.get("bind") or engine,
+            tables=[TranscriptionJob.__table__, TranscriptionJobItem.__table__]
+        )
+        await self._recover()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._heartbeat()))
+
+    async def aclose(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        # Arrêt propre : nos éléments en cours repartent tout de suite en file
+        released = await asyncio.to_thread(self._release_owned)
+        if released:
+            print(f"🔁 {released} élément(s) de transcription rendu(s) à la file")
+
+    async def _heartbeat(self):
+        while True:
+            await asyncio.sleep(self.heartbeat_seconds)
+            try:
+                await asyncio.to_thread(self._beat)
+                await self._recover()
+            except Exception as e:
+                print(f"⚠️  Heartbeat des jobs de transcription: {e}")
+
+    async def _recover(self):
+        recovered = await asyncio.to_thread(self._requeue_stale)
+        if recovered:
+            self.recovered += recovered
+            self._wakeup.set()
+            print(f"🔁 {recovered} élément(s) de transcription abandonné(s) remis en file")
+
+    def _beat(self):
+        db = self.session_factory()
+        try:
+            db.query(TranscriptionJobItem) \
+                .filter(TranscriptionJobItem.owner == self.owner, TranscriptionJobItem.status == RUNNING) \
+                .update({"heartbeat_at": datetime.utcnow()}, synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+
+    def _requeue_stale(self) -> int:
+        """Remet en file les éléments "running" dont le processus ne donne plus signe de vie"""
+        deadline = datetime.utcnow() - timedelta(seconds=self.stale_seconds)
+        db = self.session_factory()
+        try:
+            requeued = (
+                db.query(TranscriptionJobItem)
+                .filter(
+                    TranscriptionJobItem.status == RUNNING,
+                    (TranscriptionJobItem.heartbeat_at == None) | (TranscriptionJobItem.heartbeat_at < deadline)  # noqa: E711
+                )
+                .update({"status": QUEUED, "owner": None, "heartbeat_at": None}, synchronize_session=False)
+            )
+            db.commit()
+            return requeued
+        finally:
+            db.close()
+
+    def _release_owned(self) -> int:
+        db = self.session_factory()
+        try:
+            released = (
+                db.query(TranscriptionJobItem)
+                .filter(TranscriptionJobItem.owner == self.owner, TranscriptionJobItem.status == RUNNING)
+                .update({"status": QUEUED, "owner": None, "heartbeat_at": None}, synchronize_session=False)
+            )
+            db.commit()
+            return released
+        finally:
+            db.close()
+
+    # ------------------------------------------------------------------
+    # Création
+    # ------------------------------------------------------------------
+    async def create_job(self, uploads, priority: int = 5) -> Dict[str, Any]:
+        """Dépose les fichiers dans le spool puis enregistre et met en file le job"""
+        job_id = uuid.uuid4().hex
+        job_dir = os.path.join(self.spool_dir, job_id)
+        os.makedirs(job_dir, exist_ok=True)
+
+        spooled = []
+        try:
+            for position, upload in enumerate(uploads):
+                path = os.path.join(job_dir, f"{position:05d}")
+                await self._spool(upload, path)
+                spooled.append((position, upload.filename, path))
+        except BaseException:
+            for _, _, path in spooled:
+                _remove(path)
+            _remove(os.path.join(job_dir, f"{len(spooled):05d}"))
+            raise
+
+        await asyncio.to_thread(self._insert_job, job_id, priority, spooled)
+        self._wakeup.set()
+        return await self.get_job(job_id, include_items=False)
+
+    async def _spool(self, upload, path: str):
+        written = 0
+        async with aiofiles.open(path, "wb") as f:
+            while True:
+                chunk = await upload.read(CHUNK_SIZE)
+                if not chunk:
+                    return
+                written += len(chunk)
+                if written > MAX_UPLOAD_BYTES:
+                    raise AudioTooLargeError(
+                        f"{upload.filename}: fichier audio trop volumineux (max {MAX_UPLOAD_BYTES} octets)"
+                    )
+                await f.write(chunk)
+
+    def _insert_job(self, job_id: str, priority: int, spooled):
+        db = self.session_factory()
+        try:
+            job = TranscriptionJob(id=job_id, priority=priority, total_items=len(spooled))
+            job.items = [
+                TranscriptionJobItem(position=position, filename=filename, spool_path=path)
+                for position, filename, path in spooled
+            ]
+            db.add(job)
+            db.commit()
+        finally:
+            db.close()
+
+    # ------------------------------------------------------------------
+    # Workers
+    # ------------------------------------------------------------------
+    async def _worker(self):
+        while True:
+            try:
+                if not self.voice_service.model_pool.ready:
+                    # Modèle pas encore chargé : les éléments restent en file pour les autres processus
+                    await asyncio.sleep(1.0)
+                    continue
+                claimed = await asyncio.to_thread(self._claim_next)
+                if claimed is None:
+                    await self._wait_for_work()
+                    continue
+                await self._process(*claimed)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"❌ Erreur worker de transcription: {e}")
+                await asyncio.sleep(self.poll_seconds)
+
+    async def _wait_for_work(self):
+        # Réveil immédiat pour un job reçu par ce processus, scrutation de la base pour les autres
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_seconds)
+        except asyncio.TimeoutError:
+            pass
+        self._wakeup.clear()
+
+    async def _process(self, job_id: str, item_id: int, spool_path: str):
+        self.claimed += 1
+        self._notify(job_id)
+        try:
+            audio_hash = await asyncio.to_thread(hash_file, spool_path)
+            result = await self.voice_service.transcribe_stream(_iter_file(spool_path), audio_hash=audio_hash)
+        except (TranscriptionQueueFullError, TranscriptionTimeoutError) as e:
+            # File interactive saturée : le lot passe après, on réessaie plus tard
+            await asyncio.to_thread(self._release, item_id)
+            self.requeued += 1
+            await asyncio.sleep(e.retry_after)
+            return
+        except ModelNotReadyError:
+            await asyncio.to_thread(self._release, item_id)
+            await asyncio.sleep(1.0)
+            return
+        except Exception as e:
+            error = str(e)
+            result = None
+        else:
+            error = None
+
+        finished = await asyncio.to_thread(self._finish_item, job_id, item_id, result, error)
+        if not finished:
+            # Heartbeat expiré entre-temps : l'élément a été repris par un autre processus
+            self.lost += 1
+            return
+        if error is None:
+            self.processed += 1
+        else:
+            self.failed += 1
+        _remove(spool_path)
+        self._notify(job_id)
+
+    def _claim_next(self) -> Optional[Tuple[str, int, str]]:
+        """
+        Prend l'élément en file le plus prioritaire : (job, élément, fichier), ou None.
+        La prise est un UPDATE conditionnel sur le statut : un seul processus l'obtient.
+        """
+        db = self.session_factory()
+        try:
+            candidates = (
+                db.query(TranscriptionJobItem.id, TranscriptionJobItem.job_id, TranscriptionJobItem.spool_path)
+                .join(TranscriptionJob, TranscriptionJob.id == TranscriptionJobItem.job_id)
+                .filter(TranscriptionJobItem.status == QUEUED, TranscriptionJob.status.in_([QUEUED, RUNNING]))
+                .order_by(TranscriptionJob.priority.desc(), TranscriptionJob.created_at, TranscriptionJobItem.position)
+                .limit(CLAIM_CANDIDATES)
+                .all()
+            )
+            for item_id, job_id, spool_path in candidates:
+                now = datetime.utcnow()
+                claimed = (
+                    db.query(TranscriptionJobItem)
+                    .filter(TranscriptionJobItem.id == item_id, TranscriptionJobItem.status == QUEUED)
+                    .update({"status": RUNNING, "owner": self.owner, "heartbeat_at": now},
+                            synchronize_session=False)
+                )
+                if not claimed:
+                    db.rollback()   # pris entre-temps par un autre worker
+                    continue
+                db.query(TranscriptionJob) \
+                    .filter(TranscriptionJob.id == job_id, TranscriptionJob.status == QUEUED) \
+                    .update({"status": RUNNING, "started_at": now}, synchronize_session=False)
+                db.commit()
+                return job_id, item_id, spool_path
+            return None
+        finally:
+            db.close()
+
+    def _release(self, item_id: int):
+        db = self.session_factory()
+        try:
+            db.query(TranscriptionJobItem) \
+                .filter(TranscriptionJobItem.id == item_id, TranscriptionJobItem.owner == self.owner,
+                        TranscriptionJobItem.status == RUNNING) \
+                .update({"status": QUEUED, "owner": None, "heartbeat_at": None}, synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+
+    def _finish_item(self, job_id: str, item_id: int, result: Optional[Dict[str, Any]],
+                     error: Optional[str]) -> bool:
+        """Enregistre le résultat ; False si l'élément n'est plus à ce processus"""
+        db = self.session_factory()
+        try:
+            finished = (
+                db.query(TranscriptionJobItem)
+                .filter(TranscriptionJobItem.id == item_id, TranscriptionJobItem.owner == self.owner,
+                        TranscriptionJobItem.status == RUNNING)
+                .update({
+                    "status": COMPLETED if error is None else FAILED,
+                    "result": json.dumps(result, ensure_ascii=False) if result is not None else None,
+                    "error": error,
+                    "spool_path": None,
+                    "owner": None,
+                    "finished_at": datetime.utcnow(),
+                }, synchronize_session=False)
+            )
+            if not finished:
+                db.rollback()
+                return False
+
+            counter = TranscriptionJob.completed_items if error is None else TranscriptionJob.failed_items
+            db.query(TranscriptionJob).filter(TranscriptionJob.id == job_id) \
+                .update({counter: counter + 1}, synchronize_session=False)
+            job = db.query(TranscriptionJob).filter(TranscriptionJob.id == job_id).first()
+            db.refresh(job)
+            if job.status != CANCELLED and job.completed_items + job.failed_items >= job.total_items:
+                job.status = COMPLETED if job.completed_items else FAILED
+                job.finished_at = datetime.utcnow()
+            db.commit()
+            return True
+        finally:
+            db.close()
+
+    # ------------------------------------------------------------------
+    # Consultation
+    # ------------------------------------------------------------------
+    async def get_job(self, job_id: str, include_items: bool = True) -> Dict[str, Any]:
+        job = await asyncio.to_thread(self._read_job, job_id, include_items)
+        if job is None:
+            raise JobNotFoundError(job_id)
+        return job
+
+    def _read_job(self, job_id: str, include_items: bool) -> Optional[Dict[str, Any]]:
+        db = self.session_factory()
+        try:
+            job = db.query(TranscriptionJob).filter(TranscriptionJob.id == job_id).first()
+            if job is None:
+                return None
+            done = job.completed_items + job.failed_items
+            snapshot = {
+                "job_id": job.id,
+                "status": job.status,
+                "priority": job.priority,
+                "total_items": job.total_items,
+                "completed_items": job.completed_items,
+                "failed_items": job.failed_items,
+                "progress": round(done / job.total_items, 4) if job.total_items else 1.0,
+                "created_at": job.created_at.isoformat() if job.created_at else None,
+                "started_at": job.started_at.isoformat() if job.started_at else None,
+                "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+            }
+            if include_items:
+                snapshot["items"] = [
+                    {
+                        "position": item.position,
+                        "filename": item.filename,
+                        "status": item.status,
+                        "result": json.loads(item.result) if item.result else None,
+                        "error": item.error,
+                    }
+                    for item in sorted(job.items, key=lambda i: i.position)
+                ]
+            return snapshot
+        finally:
+            db.close()
+
+    async def watch_job(self, job_id: str, heartbeat_seconds: float = 2.0) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Produit l'état du job à chaque changement, jusqu'à un état terminal.
+        Le heartbeat relit la base même sans notification (job traité par un autre worker).
+        """
+        last = None
+        event = asyncio.Event()
+        try:
+            while True:
+                event.clear()
+                self._changed.setdefault(job_id, set()).add(event)
+                snapshot = await self.get_job(job_id, include_items=False)
+                if snapshot != last:
+                    yield snapshot
+                    last = snapshot
+                if snapshot["status"] in TERMINAL_STATES:
+                    if snapshot["status"] != CANCELLED:
+                        yield await self.get_job(job_id)
+                    return
+                try:
+                    await asyncio.wait_for(event.wait(), timeout=heartbeat_seconds)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            # Observateur parti (fin, job introuvable ou client déconnecté) : rien ne doit rester
+            waiters = self._changed.get(job_id)
+            if waiters is not None:
+                waiters.discard(event)
+                if not waiters:
+                    del self._changed[job_id]
+
+    async def cancel_job(self, job_id: str) -> Dict[str, Any]:
+        """Annule les éléments encore en file (ceux en cours se terminent)"""
+        paths = await asyncio.to_thread(self._cancel, job_id)
+        if paths is None:
+            raise JobNotFoundError(job_id)
+        for path in paths:
+            _remove(path)
+        self._notify(job_id)
+        return await self.get_job(job_id, include_items=False)
+
+    def _cancel(self, job_id: str) -> Optional[List[str]]:
+        db = self.session_factory()
+        try:
+            job = db.query(TranscriptionJob).filter(TranscriptionJob.id == job_id).first()
+            if job is None:
+                return None
+            if job.status in TERMINAL_STATES:
+                return []
+            items = db.query(TranscriptionJobItem).filter(
+                TranscriptionJobItem.job_id == job_id, TranscriptionJobItem.status == QUEUED
+            ).all()
+            paths = [item.spool_path for item in items if item.spool_path]
+            for item in items:
+                item.status = CANCELLED
+                item.spool_path = None
+            job.status = CANCELLED
+            job.finished_at = datetime.utcnow()
+            db.commit()
+            return paths
+        finally:
+            db.close()
+
+    def _notify(self, job_id: str):
+        for event in self._changed.pop(job_id, ()):
+            event.set()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "owner": self.owner,
+            "workers": self.workers,
+            "claimed": self.claimed,
+            "processed": self.processed,
+            "failed": self.failed,
+            "requeued": self.requeued,
+            "recovered": self.recovered,
+            "lost": self.lost,
+        }
+
+
+async def _iter_file(path: str) -> AsyncIterator[bytes]:
+    async with aiofiles.open(path, "rb") as f:
+        while True:
+            chunk = await f.read(CHUNK_SIZE)
+            if not chunk:
+                return
+            yield chunk
+
+
+def _remove(path: Optional[str]):
+    if not path:
+        return
+    try:
+        os.unlink(path)
+        os.rmdir(os.path.dirname(path))   # répertoire du job, s'il est vide
+    except OSError:
+        pass
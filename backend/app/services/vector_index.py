@@ -0,0 +1,277 @@
+# app/services/vector_index.py
+import hashlib
+import json
+import os
+import time
+import zlib
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.services.search_index import tokenize
+
+# Modèle d'embeddings local (optionnel) : sans lui, vectoriseur n-grammes haché
+try:
+    from sentence_transformers import SentenceTransformer
+    SENTENCE_TRANSFORMERS_AVAILABLE = True
+except ImportError:
+    SENTENCE_TRANSFORMERS_AVAILABLE = False
+
+EMBED_BATCH_SIZE = 256
+SCORE_CHUNK_ROWS = 65536   # lignes de la matrice multipliées d'un coup (mémoire bornée)
+
+
+class HashingEmbedder:
+    """
+    Vectoriseur sans modèle : termes (racinisés) et trigrammes de caractères de chaque
+    terme, hachés dans `dim` dimensions avec un signe, puis normalisés. Rapproche les
+    variantes d'un même mot et les fautes de frappe, pas les synonymes.
+    """
+
+    def __init__(self, dim: int = 512):
+        self.dim = dim
+        self.name = f"hashing-ngrams-{dim}"
+
+    def _features(self, text: str) -> List[str]:
+        features = []
+        for term in tokenize(text):
+            features.append(term)
+            padded = f"<{term}>"
+            features.extend(padded[i:i + 3] for i in range(len(padded) - 2))
+        return features
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            hashes = np.array([zlib.crc32(feature.encode("utf-8")) for feature in self._features(text)],
+                              dtype=np.int64)
+            if not len(hashes):
+                continue
+            signs = np.where(hashes & 0x80000000, 1.0, -1.0).astype(np.float32)
+            np.add.at(vectors[row], hashes % self.dim, signs)
+        return _normalize(vectors)
+
+
+class SentenceEmbedder:
+    """Modèle sentence-transformers local, sur CPU (ex. paraphrase-multilingual-MiniLM-L12-v2)"""
+
+    def __init__(self, model_name: str):
+        self.model = SentenceTransformer(model_name, device="cpu")
+        self.dim = self.model.get_sentence_embedding_dimension()
+        self.name = f"sentence-transformers/{model_name}"
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        vectors = self.model.encode(texts, batch_size=64, normalize_embeddings=True, convert_to_numpy=True)
+        return np.asarray(vectors, dtype=np.float32).reshape(len(texts), self.dim)
+
+
+def make_embedder(model_name: Optional[str] = None, dim: int = 512):
+    """Modèle local si demandé et installé, sinon vectoriseur haché"""
+    if model_name:
+        if SENTENCE_TRANSFORMERS_AVAILABLE:
+            try:
+                return SentenceEmbedder(model_name)
+            except Exception as e:
+                print(f"⚠️  Modèle d'embeddings {model_name} indisponible: {e}")
+        else:
+            print("⚠️  sentence-transformers non installé : vectoriseur n-grammes haché")
+    return HashingEmbedder(dim)
+
+
+class VectorIndex:
+    """
+    Index vectoriel (similarité cosinus) des documents, dans l'ordre de leurs positions.
+
+    Les vecteurs normalisés sont écrits dans une matrice float32 sur disque (`path`)
+    puis mappés en mémoire : les workers d'un même serveur partagent les pages du
+    fichier, et un worker qui trouve une matrice à jour (même empreinte des textes
+    et du modèle) la réutilise sans rien recalculer. Les documents ajoutés ensuite
+    restent dans la mémoire du processus (non partagée) jusqu'à la prochaine construction.
+
+    Recherche exacte par produit matriciel ; avec `ivf_lists`, les vecteurs sont
+    répartis en listes (k-moyennes) et seules les `nprobe` listes les plus proches
+    de la requête sont comparées (approché, pour les gros corpus).
+    """
+
+    def __init__(self, embedder, path: Optional[str] = None, ivf_lists: int = 0, nprobe: int = 8):
+        self.embedder = embedder
+        self.path = path
+        self.ivf_lists = ivf_lists
+        self.nprobe = nprobe
+        self.matrix = np.zeros((0, embedder.dim), dtype=np.float32)
+        self.reused = False
+        self.build_seconds = 0.0
+        self.searches = 0
+        self._extra: List[np.ndarray] = []
+        self._extra_matrix: Optional[np.ndarray] = None
+        self._centroids: Optional[np.ndarray] = None
+        self._list_rows: List[np.ndarray] = []
+
+    @classmethod
+    def from_env(cls) -> "VectorIndex":
+        embedder = make_embedder(
+            os.getenv("KNOWLEDGE_EMBEDDING_MODEL") or None,
+            dim=int(os.getenv("KNOWLEDGE_HASHING_DIM", "512"))
+        )
+        return cls(
+            embedder,
+            path=os.getenv("KNOWLEDGE_VECTORS_PATH", "./knowledge_vectors.f32") or None,
+            ivf_lists=int(os.getenv("KNOWLEDGE_IVF_LISTS", "0")),
+            nprobe=int(os.getenv("KNOWLEDGE_IVF_NPROBE", "8"))
+        )
+
+    def __len__(self) -> int:
+        return len(self.matrix) + len(self._extra)
+
+    @property
+    def mapped(self) -> bool:
+        return isinstance(self.matrix, np.memmap)
+
+    def build(self, texts: List[str]):
+        """Vecteurs de tous les documents (réutilisés depuis le disque s'ils sont à jour)"""
+        start = time.perf_counter()
+        fingerprint = hashlib.sha256(
+            "\n".join([self.embedder.name, *texts]).encode("utf-8")
+        ).hexdigest()
+        self._extra, self._extra_matrix = [], None
+        self.matrix = self._load(fingerprint, len(texts)) if self.path else None
+        self.reused = self.matrix is not None
+        if self.matrix is None:
+            vectors = np.zeros((len(texts), self.embedder.dim), dtype=np.float32)
+            for offset in range(0, len(texts), EMBED_BATCH_SIZE):
+                vectors[offset:offset + EMBED_BATCH_SIZE] = self.embedder.embed(texts[offset:offset + EMBED_BATCH_SIZE])
+            self.matrix = self._store(vectors, fingerprint) if self.path else vectors
+        if self.ivf_lists and len(self.matrix) >= 2 * self.ivf_lists:
+            self._train_ivf()
+        self.build_seconds = time.perf_counter() - start
+
+    def add(self, text: str) -> int:
+        """Ajoute un document (en mémoire) ; renvoie sa position"""
+        return self.add_vector(self.embedder.embed([text])[0])
+
+    def add_vector(self, vector: np.ndarray) -> int:
+        self._extra.append(vector)
+        return len(self) - 1
+
+    def search(self, query: str, limit: int = 10) -> List[Tuple[int, float]]:
+        return self.search_batch([query], limit)[0]
+
+    def search_batch(self, queries: List[str], limit: int = 10) -> List[List[Tuple[int, float]]]:
+        """(position, cosinus) des `limit` plus proches documents de chaque requête"""
+        if not queries:
+            return []
+        self.searches += len(queries)
+        # Instantané des ajouts : une recherche peut tourner dans un thread pendant un ajout
+        extra = self._extras()
+        total = len(self.matrix) + len(extra)
+        if not total or limit <= 0:
+            return [[] for _ in queries]
+        embedded = self.embedder.embed(queries)
+        if self._centroids is not None:
+            return [self._search_ivf(vector, extra, limit) for vector in embedded]
+
+        # Exact : un produit matriciel par bloc de lignes pour toutes les requêtes à la fois
+        scores = np.empty((total, len(queries)), dtype=np.float32)
+        for offset in range(0, len(self.matrix), SCORE_CHUNK_ROWS):
+            end = min(offset + SCORE_CHUNK_ROWS, len(self.matrix))
+            scores[offset:end] = self.matrix[offset:end] @ embedded.T
+        scores[len(self.matrix):] = extra @ embedded.T
+        positions = np.arange(total)
+        return [_top(positions, scores[:, column], limit) for column in range(len(queries))]
+
+    def _search_ivf(self, vector: np.ndarray, extra: np.ndarray, limit: int) -> List[Tuple[int, float]]:
+        probed = np.argsort(-(self._centroids @ vector))[:self.nprobe]
+        rows = np.sort(np.concatenate([self._list_rows[i] for i in probed]))
+        # Ajouts récents : peu nombreux, toujours comparés
+        positions = np.concatenate([rows, np.arange(len(self.matrix), len(self.matrix) + len(extra))])
+        scores = np.concatenate([self.matrix[rows] @ vector, extra @ vector])
+        return _top(positions, scores, limit)
+
+    def _extras(self) -> np.ndarray:
+        extra = self._extra_matrix
+        if extra is None or len(extra) != len(self._extra):
+            pending = list(self._extra)
+            extra = np.stack(pending) if pending else np.zeros((0, self.embedder.dim), dtype=np.float32)
+            self._extra_matrix = extra
+        return extra
+
+    def _train_ivf(self, iterations: int = 10):
+        """K-moyennes sphériques sur un échantillon, puis affectation de chaque vecteur à sa liste"""
+        rng = np.random.default_rng(0)
+        count, lists = len(self.matrix), self.ivf_lists
+        sample = self.matrix[np.sort(rng.choice(count, min(count, 64 * lists), replace=False))]
+        centroids = sample[rng.choice(len(sample), lists, replace=False)].copy()
+        for _ in range(iterations):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            order = np.argsort(assignment, kind="stable")
+            present, starts = np.unique(assignment[order], return_index=True)
+            centroids[present] = np.add.reduceat(sample[order], starts, axis=0)
+            centroids = _normalize(centroids)
+
+        assignment = np.empty(count, dtype=np.int64)
+        for offset in range(0, count, SCORE_CHUNK_ROWS):
+            assignment[offset:offset + SCORE_CHUNK_ROWS] = np.argmax(
+                self.matrix[offset:offset + SCORE_CHUNK_ROWS] @ centroids.T, axis=1
+            )
+        order = np.argsort(assignment, kind="stable")
+        bounds = np.searchsorted(assignment[order], np.arange(lists + 1))
+        self._centroids = centroids
+        self._list_rows = [order[bounds[i]:bounds[i + 1]] for i in range(lists)]
+
+    def _load(self, fingerprint: str, count: int) -> Optional[np.ndarray]:
+        try:
+            with open(f"{self.path}.json", "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            if (meta.get("fingerprint") != fingerprint or meta.get("dim") != self.embedder.dim
+                    or meta.get("count") != count or os.path.getsize(self.path) != count * self.embedder.dim * 4):
+                return None
+        except (OSError, ValueError):
+            return None
+        if not count:
+            return np.zeros((0, self.embedder.dim), dtype=np.float32)
+        return np.memmap(self.path, dtype=np.float32, mode="r", shape=(count, self.embedder.dim))
+
+    def _store(self, vectors: np.ndarray, fingerprint: str) -> np.ndarray:
+        """Écriture atomique (fichier temporaire puis renommage) : d'autres workers peuvent lire"""
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        vectors.tofile(tmp_path)
+        os.replace(tmp_path, self.path)
+        meta = {"fingerprint": fingerprint, "embedder": self.embedder.name, "dim": self.embedder.dim,
+                "count": len(vectors)}
+        with open(f"{tmp_path}.json", "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(f"{tmp_path}.json", f"{self.path}.json")
+        if not len(vectors):
+            return vectors
+        return np.memmap(self.path, dtype=np.float32, mode="r", shape=vectors.shape)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "embedder": self.embedder.name,
+            "dim": self.embedder.dim,
+            "vectors": len(self),
+            "pending_in_memory": len(self._extra),
+            "memory_mapped": self.mapped,
+            "path": self.path,
+            "reused_from_disk": self.reused,
+            "mode": "ivf" if self._centroids is not None else "exact",
+            "ivf_lists": len(self._list_rows),
+            "nprobe": self.nprobe if self._centroids is not None else None,
+            "build_seconds": round(self.build_seconds, 3),
+            "searches": self.searches,
+        }
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def _top(positions: np.ndarray, scores: np.ndarray, limit: int) -> List[Tuple[int, float]]:
+    if len(scores) > limit:
+        best = np.argpartition(scores, -limit)[-limit:]
+        positions, scores = positions[best], scores[best]
+    order = np.argsort(-scores, kind="stable")
+    return [(int(positions[i]), float(scores[i])) for i in order]
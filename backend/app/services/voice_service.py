@@ -1,72 +1,156 @@
 # app/services/voice_service.py
-import whisper
-import tempfile
+import asyncio
+import hashlib
 import os
-from typing import Dict, Any
+import time
+from typing import Dict, Any, AsyncIterator, Optional
+from app.core.database import SessionLocal
+from app.models.user import User
+from app.services.keyword_classifier import health_classifier, KeywordMatches
+from app.services.transcription_executor import TranscriptionExecutor
+from app.services.audio_decoding import decode_audio, iter_upload, hash_upload
+from app.services.audio_preprocessing import preprocess
+from app.services.transcription_cache import TranscriptionCache
+
+# Budget de latence par défaut (ms) quand la requête n'en précise pas ; vide = palier par défaut
+DEFAULT_LATENCY_BUDGET_MS = float(os.getenv("VOICE_LATENCY_BUDGET_MS")) if os.getenv("VOICE_LATENCY_BUDGET_MS") else None
+# Durée de validité de la langue d'un utilisateur mise en mémoire
+USER_LANGUAGE_TTL_SECONDS = 300
 
 class VoiceService:
-    def __init__(self):
-        self.model = whisper.load_model("base")
+    def __init__(self, executor: TranscriptionExecutor, cache: Optional[TranscriptionCache] = None):
+        # Modèles chargés une seule fois au démarrage ; inférence hors boucle d'événements
+        self.executor = executor
+        self.model_pool = executor.model_pool
+        # Cache adressé par contenu : un renvoi du même fichier ne repasse pas par le modèle
+        self.cache = cache
+        self._user_languages: Dict[int, tuple] = {}   # user_id -> (langue, instant de lecture)
+        # Bilan du prétraitement : secondes reçues / secondes de silence non transcrites
+        self.audio_seconds = 0.0
+        self.skipped_seconds = 0.0
+        self.silent_clips = 0
         print("✅ Service Vocal initialisé !")
     
-    async def transcribe_audio(self, audio_file) -> Dict[str, Any]:
+    async def transcribe_audio(self, audio_file, **options) -> Dict[str, Any]:
         """
         Transcription audio avec analyse basique
         """
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as tmp_file:
-            content = await audio_file.read()
-            tmp_file.write(content)
-            tmp_path = tmp_file.name
+        # Le fichier reçu est déjà sur disque : empreinte d'abord, pour qu'un renvoi
+        # ne paie ni le décodage ni le prétraitement
+        audio_hash = await hash_upload(audio_file)
+        return await self.transcribe_stream(iter_upload(audio_file), audio_hash=audio_hash, **options)
+    
+    async def transcribe_stream(self, chunks: AsyncIterator[bytes], language: Optional[str] = None,
+                                user_id: Optional[int] = None,
+                                latency_budget_ms: Optional[float] = None,
+                                audio_hash: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Transcription d'un flux d'octets audio : décodé au fil de l'eau
+        en float32 16 kHz, sans fichier temporaire.
         
+        - cache consulté sur l'empreinte du contenu (et la langue) avant tout prétraitement,
+          avant même le décodage si l'appelant fournit `audio_hash`
+        - silences de début/fin et longs silences intérieurs retirés avant l'inférence,
+          le reste découpé en morceaux ≤ 30 s décodés en un passage batché
+        - langue connue (explicite ou `User.language`) : pas de passe de détection
+        - palier Whisper choisi selon la durée de parole et le budget de latence
+        """
         try:
-            # Transcription avec Whisper
-            print("🎤 Début de la transcription...")
-            result = self.model.transcribe(tmp_path)
+            if language is None and user_id is not None:
+                language = await self.user_language(user_id)
+            
+            audio = None
+            if audio_hash is None:
+                # Flux non relisible : empreinte calculée pendant le décodage
+                hasher = hashlib.sha256()
+                audio = await decode_audio(_hashing(chunks, hasher))
+                audio_hash = hasher.hexdigest()
             
-            # Analyse basique du contenu
-            analysis = self._basic_analysis(result["text"])
+            cache_key = None
+            if self.cache is not None:
+                # Clé sans palier : il dépend de la durée de parole et de la charge du moment
+                cache_key = self.cache.make_key(audio_hash, language)
+                cached = await self.cache.get(cache_key)
+                if cached is not None:
+                    return {**cached, "audio_sha256": audio_hash, "cached": True}
             
-            return {
+            if audio is None:
+                audio = await decode_audio(chunks)
+            prepared = await asyncio.to_thread(preprocess, audio)
+            self.audio_seconds += prepared.original_seconds
+            self.skipped_seconds += prepared.skipped_seconds
+            
+            if latency_budget_ms is None:
+                latency_budget_ms = DEFAULT_LATENCY_BUDGET_MS
+            tier = self.executor.choose_tier(prepared.speech_seconds, latency_budget_ms)
+            
+            if prepared.is_silent:
+                # Que du silence : rien à transcrire
+                self.silent_clips += 1
+                result = {"text": "", "language": language, "confidence": 0.0, "model": tier}
+            else:
+                # Transcription avec Whisper
+                print(f"🎤 Début de la transcription (whisper-{tier}, langue {language or 'auto'}, "
+                      f"{prepared.speech_seconds:.1f}s de parole, {prepared.skipped_seconds:.1f}s de silence ignorées)...")
+                options = {"fp16": False}
+                if language:
+                    options["language"] = language
+                result = await self.executor.transcribe_batch(prepared.chunks, tier=tier, **options)
+            
+            # Analyse basique du contenu (un seul passage du classifieur)
+            matches = health_classifier.classify(result["text"])
+            analysis = self._basic_analysis(result["text"], matches)
+            
+            transcription = {
                 "text": result["text"],
                 "language": result["language"],
                 "confidence": result.get("confidence", 0.0),
                 "analysis": analysis,
-                "intent": self._detect_intent(result["text"])
+                "intent": self._detect_intent(result["text"], matches),
+                "duration_seconds": round(prepared.original_seconds, 2),
+                "speech_seconds": round(prepared.speech_seconds, 2),
+                "skipped_seconds": round(prepared.skipped_seconds, 2),
+                "chunks": len(prepared.chunks),
+                "model": f"whisper-{result['model']}",
+                "language_detection": not language
             }
+            if cache_key is not None:
+                await self.cache.set(cache_key, transcription)
+            return {**transcription, "audio_sha256": audio_hash, "cached": False}
             
         except Exception as e:
             print(f"❌ Erreur transcription: {e}")
             raise e
-        finally:
-            if os.path.exists(tmp_path):
-                os.unlink(tmp_path)
     
-    def _basic_analysis(self, text: str) -> Dict[str, Any]:
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "audio_seconds": round(self.audio_seconds, 2),
+            "skipped_seconds": round(self.skipped_seconds, 2),
+            "skipped_ratio": round(self.skipped_seconds / self.audio_seconds, 4) if self.audio_seconds else 0.0,
+            "silent_clips": self.silent_clips,
+        }
+    
+    async def user_language(self, user_id: int) -> Optional[str]:
+        """Langue déclarée par l'utilisateur (lecture en base mise en mémoire quelques minutes)"""
+        cached = self._user_languages.get(user_id)
+        if cached is not None and time.monotonic() - cached[1] < USER_LANGUAGE_TTL_SECONDS:
+            return cached[0]
+        language = await asyncio.to_thread(_load_user_language, user_id)
+        if len(self._user_languages) > 10000:
+            self._user_languages.clear()
+        self._user_languages[user_id] = (language, time.monotonic())
+        return language
+    
+    def _basic_analysis(self, text: str, matches: KeywordMatches = None) -> Dict[str, Any]:
         """Analyse basique sans LLM"""
         if not text.strip():
             return {"urgency": "low", "category": "general"}
         
-        text_lower = text.lower()
-        
-        urgency = "low"
-        category = "general"
-        
-        # Détection d'urgence basique
-        urgent_terms = ["urgence", "grave", "douleur intense", "saignement", "étouffe"]
-        if any(term in text_lower for term in urgent_terms):
-            urgency = "high"
+        matches = matches or health_classifier.classify(text)
         
-        # Catégorisation basique
-        if any(term in text_lower for term in ["sommeil", "dormir", "nuit", "insomnie"]):
-            category = "sleep"
-        elif any(term in text_lower for term in ["manger", "aliment", "nourriture", "faim"]):
-            category = "nutrition" 
-        elif any(term in text_lower for term in ["stress", "anxiété", "nerveux", "panique"]):
-            category = "stress"
-        elif any(term in text_lower for term in ["exercice", "sport", "marche", "entraînement"]):
-            category = "exercise"
-        elif any(term in text_lower for term in ["triste", "déprimé", "heureux", "émotion"]):
-            category = "mental"
+        # Détection d'urgence et catégorisation basiques (vocabulaires compilés)
+        urgency = matches.first("urgency", "low")
+        category = matches.first("category", "general")
         
         return {
             "urgency": urgency,
@@ -74,15 +158,27 @@ class VoiceService:
             "needs_followup": urgency in ["medium", "high"]
         }
     
-    def _detect_intent(self, text: str) -> str:
+    def _detect_intent(self, text: str, matches: KeywordMatches = None) -> str:
         """Détecte l'intention du message vocal"""
-        text_lower = text.lower()
-        
-        if any(word in text_lower for word in ["conseil", "recommande", "suggestion"]):
-            return "advice_request"
-        elif any(word in text_lower for word in ["symptôme", "douleur", "problème", "mal"]):
-            return "symptom_report" 
-        elif any(word in text_lower for word in ["question", "pourquoi", "comment"]):
-            return "information_request"
-        else:
-            return "general_message"
\ No newline at end of file
+        matches = matches or health_classifier.classify(text)
+        return matches.first("intent", "general_message")
+
+
+async def _hashing(chunks: AsyncIterator[bytes], hasher) -> AsyncIterator[bytes]:
+    """Relaie les morceaux en mettant à jour l'empreinte au passage"""
+    async for chunk in chunks:
+        hasher.update(chunk)
+        yield chunk
+
+
+def _load_user_language(user_id: int) -> Optional[str]:
+    db = SessionLocal()
+    try:
+        user = db.query(User).filter(User.id == user_id).first()
+        return user.language if user is not None and user.language else None
+    except Exception as e:
+        # Table absente ou base indisponible : détection automatique
+        print(f"⚠️  Langue utilisateur {user_id} introuvable: {e}")
+        return None
+    finally:
+        db.close()
@@ -0,0 +1,248 @@
+# app/services/voice_streaming.py
+import asyncio
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+
+from app.services.audio_decoding import SAMPLE_RATE, resample
+from app.services.keyword_classifier import health_classifier
+from app.services.voice_service import VoiceService
+
+# Événements produits par le détecteur d'activité vocale
+PARTIAL = "partial"
+FINAL = "final"
+
+
+class EnergyVAD:
+    """
+    Détecteur d'activité vocale par énergie, trame par trame.
+
+    Le seuil suit le bruit de fond (moyenne glissante des trames silencieuses).
+    Un énoncé commence après `min_speech_ms` de parole et se termine après
+    `silence_ms` de silence (ou `max_utterance_seconds`).
+    """
+
+    def __init__(self, sample_rate: int = SAMPLE_RATE, frame_ms: int = 30, threshold_ratio: float = 3.0,
+                 min_energy: float = 1e-4, min_speech_ms: int = 150, silence_ms: int = 600,
+                 partial_interval_ms: int = 1000, max_utterance_seconds: float = 15.0,
+                 padding_ms: int = 200):
+        self.sample_rate = sample_rate
+        self.frame_size = sample_rate * frame_ms // 1000
+        self.threshold_ratio = threshold_ratio
+        self.min_energy = min_energy
+        self.min_speech_frames = max(1, min_speech_ms // frame_ms)
+        self.silence_frames = max(1, silence_ms // frame_ms)
+        self.partial_frames = max(1, partial_interval_ms // frame_ms)
+        self.max_frames = int(max_utterance_seconds * 1000) // frame_ms
+        self.padding_frames = max(0, padding_ms // frame_ms)
+
+        self.noise_floor = min_energy
+        self._pending = np.zeros(0, dtype=np.float32)
+        self._history: List[np.ndarray] = []   # trames récentes avant le début de parole
+        self._utterance: List[np.ndarray] = []
+        self._in_speech = False
+        self._speech_run = 0
+        self._silence_run = 0
+        self._since_partial = 0
+        self.frames_seen = 0
+        self.utterance_start = 0.0
+
+    def feed(self, samples: np.ndarray) -> List[Tuple[str, np.ndarray, float]]:
+        """
+        Ajoute des échantillons float32 ; retourne les événements
+        (PARTIAL|FINAL, audio de l'énoncé, instant de début en secondes)
+        """
+        events = []
+        audio = np.concatenate([self._pending, samples]) if len(self._pending) else samples
+        usable = len(audio) - len(audio) % self.frame_size
+        self._pending = audio[usable:]
+        for frame in audio[:usable].reshape(-1, self.frame_size):
+            event = self._process_frame(frame)
+            if event is not None:
+                events.append(event)
+        return events
+
+    def flush(self) -> Optional[Tuple[str, np.ndarray, float]]:
+        """Fin du flux : termine l'énoncé en cours"""
+        if self._in_speech and self._utterance:
+            return self._finish()
+        return None
+
+    def _process_frame(self, frame: np.ndarray):
+        self.frames_seen += 1
+        energy = float(np.mean(frame * frame))
+        threshold = max(self.min_energy, self.noise_floor * self.threshold_ratio)
+        voiced = energy > threshold
+
+        if not self._in_speech:
+            # Bruit de fond : moyenne glissante lente, uniquement hors parole
+            if not voiced:
+                self.noise_floor = 0.95 * self.noise_floor + 0.05 * max(energy, self.min_energy / 10)
+            self._history.append(frame)
+            if len(self._history) > self.padding_frames + self.min_speech_frames:
+                self._history.pop(0)
+            self._speech_run = self._speech_run + 1 if voiced else 0
+            if self._speech_run >= self.min_speech_frames:
+                self._in_speech = True
+                self._utterance = list(self._history)
+                self._history = []
+                self._silence_run = 0
+                self._since_partial = 0
+                self.utterance_start = (self.frames_seen - len(self._utterance)) * self.frame_size / self.sample_rate
+            return None
+
+        self._utterance.append(frame)
+        self._silence_run = 0 if voiced else self._silence_run + 1
+        self._since_partial += 1
+        if self._silence_run >= self.silence_frames or len(self._utterance) >= self.max_frames:
+            return self._finish()
+        if self._since_partial >= self.partial_frames:
+            self._since_partial = 0
+            return PARTIAL, np.concatenate(self._utterance), self.utterance_start
+        return None
+
+    def _finish(self):
+        # Le silence final n'apporte rien à la transcription
+        frames = self._utterance[:len(self._utterance) - max(0, self._silence_run - self.padding_frames)]
+        audio = np.concatenate(frames or self._utterance)
+        start = self.utterance_start
+        self._utterance = []
+        self._in_speech = False
+        self._speech_run = 0
+        self._silence_run = 0
+        return FINAL, audio, start
+
+
+class StreamingTranscriptionSession:
+    """
+    Session de transcription en continu (une par connexion WebSocket).
+
+    Chaque énoncé détecté par le VAD est transcrit dès qu'il se termine (final) ;
+    pendant qu'il se prolonge, des transcriptions partielles sont produites
+    (au plus une en cours à la fois) pour détecter une urgence en ~1 seconde.
+    """
+
+    def __init__(self, voice_service: VoiceService, send, language: Optional[str] = "fr",
+                 sample_rate: int = SAMPLE_RATE, sample_format: str = "s16le",
+                 vad: Optional[EnergyVAD] = None, latency_budget_ms: Optional[float] = None):
+        self.voice_service = voice_service
+        self.send = send
+        self.language = language
+        self.latency_budget_ms = latency_budget_ms
+        self.sample_rate = sample_rate
+        self.sample_width = 4 if sample_format == "f32le" else 2
+        self.sample_format = sample_format
+        self.vad = vad or EnergyVAD()
+        self.utterances = 0
+        self.received_seconds = 0.0
+        self._remainder = b""
+        self._finals: asyncio.Queue = asyncio.Queue()
+        self._partial_task: Optional[asyncio.Task] = None
+        self._alerted: set = set()
+        self._send_lock = asyncio.Lock()
+        self._worker = asyncio.ensure_future(self._transcribe_finals())
+
+    async def feed_pcm(self, data: bytes):
+        """Trame PCM brute du client (un échantillon peut être coupé entre deux trames)"""
+        data = self._remainder + data
+        usable = len(data) - len(data) % self.sample_width
+        self._remainder = data[usable:]
+        samples = pcm_to_float32(data[:usable], self.sample_format)
+        self.received_seconds += len(samples) / self.sample_rate
+        if self.sample_rate != SAMPLE_RATE and len(samples):
+            samples = resample(samples, self.sample_rate, SAMPLE_RATE)
+        await self.feed(samples)
+
+    async def feed(self, samples: np.ndarray):
+        for kind, audio, start in self.vad.feed(samples):
+            self._dispatch(kind, audio, start)
+
+    async def finish(self):
+        """Fin du flux : termine l'énoncé courant et attend les transcriptions restantes"""
+        event = self.vad.flush()
+        if event is not None:
+            self._dispatch(*event)
+        await self._finals.put(None)
+        await self._worker
+
+    async def aclose(self):
+        for task in (self._worker, self._partial_task):
+            if task is not None and not task.done():
+                task.cancel()
+
+    def _dispatch(self, kind: str, audio: np.ndarray, start: float):
+        if kind == FINAL:
+            self._finals.put_nowait((self.utterances, audio, start))
+            self.utterances += 1
+        elif self._partial_task is None or self._partial_task.done():
+            # Partiel ignoré si le précédent n'est pas fini : on ne sature pas les workers
+            self._partial_task = asyncio.ensure_future(self._transcribe_partial(self.utterances, audio, start))
+
+    async def _transcribe_partial(self, utterance: int, audio: np.ndarray, start: float):
+        try:
+            result = await self._transcribe(audio, partial=True)
+        except Exception:
+            return
+        text = result["text"].strip()
+        # Énoncé déjà finalisé entre-temps : le partiel n'a plus d'intérêt
+        if text and utterance >= self.utterances:
+            await self._emit({"event": "partial", "utterance": utterance, "start": round(start, 2), "text": text})
+            await self._check_urgency(utterance, text)
+
+    async def _transcribe_finals(self):
+        while True:
+            item = await self._finals.get()
+            if item is None:
+                return
+            utterance, audio, start = item
+            try:
+                result = await self._transcribe(audio)
+            except Exception as e:
+                await self._emit({"event": "error", "utterance": utterance, "detail": str(e)})
+                continue
+            text = result["text"].strip()
+            matches = health_classifier.classify(text)
+            await self._emit({
+                "event": "final",
+                "utterance": utterance,
+                "start": round(start, 2),
+                "end": round(start + len(audio) / SAMPLE_RATE, 2),
+                "text": text,
+                "language": result.get("language"),
+                "model": f"whisper-{result.get('model')}",
+                "analysis": self.voice_service._basic_analysis(text, matches),
+                "intent": self.voice_service._detect_intent(text, matches)
+            })
+            await self._check_urgency(utterance, text)
+
+    async def _transcribe(self, audio: np.ndarray, partial: bool = False) -> Dict[str, Any]:
+        options = {"fp16": False, "condition_on_previous_text": False}
+        if self.language:
+            options["language"] = self.language
+        executor = self.voice_service.executor
+        # Partiels : palier le plus rapide (ils ne servent qu'à réagir vite) ;
+        # finals : palier choisi selon la durée de l'énoncé et le budget de latence
+        if partial:
+            tier = executor.model_pool.fastest_tier
+        else:
+            tier = executor.choose_tier(len(audio) / SAMPLE_RATE, self.latency_budget_ms)
+        return await executor.transcribe(audio, tier=tier, **options)
+
+    async def _check_urgency(self, utterance: int, text: str):
+        """Alerte immédiate (une fois par énoncé) si une formule urgente est reconnue"""
+        if utterance in self._alerted:
+            return
+        if health_classifier.classify(text).first("urgency", "low") == "high":
+            self._alerted.add(utterance)
+            await self._emit({"event": "alert", "utterance": utterance, "urgency": "high", "text": text})
+
+    async def _emit(self, payload: Dict[str, Any]):
+        async with self._send_lock:
+            await self.send(payload)
+
+
+def pcm_to_float32(data: bytes, sample_format: str = "s16le") -> np.ndarray:
+    """Convertit des octets PCM (nombre entier d'échantillons) en float32"""
+    if sample_format == "f32le":
+        return np.frombuffer(data, dtype="<f4").astype(np.float32)
+    return np.frombuffer(data, dtype="<i2").astype(np.float32) / 32768.0
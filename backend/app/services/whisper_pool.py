@@ -0,0 +1,280 @@
+# app/services/whisper_pool.py
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, Any, List, Optional
+
+import numpy as np
+
+# Whisper (et torch) sont lourds : le service démarre sans, et le signale
+try:
+    import whisper
+    import torch
+    WHISPER_AVAILABLE = True
+except ImportError:
+    WHISPER_AVAILABLE = False
+
+SAMPLE_RATE = 16000
+
+LOADING = "loading"
+READY = "ready"
+FAILED = "failed"
+UNAVAILABLE = "unavailable"
+
+# Du plus rapide au plus précis
+TIER_ORDER = ["tiny", "base", "small", "medium", "large"]
+
+# Facteur temps réel (secondes de calcul / seconde d'audio) de départ, CPU fp32 ;
+# remplacé au fil des inférences par la moyenne mesurée
+DEFAULT_RTF = {"tiny": 0.05, "base": 0.1, "small": 0.35, "medium": 1.0, "large": 2.0}
+# Gain attendu de la quantification int8 (couches linéaires) sur CPU
+INT8_RTF_FACTOR = 0.6
+
+
+class ModelNotReadyError(Exception):
+    """Aucun modèle Whisper n'est (encore) disponible"""
+
+
+class WhisperModelPool:
+    """
+    Pool de modèles Whisper chargés une seule fois au démarrage.
+
+    Une instance par worker d'inférence et par palier (tiny/base/small...) :
+    une requête emprunte un modèle du palier choisi (`checkout`), s'en sert,
+    puis le rend. Chaque modèle passe une inférence de préchauffage avant
+    d'être mis à disposition. Sur CPU, les couches linéaires peuvent être
+    quantifiées en int8 (`quantize`).
+    """
+
+    def __init__(self, model_name: str = "base", size: int = 1, device: Optional[str] = None,
+                 tiers: Optional[List[str]] = None, quantize: bool = False):
+        # `model_name` : palier par défaut (utilisé sans budget de latence)
+        self.model_name = model_name
+        self.tiers = sorted(set(tiers or []) | {model_name}, key=_tier_rank)
+        self.size = size
+        self.device = device
+        self.quantize = quantize
+        self.state = LOADING if WHISPER_AVAILABLE else UNAVAILABLE
+        self.error: Optional[str] = None
+        self.loaded = 0
+        self.quantized = 0
+        self.load_seconds = 0.0
+        self.warmup_seconds = 0.0
+        self.checkouts = 0
+        self.total_wait_seconds = 0.0
+        self._models: Dict[str, asyncio.Queue] = {tier: asyncio.Queue() for tier in self.tiers}
+        self._loaded_tiers: Dict[str, int] = {tier: 0 for tier in self.tiers}
+        self._tier_of: Dict[int, str] = {}
+        self._rtf: Dict[str, float] = {
+            tier: DEFAULT_RTF.get(tier, 1.0) * (INT8_RTF_FACTOR if quantize else 1.0) for tier in self.tiers
+        }
+        self._runs: Dict[str, int] = {tier: 0 for tier in self.tiers}
+
+    @classmethod
+    def from_env(cls) -> "WhisperModelPool":
+        tiers = [t.strip() for t in os.getenv("WHISPER_TIERS", "").split(",") if t.strip()]
+        return cls(
+            model_name=os.getenv("WHISPER_MODEL", "base"),
+            size=int(os.getenv("WHISPER_POOL_SIZE", "1")),
+            device=os.getenv("WHISPER_DEVICE") or None,
+            tiers=tiers,
+            quantize=os.getenv("WHISPER_INT8", "0") == "1"
+        )
+
+    @property
+    def capacity(self) -> int:
+        """Nombre total de modèles (tous paliers confondus) : un thread d'inférence chacun"""
+        return self.size * len(self.tiers)
+
+    @property
+    def fastest_tier(self) -> str:
+        loaded = self._available_tiers()
+        return loaded[0] if loaded else self.tiers[0]
+
+    async def load(self):
+        """Charge et préchauffe les modèles hors de la boucle d'événements"""
+        if not WHISPER_AVAILABLE:
+            self.error = "openai-whisper non installé"
+            print(f"⚠️  Pool Whisper indisponible: {self.error}")
+            return
+        # Le palier par défaut d'abord : le service répond dès qu'il est prêt
+        order = [self.model_name] + [tier for tier in self.tiers if tier != self.model_name]
+        for tier in order:
+            try:
+                for _ in range(self.size):
+                    model = await asyncio.to_thread(self._load_one, tier)
+                    self.loaded += 1
+                    self._loaded_tiers[tier] += 1
+                    self._tier_of[id(model)] = tier
+                    await self._models[tier].put(model)
+                    self.state = READY
+            except Exception as e:
+                # Un palier en échec n'empêche pas les autres de servir
+                self.error = f"{tier}: {e}"
+                print(f"❌ Erreur chargement Whisper {tier}: {e}")
+        if self.loaded == 0:
+            self.state = FAILED
+            return
+        print(f"✅ Pool Whisper prêt ({self.size} x {'/'.join(self._available_tiers())}"
+              f"{' int8' if self.quantized else ''}, "
+              f"chargement {self.load_seconds:.1f}s, préchauffage {self.warmup_seconds:.1f}s)")
+
+    def _load_one(self, tier: str):
+        start = time.perf_counter()
+        model = whisper.load_model(tier, device=self.device)
+        if self.quantize:
+            model = self._quantize(model)
+        loaded_at = time.perf_counter()
+        # Inférence de préchauffage (1 s de silence) : noyaux et caches initialisés
+        model.transcribe(np.zeros(SAMPLE_RATE, dtype=np.float32), fp16=False, language="fr")
+        self.load_seconds += loaded_at - start
+        self.warmup_seconds += time.perf_counter() - loaded_at
+        return model
+
+    def _quantize(self, model):
+        """Quantification dynamique int8 des couches linéaires (CPU uniquement)"""
+        if model.device.type != "cpu":
+            return model
+        for module in model.modules():
+            # La sous-classe Linear de Whisper ne fait que convertir le dtype des poids :
+            # sans effet en fp32, et torch ne quantifie que nn.Linear exactement
+            if isinstance(module, torch.nn.Linear):
+                module.__class__ = torch.nn.Linear
+        model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+        self.quantized += 1
+        return model
+
+    @property
+    def ready(self) -> bool:
+        return self.state == READY
+
+    def _available_tiers(self) -> List[str]:
+        return [tier for tier in self.tiers if self._loaded_tiers[tier]]
+
+    def select_tier(self, duration_seconds: float, latency_budget_ms: Optional[float] = None,
+                    queue_wait_seconds: float = 0.0) -> str:
+        """
+        Palier le plus précis dont la latence estimée (attente + durée x facteur
+        temps réel mesuré) tient dans le budget ; sinon le plus rapide.
+        Sans budget : palier par défaut.
+        """
+        loaded = self._available_tiers()
+        if not loaded:
+            return self.model_name
+        if latency_budget_ms is None:
+            return self.model_name if self.model_name in loaded else loaded[0]
+        budget = latency_budget_ms / 1000
+        for tier in reversed(loaded):
+            if queue_wait_seconds + duration_seconds * self._rtf[tier] <= budget:
+                return tier
+        return loaded[0]
+
+    def record_run(self, tier: str, audio_seconds: float, run_seconds: float):
+        """Met à jour le facteur temps réel du palier (moyenne glissante)"""
+        if audio_seconds <= 0 or tier not in self._rtf:
+            return
+        rtf = run_seconds / audio_seconds
+        self._runs[tier] += 1
+        weight = 0.5 if self._runs[tier] <= 5 else 0.1
+        self._rtf[tier] = (1 - weight) * self._rtf[tier] + weight * rtf
+
+    def tier_of(self, model) -> str:
+        return self._tier_of.get(id(model), self.model_name)
+
+    async def acquire(self, timeout: Optional[float] = None, tier: Optional[str] = None):
+        """Attend un modèle libre du palier (asyncio.TimeoutError au-delà de `timeout`)"""
+        if not self.ready:
+            raise ModelNotReadyError(self.error or f"Modèle Whisper en état '{self.state}'")
+        tier = tier or self.model_name
+        if not self._loaded_tiers.get(tier):
+            # Palier inconnu ou pas (encore) chargé : le plus proche disponible
+            tier = min(self._available_tiers(), key=lambda t: abs(_tier_rank(t) - _tier_rank(tier)))
+        start = time.perf_counter()
+        model = await asyncio.wait_for(self._models[tier].get(), timeout)
+        self.checkouts += 1
+        self.total_wait_seconds += time.perf_counter() - start
+        return model
+
+    def release(self, model):
+        self._models[self.tier_of(model)].put_nowait(model)
+
+    @asynccontextmanager
+    async def checkout(self, timeout: Optional[float] = None, tier: Optional[str] = None):
+        """Emprunte un modèle le temps d'une transcription"""
+        model = await self.acquire(timeout, tier)
+        try:
+            yield model
+        finally:
+            self.release(model)
+
+    def stats(self) -> Dict[str, Any]:
+        available = sum(queue.qsize() for queue in self._models.values())
+        return {
+            "state": self.state,
+            "model": f"whisper-{self.model_name}",
+            "device": self.device or "auto",
+            "size": self.size,
+            "loaded": self.loaded,
+            "available": available,
+            "in_use": self.loaded - available,
+            "int8": self.quantize,
+            "quantized": self.quantized,
+            "tiers": {
+                tier: {
+                    "loaded": self._loaded_tiers[tier],
+                    "available": self._models[tier].qsize(),
+                    "realtime_factor": round(self._rtf[tier], 4),
+                    "runs": self._runs[tier],
+                }
+                for tier in self.tiers
+            },
+            "checkouts": self.checkouts,
+            "avg_checkout_wait_ms": round(self.total_wait_seconds / self.checkouts * 1000, 2) if self.checkouts else 0.0,
+            "load_seconds": round(self.load_seconds, 2),
+            "warmup_seconds": round(self.warmup_seconds, 2),
+            "error": self.error,
+        }
+
+
+def transcribe_batch(model, chunks: List[np.ndarray], batch_size: int = 8, **options) -> Dict[str, Any]:
+    """
+    Décode des morceaux de parole ≤ 30 s en passages batchés (un spectrogramme par ligne),
+    au lieu de la fenêtre glissante de `model.transcribe`. Un morceau dont le décodage
+    semble dégénéré (répétitions, faible log-probabilité) repasse par `model.transcribe`
+    et ses températures de repli.
+    """
+    decode_options = whisper.DecodingOptions(
+        language=options.get("language"), fp16=options.get("fp16", False), without_timestamps=True
+    )
+    n_mels = getattr(model.dims, "n_mels", 80)
+    texts, languages, weighted_logprob, total = [], [], 0.0, 0
+    for offset in range(0, len(chunks), batch_size):
+        batch = chunks[offset:offset + batch_size]
+        mel = torch.stack([
+            whisper.log_mel_spectrogram(whisper.pad_or_trim(chunk), n_mels) for chunk in batch
+        ]).to(model.device)
+        for chunk, result in zip(batch, whisper.decode(model, mel, decode_options)):
+            # Mêmes seuils que whisper.transcribe
+            if result.no_speech_prob > 0.6 and result.avg_logprob < -1.0:
+                continue
+            if result.compression_ratio > 2.4 or result.avg_logprob < -1.0:
+                fallback = model.transcribe(chunk, **options)
+                text, language, logprob = fallback["text"], fallback.get("language"), -1.0
+            else:
+                text, language, logprob = result.text, result.language, result.avg_logprob
+            texts.append(text.strip())
+            languages.append(language)
+            weighted_logprob += logprob * len(chunk)
+            total += len(chunk)
+    return {
+        "text": " ".join(text for text in texts if text),
+        "language": max(set(languages), key=languages.count) if languages else options.get("language"),
+        "confidence": round(float(np.exp(weighted_logprob / total)), 4) if total else 0.0,
+    }
+
+
+def _tier_rank(tier: str) -> int:
+    # "small.en", "large-v3"... : rang du palier de base
+    base = tier.split(".")[0].split("-")[0]
+    return TIER_ORDER.index(base) if base in TIER_ORDER else len(TIER_ORDER)
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# bench_keyword_classifier.py
+"""
+Benchmark : classifieur compilé (un seul passage) vs anciens scans `any(mot in texte ...)`.
+
+Usage:
+    python bench_keyword_classifier.py [--messages 200] [--words 1000]
+"""
+import argparse
+import random
+import sys
+import os
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.services.keyword_classifier import (
+    KeywordClassifier, HEALTH_VOCABULARIES, SUGGESTIONS, AHOCORASICK_AVAILABLE
+)
+
+FILLER = (
+    "bonjour je voulais vous parler de ma journée au travail avec les collègues "
+    "et de la réunion qui a duré longtemps puis je suis rentré à la maison "
+    "pour préparer le repas du soir avec les enfants avant de regarder un film"
+).split()
+KEYWORDS = sorted({kw for entries in HEALTH_VOCABULARIES.values() for _, kws in entries for kw in kws})
+
+
+# ----------------------------------------------------------------------
+# Ancienne implémentation (listes reconstruites et texte rescanné à chaque appel)
+# ----------------------------------------------------------------------
+def legacy_analyze(text: str) -> dict:
+    text_lower = text.lower()
+
+    urgency = "low"
+    if any(term in text_lower for term in ["urgence", "grave", "douleur intense", "saignement", "étouffe"]):
+        urgency = "high"
+
+    category = "general"
+    if any(term in text_lower for term in ["sommeil", "dormir", "nuit", "insomnie"]):
+        category = "sleep"
+    elif any(term in text_lower for term in ["manger", "aliment", "nourriture", "faim"]):
+        category = "nutrition"
+    elif any(term in text_lower for term in ["stress", "anxiété", "nerveux", "panique"]):
+        category = "stress"
+    elif any(term in text_lower for term in ["exercice", "sport", "marche", "entraînement"]):
+        category = "exercise"
+    elif any(term in text_lower for term in ["triste", "déprimé", "heureux", "émotion"]):
+        category = "mental"
+
+    if any(word in text_lower for word in ["conseil", "recommande", "suggestion"]):
+        intent = "advice_request"
+    elif any(word in text_lower for word in ["symptôme", "douleur", "problème", "mal"]):
+        intent = "symptom_report"
+    elif any(word in text_lower for word in ["question", "pourquoi", "comment"]):
+        intent = "information_request"
+    else:
+        intent = "general_message"
+
+    if any(word in text_lower for word in ["stress", "anxiété"]):
+        suggestions = SUGGESTIONS["stress"]
+    elif any(word in text_lower for word in ["sommeil", "fatigue"]):
+        suggestions = SUGGESTIONS["sleep"]
+    elif any(word in text_lower for word in ["manger", "alimentation"]):
+        suggestions = SUGGESTIONS["nutrition"]
+    else:
+        suggestions = SUGGESTIONS["default"]
+
+    return {"category": category, "intent": intent, "urgency": urgency, "suggestions": suggestions}
+
+
+def compiled_analyze(classifier: KeywordClassifier):
+    def analyze(text: str) -> dict:
+        result = classifier.analyze(text)
+        return {key: result[key] for key in ("category", "intent", "urgency", "suggestions")}
+    return analyze
+
+
+def make_message(rng: random.Random, words: int) -> str:
+    tokens = [rng.choice(FILLER) for _ in range(words)]
+    # Quelques mots-clés, parfois collés à d'autres mots pour tester les sous-chaînes
+    for _ in range(rng.randint(0, 4)):
+        keyword = rng.choice(KEYWORDS)
+        position = rng.randrange(len(tokens))
+        tokens[position] = keyword if rng.random() < 0.7 else tokens[position] + keyword
+    return " ".join(tokens).capitalize()
+
+
+def bench(fn, messages, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for message in messages:
+            fn(message)
+        best = min(best, time.perf_counter() - start)
+    return best / len(messages)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--words", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    messages = [make_message(rng, args.words) for _ in range(args.messages)]
+
+    classifiers = [KeywordClassifier(HEALTH_VOCABULARIES, use_automaton=False)]
+    if AHOCORASICK_AVAILABLE:
+        classifiers.append(KeywordClassifier(HEALTH_VOCABULARIES, use_automaton=True))
+    else:
+        print("ℹ️  pyahocorasick non installé : seul le moteur regex est mesuré")
+
+    print(f"📏 Messages de {args.words} mots (~{sum(map(len, messages)) // len(messages)} caractères)")
+    legacy = bench(legacy_analyze, messages, args.repeat)
+    print(f"🐢 Ancien code        : {legacy * 1e6:8.1f} µs / message")
+
+    for classifier in classifiers:
+        analyze = compiled_analyze(classifier)
+        mismatches = sum(1 for m in messages if legacy_analyze(m) != analyze(m))
+        compiled = bench(analyze, messages, args.repeat)
+        print(f"🚀 {classifier.engine:<17}: {compiled * 1e6:8.1f} µs / message  "
+              f"(x{legacy / compiled:.1f}, {mismatches} différence(s))")
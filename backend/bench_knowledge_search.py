@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+# bench_knowledge_search.py
+"""
+Benchmark : latence de l'index inversé BM25 de KnowledgeService sur un
+corpus synthétique de conseils santé en français (vocabulaire de la base
+réelle et pseudo-mots, fréquences en loi de Zipf).
+
+Avec --semantic : index vectoriel (vectoriseur haché) en recherche exacte,
+puis en mode IVF (latence et rappel des 10 premiers par rapport à l'exact).
+
+Usage:
+    python bench_knowledge_search.py [--documents 100000] [--queries 500] [--semantic] [--ivf-lists 256]
+"""
+import argparse
+import random
+import sys
+import os
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.services.knowledge_service import KnowledgeService
+from app.services.search_index import BM25Index, tokenize
+from app.services.vector_index import VectorIndex, HashingEmbedder
+
+QUERIES = [
+    "je dors mal la nuit",
+    "comment réduire mon stress au travail",
+    "que manger le soir",
+    "exercices de respiration pour l'anxiété",
+    "combien d'eau boire par jour",
+    "marcher tous les jours est-il bon",
+    "fatigue et manque d'énergie",
+    "méditation pour débutants",
+    "activité physique après 60 ans",
+    "idées de repas équilibrés",
+]
+
+
+SYLLABLES = ["ba", "ché", "di", "fo", "gu", "la", "mi", "né", "po", "ri", "sa", "té", "vo", "zu", "tion", "ment", "eur"]
+
+
+def make_corpus(documents: int, vocabulary: int = 30_000, seed: int = 42):
+    """
+    Conseils synthétiques : mots de la base réelle noyés dans un vocabulaire de
+    `vocabulary` pseudo-mots, tirés selon une loi de Zipf (quelques mots très
+    fréquents, une longue traîne de mots rares), comme dans un vrai corpus.
+    """
+    rng = random.Random(seed)
+    base = KnowledgeService(tips_path=None)
+    words = sorted({word for tips in base.knowledge_base.values() for tip in tips for word in tip.split()})
+    pseudo = set()
+    while len(pseudo) < vocabulary:
+        pseudo.add("".join(rng.choices(SYLLABLES, k=rng.randint(2, 4))))
+    words += sorted(pseudo)
+    rng.shuffle(words)
+    cumulative, total = [], 0.0
+    for rank in range(1, len(words) + 1):
+        total += 1 / rank
+        cumulative.append(total)
+    categories = sorted(base.knowledge_base)
+    return [
+        (rng.choice(categories), " ".join(rng.choices(words, cum_weights=cumulative, k=rng.randint(8, 25))))
+        for _ in range(documents)
+    ]
+
+
+def percentile(samples, fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--documents", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--limit", type=int, default=3)
+    parser.add_argument("--semantic", action="store_true", help="mesurer aussi l'index vectoriel")
+    parser.add_argument("--ivf-lists", type=int, default=256)
+    parser.add_argument("--nprobe", type=int, default=16)
+    args = parser.parse_args()
+
+    corpus = make_corpus(args.documents)
+    print(f"📏 Corpus : {len(corpus)} conseils, ~{sum(len(tip.split()) for _, tip in corpus) // len(corpus)} mots chacun")
+
+    index = BM25Index()
+    start = time.perf_counter()
+    for doc_id, (category, tip) in enumerate(corpus):
+        index.add(doc_id, f"{category} {tip}")
+    build = time.perf_counter() - start
+    stats = index.stats()
+    print(f"🏗️  Index : {build:.2f} s ({build / len(corpus) * 1e6:.1f} µs / ajout), "
+          f"{stats['terms']} termes, {stats['postings']} entrées")
+
+    rng = random.Random(7)
+    queries = [rng.choice(QUERIES) for _ in range(args.queries)]
+    for query in QUERIES:
+        index.search(query, args.limit)   # préchauffage (normes de longueur)
+
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        index.search(query, args.limit)
+        latencies.append(time.perf_counter() - start)
+    print(f"🚀 BM25       : p50 {percentile(latencies, 0.5) * 1000:.3f} ms, "
+          f"p99 {percentile(latencies, 0.99) * 1000:.3f} ms, max {max(latencies) * 1000:.3f} ms")
+
+    # Ajout incrémental : le document est trouvable dès la requête suivante
+    position = index.add(len(corpus), "nutrition Le quinoa hydraté apporte des protéines complètes")
+    start = time.perf_counter()
+    hits = index.search("protéines du quinoa", args.limit)
+    print(f"➕ Ajout puis recherche : {(time.perf_counter() - start) * 1000:.3f} ms "
+          f"(nouveau document {'en tête' if hits and hits[0][0] == position else 'absent'}, "
+          f"termes {tokenize('protéines du quinoa')})")
+
+    if args.semantic:
+        texts = [f"{category} {tip}" for category, tip in corpus]
+        exact = VectorIndex(HashingEmbedder())
+        exact.build(texts)
+        print(f"🧭 Vecteurs : {len(exact)} x {exact.embedder.dim} float32 "
+              f"({exact.matrix.nbytes / 2 ** 20:.0f} Mo), construits en {exact.build_seconds:.1f} s")
+
+        approximate = VectorIndex(exact.embedder, ivf_lists=args.ivf_lists, nprobe=args.nprobe)
+        approximate.matrix = exact.matrix
+        start = time.perf_counter()
+        approximate._train_ivf()
+        print(f"🗂️  IVF : {args.ivf_lists} listes entraînées en {time.perf_counter() - start:.1f} s, nprobe {args.nprobe}")
+
+        semantic_queries = queries[:100]
+        for name, vectors in (("exact", exact), ("IVF", approximate)):
+            latencies = []
+            for query in semantic_queries:
+                start = time.perf_counter()
+                vectors.search(query, 10)
+                latencies.append(time.perf_counter() - start)
+            print(f"🔎 Cosinus {name:<5} : p50 {percentile(latencies, 0.5) * 1000:.3f} ms, "
+                  f"p99 {percentile(latencies, 0.99) * 1000:.3f} ms")
+        start = time.perf_counter()
+        exact.search_batch(semantic_queries, 10)
+        print(f"📦 Exact par lot de {len(semantic_queries)} : "
+              f"{(time.perf_counter() - start) / len(semantic_queries) * 1000:.3f} ms / requête")
+
+        recall = []
+        for query in QUERIES:
+            truth = {position for position, _ in exact.search(query, 10)}
+            found = {position for position, _ in approximate.search(query, 10)}
+            recall.append(len(truth & found) / max(1, len(truth)))
+        print(f"🎯 Rappel@10 IVF : {sum(recall) / len(recall):.1%}")
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# bench_whisper_tiers.py
+"""
+Benchmark : facteur temps réel (RTF = secondes de calcul / seconde d'audio)
+de chaque palier Whisper, en fp32 et en int8, sur un corpus audio local fixe.
+
+Le corpus est un dossier de fichiers audio (WAV, MP3...). Si un fichier
+`<nom>.txt` accompagne un enregistrement, il sert de référence pour le WER.
+Par défaut : ./bench_audio, construit par make_bench_corpus.py (clips
+déterministes) s'il n'existe pas encore.
+
+Usage:
+    python bench_whisper_tiers.py [--corpus ./bench_audio] [--tiers tiny,base,small] [--language fr]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.services.audio_decoding import decode_audio, SAMPLE_RATE, CHUNK_SIZE
+from app.services.whisper_pool import WhisperModelPool, WHISPER_AVAILABLE
+from make_bench_corpus import build_corpus
+
+AUDIO_EXTENSIONS = (".wav", ".mp3", ".m4a", ".ogg", ".webm", ".flac")
+DEFAULT_CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_audio")
+
+
+async def _file_chunks(path: str):
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(CHUNK_SIZE)
+            if not chunk:
+                return
+            yield chunk
+
+
+def load_corpus(directory: str):
+    corpus = []
+    for name in sorted(os.listdir(directory)):
+        if not name.lower().endswith(AUDIO_EXTENSIONS):
+            continue
+        path = os.path.join(directory, name)
+        audio = asyncio.run(decode_audio(_file_chunks(path)))
+        reference_path = os.path.splitext(path)[0] + ".txt"
+        reference = None
+        if os.path.exists(reference_path):
+            with open(reference_path, encoding="utf-8") as f:
+                reference = f.read()
+        corpus.append((name, audio, reference))
+    return corpus
+
+
+def word_error_rate(reference: str, hypothesis: str) -> float:
+    """Distance d'édition sur les mots / nombre de mots de la référence"""
+    ref, hyp = reference.lower().split(), hypothesis.lower().split()
+    previous = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, 1):
+        current = [i] + [0] * len(hyp)
+        for j, hyp_word in enumerate(hyp, 1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ref_word != hyp_word))
+        previous = current
+    return previous[-1] / max(1, len(ref))
+
+
+def bench_tier(tier: str, quantize: bool, corpus, language, device):
+    pool = WhisperModelPool(model_name=tier, size=1, device=device, quantize=quantize)
+    model = pool._load_one(tier)
+    options = {"fp16": False}
+    if language:
+        options["language"] = language
+
+    compute = 0.0
+    errors = []
+    for _, audio, reference in corpus:
+        start = time.perf_counter()
+        result = model.transcribe(audio, **options)
+        compute += time.perf_counter() - start
+        if reference is not None:
+            errors.append(word_error_rate(reference, result["text"]))
+    return pool.load_seconds, compute, errors
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS, help="dossier de fichiers audio")
+    parser.add_argument("--tiers", default="tiny,base,small")
+    parser.add_argument("--language", default="fr", help="langue imposée ('' = détection automatique)")
+    parser.add_argument("--device", default=None)
+    parser.add_argument("--no-int8", action="store_true", help="ne mesurer que le fp32")
+    args = parser.parse_args()
+
+    if not WHISPER_AVAILABLE:
+        sys.exit("❌ openai-whisper (et torch) requis pour ce benchmark")
+
+    if args.corpus == DEFAULT_CORPUS and not os.path.isdir(DEFAULT_CORPUS):
+        build_corpus(DEFAULT_CORPUS)
+        print(f"ℹ️  Corpus par défaut généré dans {DEFAULT_CORPUS}")
+
+    corpus = load_corpus(args.corpus)
+    if not corpus:
+        sys.exit(f"❌ Aucun fichier audio dans {args.corpus}")
+    audio_seconds = sum(len(audio) for _, audio, _ in corpus) / SAMPLE_RATE
+    print(f"📏 Corpus : {len(corpus)} fichier(s), {audio_seconds:.1f} s d'audio, "
+          f"langue {args.language or 'auto'}")
+
+    variants = [False] if args.no_int8 else [False, True]
+    for tier in [t.strip() for t in args.tiers.split(",") if t.strip()]:
+        for quantize in variants:
+            load_seconds, compute, errors = bench_tier(tier, quantize, corpus, args.language or None, args.device)
+            wer = f", WER {sum(errors) / len(errors):.1%}" if errors else ""
+            print(f"🎤 {tier:<7} {'int8' if quantize else 'fp32'} : RTF {compute / audio_seconds:.3f} "
+                  f"({compute:.1f} s de calcul, chargement {load_seconds:.1f} s{wer})")
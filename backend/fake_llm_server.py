@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# fake_llm_server.py
+"""
+Faux serveur "chat/completions" local pour tester LLMService sans OpenAI.
+
+Usage:
+    python fake_llm_server.py --port 8089 --latency 0.2
+    python fake_llm_server.py --latency 0.1 --latency-jitter 2 --error-rate 0.3  # amont dégradé
+    OPENAI_BASE_URL=http://127.0.0.1:8089/v1 OPENAI_API_KEY=test uvicorn main:app
+
+Peut aussi être démarré depuis un script de test:
+    server = start_fake_llm_server(port=0)
+    base_url = f"http://127.0.0.1:{server.server_port}/v1"
+"""
+import argparse
+import json
+import random
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_ANSWER = "Une routine de sommeil régulière et une chambre fraîche aident à mieux dormir. 😴"
+
+
+class FakeLLMHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, comme l'API réelle
+
+    def setup(self):
+        # Une instance de handler par connexion TCP : compte les connexions ouvertes par les clients
+        super().setup()
+        self.server.connections_seen += 1
+
+    def do_HEAD(self):
+        # Préchauffage de connexion (LLMService.prewarm) : réponse vide, connexion gardée
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": "not found"}})
+            return
+
+        length = int(self.headers.get("Content-Length", 0))
+        payload = json.loads(self.rfile.read(length) or b"{}")
+        self.server.requests_seen += 1
+
+        if self.server.latency:
+            time.sleep(self.server.latency + random.uniform(0, self.server.latency_jitter))
+
+        if self.server.error_rate and random.random() < self.server.error_rate:
+            self._send_json(500, {"error": {"message": "erreur injectée"}})
+            return
+
+        if payload.get("stream"):
+            self._send_stream(payload)
+            return
+
+        self._send_json(200, {
+            "id": f"fake-{self.server.requests_seen}",
+            "object": "chat.completion",
+            "model": payload.get("model", "fake"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": self.server.answer},
+                "finish_reason": "stop"
+            }]
+        })
+
+    def _send_stream(self, payload: dict):
+        """Réponse en Server-Sent Events, un mot par chunk (comme l'API réelle)"""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        for word in re.findall(r"\S+\s*", self.server.answer):
+            chunk = {
+                "object": "chat.completion.chunk",
+                "model": payload.get("model", "fake"),
+                "choices": [{"index": 0, "delta": {"content": word}, "finish_reason": None}]
+            }
+            try:
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError):
+                return  # le client a coupé le flux
+            if self.server.token_delay:
+                time.sleep(self.server.token_delay)
+        self.wfile.write(b"data: [DONE]\n\n")
+
+    def _send_json(self, status: int, body: dict):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+
+class FakeLLMServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 512  # accepte des centaines de connexions simultanées
+
+    def handle_error(self, request, client_address):
+        # Client parti (requête doublée annulée, flux coupé) : pas de trace
+        if isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+            return
+        super().handle_error(request, client_address)
+
+
+def start_fake_llm_server(port: int = 0, latency: float = 0.0, answer: str = DEFAULT_ANSWER,
+                          quiet: bool = True, token_delay: float = 0.0, latency_jitter: float = 0.0,
+                          error_rate: float = 0.0) -> FakeLLMServer:
+    """Démarre le serveur dans un thread daemon et le retourne (server.shutdown() pour l'arrêter)"""
+    server = FakeLLMServer(("127.0.0.1", port), FakeLLMHandler)
+    server.latency = latency
+    server.answer = answer
+    server.token_delay = token_delay
+    server.latency_jitter = latency_jitter
+    server.error_rate = error_rate
+    server.quiet = quiet
+    server.requests_seen = 0
+    server.connections_seen = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Faux serveur LLM local")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", type=float, default=0.0, help="latence injectée (secondes)")
+    parser.add_argument("--answer", default=DEFAULT_ANSWER)
+    parser.add_argument("--token-delay", type=float, default=0.0, help="délai entre tokens en streaming")
+    parser.add_argument("--latency-jitter", type=float, default=0.0, help="latence aléatoire ajoutée (0..n s)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="proportion de réponses 500 injectées")
+    args = parser.parse_args()
+
+    server = start_fake_llm_server(args.port, args.latency, args.answer, quiet=False,
+                                   token_delay=args.token_delay, latency_jitter=args.latency_jitter,
+                                   error_rate=args.error_rate)
+    print(f"🧪 Faux LLM sur http://127.0.0.1:{server.server_port}/v1 (latence {args.latency}s)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
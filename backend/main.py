@@ -1,4 +1,6 @@
 # app/main.py
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
@@ -20,11 +22,50 @@ from app.api.routes import (
     gamification_routes,
     social_routes
 )
+from app.services.agent_service import HealthAgent
+from app.services.voice_service import VoiceService
+from app.services.whisper_pool import WhisperModelPool
+from app.services.transcription_executor import TranscriptionExecutor
+from app.services.transcription_cache import TranscriptionCache
+from app.services.transcription_jobs import TranscriptionJobManager
+from app.services.camera_pipeline import CameraPipeline
+from app.services.knowledge_service import KnowledgeService
+
+# --- Services partagés : créés une seule fois par processus ---
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.health_agent = HealthAgent()
+    await app.state.health_agent.start()
+    
+    # Whisper se charge en arrière-plan : /voice/health répond 503 tant qu'il n'est pas prêt
+    app.state.whisper_pool = WhisperModelPool.from_env()
+    app.state.transcription_executor = TranscriptionExecutor.from_env(app.state.whisper_pool)
+    app.state.voice_service = VoiceService(app.state.transcription_executor, TranscriptionCache.from_env())
+    whisper_loading = asyncio.create_task(app.state.whisper_pool.load())
+    
+    # Jobs de transcription par lots : reprise des éléments non terminés
+    app.state.transcription_jobs = TranscriptionJobManager.from_env(app.state.voice_service)
+    await app.state.transcription_jobs.start()
+    
+    # Détecteurs de visage chargés une fois, partagés par les routes caméra
+    app.state.camera_pipeline = CameraPipeline.from_env()
+    
+    # Base de conseils indexée une fois (BM25), enrichie par /knowledge/tips
+    app.state.knowledge_service = KnowledgeService.from_env()
+    
+    yield
+    
+    await app.state.transcription_jobs.aclose()
+    whisper_loading.cancel()
+    app.state.transcription_executor.shutdown()
+    app.state.camera_pipeline.shutdown()
+    await app.state.health_agent.aclose()
 
 app = FastAPI(
     title="AurianCelumene API",
     version="0.1.0",
-    description="Backend principal pour la plateforme AurianCelumene 🌿"
+    description="Backend principal pour la plateforme AurianCelumene 🌿",
+    lifespan=lifespan
 )
 
 # --- Middleware CORS ---
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# make_bench_corpus.py
+"""
+Construit le corpus fixe de bench_whisper_tiers.py : quelques fichiers WAV
+16 kHz mono générés de façon déterministe (graine fixe), donc identiques
+d'une machine et d'une exécution à l'autre.
+
+Chaque clip imite la structure de la parole : voyelles (fondamentale +
+formants), syllabes modulées en amplitude, consonnes bruitées et pauses.
+Les durées couvrent les paliers (clip court, moyen, proche de la fenêtre
+de 30 s, plus long que la fenêtre). Pas de texte de référence : le WER ne
+se mesure que sur de vrais enregistrements accompagnés d'un `<nom>.txt`.
+
+Usage:
+    python make_bench_corpus.py [--output ./bench_audio]
+"""
+import argparse
+import os
+import wave
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+SEED = 20240917
+
+# (nom, durée en secondes, fondamentale moyenne en Hz)
+CLIPS = [
+    ("01_court.wav", 3.0, 120.0),
+    ("02_moyen.wav", 12.0, 210.0),
+    ("03_fenetre.wav", 28.0, 140.0),
+    ("04_long.wav", 65.0, 190.0),
+]
+# Formants (F1, F2) de quelques voyelles du français
+VOWELS = [(750, 1300), (300, 2300), (400, 2000), (500, 1000), (300, 800), (600, 1700)]
+
+
+def _syllable(rng: np.random.Generator, f0: float) -> np.ndarray:
+    """Consonne bruitée courte suivie d'une voyelle voisée"""
+    consonant = rng.normal(0, 0.05, int(SAMPLE_RATE * rng.uniform(0.02, 0.08)))
+
+    length = int(SAMPLE_RATE * rng.uniform(0.08, 0.22))
+    t = np.arange(length) / SAMPLE_RATE
+    pitch = f0 * (1 + 0.05 * np.sin(2 * np.pi * rng.uniform(2, 5) * t))
+    phase = 2 * np.pi * np.cumsum(pitch) / SAMPLE_RATE
+    f1, f2 = VOWELS[rng.integers(len(VOWELS))]
+    vowel = np.zeros(length)
+    for harmonic in range(1, 30):
+        frequency = harmonic * f0
+        if frequency > SAMPLE_RATE / 2:
+            break
+        # Enveloppe spectrale : deux résonances autour des formants
+        gain = np.exp(-((frequency - f1) / 150) ** 2) + 0.6 * np.exp(-((frequency - f2) / 200) ** 2) + 0.02
+        vowel += gain * np.sin(harmonic * phase)
+    vowel *= np.hanning(length) * 0.3 / max(1e-9, np.abs(vowel).max())
+    return np.concatenate([consonant, vowel])
+
+
+def make_clip(seconds: float, f0: float, rng: np.random.Generator) -> np.ndarray:
+    target = int(SAMPLE_RATE * seconds)
+    parts = []
+    total = 0
+    while total < target:
+        # Un « mot » de 1 à 4 syllabes, puis une pause (plus longue de temps en temps)
+        for _ in range(rng.integers(1, 5)):
+            parts.append(_syllable(rng, f0 * rng.uniform(0.9, 1.1)))
+        pause = rng.uniform(0.05, 0.15) if rng.random() < 0.8 else rng.uniform(0.4, 0.9)
+        parts.append(np.zeros(int(SAMPLE_RATE * pause)))
+        total = sum(len(part) for part in parts)
+    audio = np.concatenate(parts)[:target]
+    audio += rng.normal(0, 0.002, len(audio))   # bruit de fond de la pièce
+    return np.clip(audio, -1.0, 1.0)
+
+
+def write_wav(path: str, audio: np.ndarray):
+    with wave.open(path, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(SAMPLE_RATE)
+        f.writeframes((audio * 32767).astype("<i2").tobytes())
+
+
+def build_corpus(directory: str) -> list:
+    """Écrit les clips du corpus (toujours les mêmes octets) et renvoie leurs chemins"""
+    os.makedirs(directory, exist_ok=True)
+    rng = np.random.default_rng(SEED)
+    paths = []
+    for name, seconds, f0 in CLIPS:
+        path = os.path.join(directory, name)
+        write_wav(path, make_clip(seconds, f0, rng))
+        paths.append(path)
+    return paths
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--output", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_audio"))
+    args = parser.parse_args()
+
+    paths = build_corpus(args.output)
+    seconds = sum(duration for _, duration, _ in CLIPS)
+    print(f"✅ Corpus écrit dans {args.output} : {len(paths)} fichier(s), {seconds:.0f} s d'audio")
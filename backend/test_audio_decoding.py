@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# test_audio_decoding.py
+"""
+Tests du décodage audio en flux : WAV décodé morceau par morceau,
+limites de taille et de durée, repli ffmpeg.
+
+Usage:
+    python -m pytest test_audio_decoding.py -q
+"""
+import io
+import os
+import shutil
+import struct
+import sys
+import wave
+
+import numpy as np
+import pytest
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.services.audio_decoding import decode_audio, AudioDecodingError, AudioTooLargeError, SAMPLE_RATE
+
+
+def make_wav(samples: np.ndarray, rate: int = SAMPLE_RATE, channels: int = 1) -> bytes:
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as f:
+        f.setnchannels(channels)
+        f.setsampwidth(2)
+        f.setframerate(rate)
+        f.writeframes(samples.astype("<i2").tobytes())
+    return buffer.getvalue()
+
+
+def ramp(frames: int) -> np.ndarray:
+    return (np.arange(frames) % 2000 - 1000).astype(np.int16)
+
+
+async def chunks_of(data: bytes, size: int):
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("chunk_size", [1, 7, 4096, 1 << 20])
+async def test_wav_decoded_identically_whatever_the_chunking(chunk_size):
+    samples = ramp(SAMPLE_RATE // 2)
+    audio = await decode_audio(chunks_of(make_wav(samples), chunk_size))
+    assert audio.dtype == np.float32
+    np.testing.assert_array_equal(audio, samples.astype(np.float32) / 32768.0)
+
+
+@pytest.mark.asyncio
+async def test_stereo_wav_downmixed_and_resampled():
+    left = ramp(8000)
+    stereo = np.stack([left, left], axis=1).reshape(-1)
+    audio = await decode_audio(chunks_of(make_wav(stereo, rate=8000, channels=2), 1000))
+    # 1 s à 8 kHz -> 1 s à 16 kHz, mono
+    assert len(audio) == SAMPLE_RATE
+    assert np.abs(audio).max() <= 1.0
+
+
+@pytest.mark.asyncio
+async def test_blocks_after_data_are_not_decoded_as_samples():
+    samples = ramp(1600)
+    data = make_wav(samples)
+    trailer = b"LIST" + struct.pack("<I", 10) + b"INFOxxxxxx"
+    audio = await decode_audio(chunks_of(data + trailer, 333))
+    np.testing.assert_array_equal(audio, samples.astype(np.float32) / 32768.0)
+
+
+@pytest.mark.asyncio
+async def test_limits_are_enforced_while_reading():
+    data = make_wav(ramp(SAMPLE_RATE * 2))
+    with pytest.raises(AudioTooLargeError):
+        await decode_audio(chunks_of(data, 4096), max_bytes=len(data) - 1)
+    with pytest.raises(AudioTooLargeError):
+        await decode_audio(chunks_of(data, 4096), max_seconds=1.0)
+
+
+@pytest.mark.asyncio
+async def test_truncated_header_is_rejected():
+    with pytest.raises(AudioDecodingError):
+        await decode_audio(chunks_of(make_wav(ramp(100))[:20], 5))
+
+
+@pytest.mark.asyncio
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg non installé")
+async def test_non_pcm_input_goes_through_ffmpeg(tmp_path):
+    source = tmp_path / "source.wav"
+    source.write_bytes(make_wav(ramp(SAMPLE_RATE)))
+    encoded = tmp_path / "encoded.flac"
+    assert os.system(f"ffmpeg -loglevel error -i {source} {encoded}") == 0
+
+    audio = await decode_audio(chunks_of(encoded.read_bytes(), 4096))
+    assert audio.dtype == np.float32
+    assert abs(len(audio) - SAMPLE_RATE) < SAMPLE_RATE // 100
+
+
+@pytest.mark.asyncio
+async def test_ffmpeg_output_collected_as_float32(tmp_path, monkeypatch):
+    # Faux ffmpeg : consomme stdin puis écrit 1 s de PCM s16le connu sur stdout
+    fake = tmp_path / "ffmpeg"
+    fake.write_text(
+        f"#!{sys.executable}\n"
+        "import sys\n"
+        "sys.stdin.buffer.read()\n"
+        "sys.stdout.buffer.write(bytes(range(256)) * 125)\n"
+    )
+    fake.chmod(0o755)
+    monkeypatch.setenv("PATH", f"{tmp_path}{os.pathsep}{os.environ['PATH']}")
+
+    audio = await decode_audio(chunks_of(b"ID3" + bytes(5000), 1024))
+    expected = np.frombuffer(bytes(range(256)) * 125, np.int16).astype(np.float32) / 32768.0
+    np.testing.assert_array_equal(audio, expected)
+
+    with pytest.raises(AudioTooLargeError):
+        await decode_audio(chunks_of(b"ID3" + bytes(5000), 1024), max_seconds=0.25)
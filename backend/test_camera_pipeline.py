@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+# test_camera_pipeline.py
+"""
+Tests du pipeline caméra : cache des analyses (empreinte perceptuelle, par
+utilisateur), mesures vectorisées par lot, et pipeline complet quand les
+détecteurs OpenCV sont disponibles.
+
+Usage:
+    python -m pytest test_camera_pipeline.py -q
+"""
+import os
+import sys
+import time
+
+import numpy as np
+import pytest
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import app.services.camera_cache as camera_cache
+from app.services.camera_cache import CameraResultCache
+from app.services.camera_pipeline import (
+    CV2_AVAILABLE, CameraPipeline, FrameDetections, ImageDecodingError, ImageTooLargeError, MAX_IMAGE_BYTES,
+    dhash, face_measures, measure_batch
+)
+
+if CV2_AVAILABLE:
+    import cv2
+
+needs_cv2 = pytest.mark.skipif(not CV2_AVAILABLE, reason="opencv-python non installé")
+
+SCOPE = (1, ("emotions",))
+
+
+def test_cache_returns_nearest_result_within_distance():
+    cache = CameraResultCache(max_distance=3)
+    cache.put(SCOPE, 0b1111_0000, {"id": "a"})
+    cache.put(SCOPE, 0b0000_1111, {"id": "b"})
+
+    assert cache.get(SCOPE, 0b1111_0001) == {"id": "a"}
+    assert cache.get(SCOPE, 0b0000_0111) == {"id": "b"}
+    # 4 bits d'écart avec chacune : trop loin
+    assert cache.get(SCOPE, 0b1100_0011) is None
+    assert (cache.hits, cache.misses) == (2, 1)
+
+
+def test_cache_is_scoped_by_user_and_analyses():
+    cache = CameraResultCache()
+    cache.put(SCOPE, 42, {"id": "a"})
+    assert cache.get((2, ("emotions",)), 42) is None
+    assert cache.get((1, ("emotions", "fatigue")), 42) is None
+
+    cache.put((2, ("emotions",)), 42, {"id": "b"})
+    cache.forget(1)
+    assert cache.get(SCOPE, 42) is None
+    assert cache.get((2, ("emotions",)), 42) == {"id": "b"}
+
+
+def test_cache_expires_and_evicts_least_recently_used():
+    cache = CameraResultCache(max_entries=2, max_distance=0, ttl_seconds=0.05)
+    cache.put(SCOPE, 1, {"id": 1})
+    cache.put(SCOPE, 2, {"id": 2})
+    assert cache.get(SCOPE, 1) == {"id": 1}
+    cache.put(SCOPE, 3, {"id": 3})
+    # 2 était le moins récemment utilisé
+    assert cache.get(SCOPE, 2) is None
+    assert cache.evictions == 1
+
+    time.sleep(0.06)
+    assert cache.get(SCOPE, 1) is None
+    assert cache.expired == 2
+    assert cache.stats()["entries"] == 0
+
+
+@pytest.mark.asyncio
+async def test_cache_needs_consent(monkeypatch):
+    monkeypatch.setattr(camera_cache, "_load_consent", lambda user_id: user_id == 1)
+    cache = CameraResultCache()
+    cache.put((2, ("emotions",)), 42, {"id": "b"})
+
+    assert await cache.allowed(1) is True
+    assert await cache.allowed(2) is False
+    # Sans consentement, ce qui avait été gardé pour l'utilisateur disparaît
+    assert cache.get((2, ("emotions",)), 42) is None
+    assert cache.no_consent == 1
+
+
+# ----------------------------------------------------------------------
+# Avec OpenCV
+# ----------------------------------------------------------------------
+def make_scene(seed: int, width: int = 800, height: int = 600) -> np.ndarray:
+    """Image BGR déterministe : dégradé et quelques formes (pas de visage)"""
+    rng = np.random.default_rng(seed)
+    x = np.linspace(0, 1, width)[None, :, None]
+    y = np.linspace(0, 1, height)[:, None, None]
+    image = (255 * (0.3 * x + 0.5 * y) * rng.uniform(0.5, 1.0, 3)).astype(np.uint8)
+    for _ in range(6):
+        center = (int(rng.integers(width)), int(rng.integers(height)))
+        color = tuple(int(c) for c in rng.integers(0, 255, 3))
+        cv2.circle(image, center, int(rng.integers(20, 120)), color, -1)
+    return image
+
+
+def encode(image: np.ndarray, ext: str = ".png", *params) -> bytes:
+    return cv2.imencode(ext, image, list(params))[1].tobytes()
+
+
+def with_face(image: np.ndarray, box, eyes=()) -> FrameDetections:
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    detections = FrameDetections(image, gray, (image.shape[1], image.shape[0]))
+    detections.face = box
+    detections.face_score = 0.9
+    detections.eyes = list(eyes)
+    detections.eyes_detected = len(eyes)
+    detections.normalize()
+    return detections
+
+
+@needs_cv2
+def test_dhash_survives_recompression_but_not_other_images():
+    scene = make_scene(1)
+    recompressed = cv2.imdecode(np.frombuffer(encode(scene, ".jpg", cv2.IMWRITE_JPEG_QUALITY, 60), np.uint8),
+                                cv2.IMREAD_COLOR)
+    assert bin(dhash(scene) ^ dhash(recompressed)).count("1") <= 5
+    assert bin(dhash(scene) ^ dhash(make_scene(2))).count("1") > 5
+
+
+@needs_cv2
+def test_batch_measures_match_single_image_measures():
+    frames = [
+        with_face(make_scene(1), (300, 150, 200, 240), eyes=[(340, 220, 50, 30), (410, 225, 50, 30)]),
+        with_face(make_scene(2), (100, 80, 160, 200)),
+        with_face(make_scene(3), None),
+    ]
+    batch = measure_batch(frames)
+    assert [row["face_detected"] for row in batch] == [True, True, False]
+    for frame, row in zip(frames, batch):
+        single = face_measures(frame)
+        assert single.keys() == row.keys()
+        for name, value in single.items():
+            # Réductions float32 sur des lots de tailles différentes : écarts d'arrondi seulement
+            assert value == pytest.approx(row[name], rel=1e-4, nan_ok=True), name
+
+
+@pytest.fixture
+def pipeline(monkeypatch):
+    monkeypatch.setattr(camera_cache, "_load_consent", lambda user_id: user_id == 1)
+    pipeline = CameraPipeline(workers=2, work_width=640, cache=CameraResultCache())
+    if not pipeline.ready:
+        pytest.skip(f"pipeline caméra indisponible: {pipeline.error}")
+    yield pipeline
+    pipeline.shutdown()
+
+
+def test_decode_rejects_garbage_and_reduces_to_work_width(pipeline):
+    with pytest.raises(ImageDecodingError):
+        pipeline.decode(b"pas une image")
+    image, original_size = pipeline.decode(encode(make_scene(1, width=1600, height=1200)))
+    assert original_size == (1600, 1200)
+    assert image.shape[:2] == (480, 640)
+
+
+@pytest.mark.asyncio
+async def test_analyze_reuses_results_only_with_consent(pipeline, monkeypatch):
+    data = encode(make_scene(1))
+    first = await pipeline.analyze(data, user_id=1)
+    assert first["cached"] is False
+    assert first["face_detected"] is False
+    assert set(first) >= {"emotions", "fatigue", "advanced"}
+
+    def no_detection(*args, **kwargs):
+        raise AssertionError("détection relancée sur une image déjà analysée")
+
+    detect = pipeline.detect
+    monkeypatch.setattr(pipeline, "detect", no_detection)
+    # Même image recompressée : empreinte quasi identique, résultat repris
+    again = await pipeline.analyze(encode(make_scene(1), ".jpg", cv2.IMWRITE_JPEG_QUALITY, 70), user_id=1)
+    assert again["cached"] is True
+    assert again["advanced"] == first["advanced"]
+
+    monkeypatch.setattr(pipeline, "detect", detect)
+    # Autre utilisateur (sans consentement) : toujours une nouvelle analyse
+    other = await pipeline.analyze(data, user_id=2)
+    assert other["cached"] is False
+    assert pipeline.cache.stats()["hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_batch_keeps_going_past_bad_images(pipeline):
+    good = encode(make_scene(1))
+    results = await pipeline.analyze_batch([good, b"illisible", b"0" * (MAX_IMAGE_BYTES + 1), good])
+    assert "error" in results[1] and "error" in results[2]
+    assert results[0] == results[3]
+    assert results[0]["face_detected"] is False
+    with pytest.raises(ImageTooLargeError):
+        await pipeline.analyze(b"0" * (MAX_IMAGE_BYTES + 1))
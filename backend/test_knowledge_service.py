@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# test_knowledge_service.py
+"""
+Tests de la base de connaissances : conseils ajoutés et partagés entre workers.
+
+Usage:
+    python -m pytest test_knowledge_service.py -q
+"""
+import asyncio
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.services.knowledge_service import KnowledgeService
+from app.services.vector_index import VectorIndex, HashingEmbedder
+
+
+class SlowEmbedder(HashingEmbedder):
+    """Vectoriseur lent : laisse le temps à une autre coroutine de s'intercaler"""
+
+    def embed(self, texts):
+        time.sleep(0.2)
+        return super().embed(texts)
+
+
+def make_service(tips_path, embedder=None) -> KnowledgeService:
+    return KnowledgeService(tips_path=str(tips_path), vectors=VectorIndex(embedder or HashingEmbedder()))
+
+
+@pytest.mark.asyncio
+async def test_add_tip_during_concurrent_search(tmp_path):
+    service = make_service(tmp_path / "tips.jsonl", SlowEmbedder())
+    append = service._append_tip
+
+    def slow_append(tip):
+        # La ligne est écrite, mais add_tip ne reprend la main qu'après le début de la recherche
+        start = append(tip)
+        time.sleep(0.1)
+        return start
+
+    service._append_tip = slow_append
+
+    async def search_soon():
+        await asyncio.sleep(0.05)
+        return await service.search_health_resources("quinoa protéines", 1)
+
+    document, results = await asyncio.gather(
+        service.add_tip("nutrition", "Le quinoa apporte des protéines complètes"), search_soon()
+    )
+    assert document["content"] == "Le quinoa apporte des protéines complètes"
+    assert [d["content"] for d in service.documents].count(document["content"]) == 1
+    assert len(service.vectors) == len(service.documents)
+
+
+@pytest.mark.asyncio
+async def test_tips_are_shared_between_workers(tmp_path):
+    path = tmp_path / "tips.jsonl"
+    first, second = make_service(path), make_service(path)
+
+    added = await first.add_tip("nutrition", "Le quinoa apporte des protéines complètes")
+    other = await second.add_tip("sommeil", "Une sieste de vingt minutes restaure la vigilance")
+
+    for service in (first, second):
+        lexical = await service.search_health_resources("protéines du quinoa", 1, mode="lexical")
+        semantic = await service.search_health_resources("sieste vigilance", 1, mode="semantic")
+        assert lexical[0]["content"] == added["content"]
+        assert semantic[0]["content"] == other["content"]
+        # Même ordre d'indexation partout : mêmes identifiants de documents
+        assert [d["content"] for d in service.documents[-2:]] == [added["content"], other["content"]]
+        assert len(service.vectors) == len(service.documents)
+
+    # Ligne en cours d'écriture par un autre worker : ignorée jusqu'à ce qu'elle soit complète
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"category": "stress", "content": "Respirer lentement')
+    assert await first.sync_tips() == 0
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(' calme le stress"}\n')
+    assert await first.sync_tips() == 1
+    assert first.documents[-1]["content"] == "Respirer lentement calme le stress"
+
+    restarted = make_service(path)
+    assert len(restarted.documents) == len(first.documents)
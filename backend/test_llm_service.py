@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# test_llm_service.py
+"""
+Tests de LLMService contre le faux serveur local (fake_llm_server.py) :
+réutilisation des connexions et disjoncteur.
+
+Usage:
+    python -m pytest test_llm_service.py -q
+"""
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from fake_llm_server import start_fake_llm_server, DEFAULT_ANSWER
+from app.services.circuit_breaker import CLOSED, HALF_OPEN, OPEN
+from app.services.llm_service import LLMService
+
+
+@pytest.fixture
+def fake_llm():
+    server = start_fake_llm_server(port=0)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def make_service(fake_llm, monkeypatch):
+    """LLMService pointé sur le faux serveur, sans cache ni retry (chaque appel atteint le serveur)"""
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    monkeypatch.setenv("OPENAI_BASE_URL", f"http://127.0.0.1:{fake_llm.server_port}/v1")
+    monkeypatch.setenv("LLM_CACHE_BACKEND", "none")
+    monkeypatch.setenv("LLM_MAX_RETRIES", "0")
+
+    def make(**env):
+        for name, value in env.items():
+            monkeypatch.setenv(name, str(value))
+        return LLMService()
+
+    return make
+
+
+@pytest.mark.asyncio
+async def test_connection_is_reused(fake_llm, make_service):
+    service = make_service()
+    questions = ["Je dors mal", "Comment gérer le stress ?", "Que manger le soir ?", "Marcher suffit-il ?"]
+    for question in questions:
+        answer = await service.generate_health_response(question, {})
+        assert answer == DEFAULT_ANSWER
+
+    assert fake_llm.requests_seen == len(questions)
+    # Client httpx partagé : une seule connexion keep-alive pour tous les appels
+    assert fake_llm.connections_seen == 1
+    await service.aclose()
+
+
+@pytest.mark.asyncio
+async def test_breaker_opens_on_slow_upstream_and_serves_demo(fake_llm, make_service):
+    service = make_service(
+        LLM_BREAKER_MIN_REQUESTS=3,
+        LLM_BREAKER_SLOW_CALL_SECONDS=0.05,
+        LLM_BREAKER_OPEN_SECONDS=30
+    )
+    fake_llm.latency = 0.1
+
+    for i in range(3):
+        await service.generate_health_response(f"Question lente {i}", {})
+    assert service.circuit_breaker.state == OPEN
+
+    # Disjoncteur ouvert : réponse de démo immédiate, le serveur n'est plus appelé
+    seen = fake_llm.requests_seen
+    question = "J'ai du mal à dormir"
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    answer = await service.generate_health_response(question, {})
+    assert loop.time() - start < fake_llm.latency
+    assert answer == service._get_demo_response(question, {})
+    assert fake_llm.requests_seen == seen
+    assert service.circuit_breaker.rejected >= 1
+    await service.aclose()
+
+
+@pytest.mark.asyncio
+async def test_breaker_recovers_through_half_open(fake_llm, make_service):
+    service = make_service(
+        LLM_BREAKER_MIN_REQUESTS=3,
+        LLM_BREAKER_SLOW_CALL_SECONDS=0.05,
+        LLM_BREAKER_OPEN_SECONDS=0.2
+    )
+    fake_llm.latency = 0.1
+    for i in range(3):
+        await service.generate_health_response(f"Question lente {i}", {})
+    assert service.circuit_breaker.state == OPEN
+
+    # Amont rétabli : après `open_seconds`, un appel de test passe (half_open) et referme
+    fake_llm.latency = 0.0
+    await asyncio.sleep(0.25)
+    answer = await service.generate_health_response("Question après rétablissement", {})
+    assert answer == DEFAULT_ANSWER
+    assert service.circuit_breaker.state == CLOSED
+    assert service.circuit_breaker.transitions == {
+        f"{CLOSED}->{OPEN}": 1, f"{OPEN}->{HALF_OPEN}": 1, f"{HALF_OPEN}->{CLOSED}": 1
+    }
+    await service.aclose()
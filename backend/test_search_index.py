@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# test_search_index.py
+"""
+Tests de l'index BM25 : normalisation des termes, classement comparé à un
+calcul BM25 direct, et mise à jour après ajout.
+
+Usage:
+    python -m pytest test_search_index.py -q
+"""
+import math
+import os
+import random
+import sys
+from collections import Counter
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.services.search_index import BM25Index, tokenize
+
+VOCABULARY = [
+    "sommeil", "hydratation", "marche", "stress", "respiration", "légumes", "protéines",
+    "sieste", "écran", "lumière", "vélo", "fatigue", "repas", "eau", "méditation", "dos",
+]
+
+
+def brute_force_bm25(documents, query, k1=1.2, b=0.75):
+    """Score BM25 de chaque document, calculé directement (référence)"""
+    tokenized = [tokenize(text) for text in documents]
+    average = sum(map(len, tokenized)) / len(tokenized)
+    scores = []
+    for tokens in tokenized:
+        counts = Counter(tokens)
+        score = 0.0
+        for term in set(tokenize(query)):
+            df = sum(term in other for other in tokenized)
+            if not df or not counts[term]:
+                continue
+            idf = math.log(1 + (len(tokenized) - df + 0.5) / (df + 0.5))
+            tf = counts[term]
+            score += idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * len(tokens) / average))
+        scores.append(score)
+    return scores
+
+
+def test_tokenize_folds_accents_drops_stop_words_and_stems():
+    assert tokenize("L'hydratation et le SOMMEIL des Enfants") == ["hydrat", "sommeil", "enfant"]
+    assert tokenize("hydrater") == tokenize("Hydratation")
+    assert tokenize("Été") == ["ete"]
+
+
+def test_ranking_matches_direct_bm25():
+    rng = random.Random(7)
+    documents = [" ".join(rng.choices(VOCABULARY, k=rng.randint(3, 30))) for _ in range(300)]
+    index = BM25Index()
+    for i, text in enumerate(documents):
+        index.add(i, text)
+
+    for query in ["sommeil fatigue", "marche vélo eau", "méditation", "stress respiration écran dos"]:
+        expected = brute_force_bm25(documents, query)
+        hits = index.search(query, limit=10)
+        assert len(hits) == 10
+        for doc_id, score in hits:
+            assert score == pytest.approx(expected[doc_id], rel=1e-4)
+        # Les 10 meilleurs, dans l'ordre (ex aequo en bordure : même score)
+        best = sorted(expected, reverse=True)[:10]
+        assert [score for _, score in hits] == pytest.approx(best, rel=1e-4)
+
+
+def test_shorter_document_and_rarer_term_rank_first():
+    index = BM25Index()
+    index.add("court", "sommeil")
+    index.add("long", "sommeil " + " ".join(["repas"] * 20))
+    index.add("rare", "sieste")
+    for i in range(5):
+        index.add(f"bruit{i}", "sommeil marche")
+
+    assert index.search("sommeil", limit=2)[0][0] == "court"
+    assert index.search("sommeil sieste", limit=1)[0][0] == "rare"
+    assert index.search("mot absent", limit=5) == []
+    assert index.search("sommeil", limit=0) == []
+
+
+def test_scores_follow_additions():
+    index = BM25Index()
+    index.add("a", "stress et respiration")
+    index.add("b", "marche quotidienne")
+    before = dict(index.search("stress", limit=5))
+
+    # Le terme devient courant : son idf baisse, le poids en cache est recalculé
+    for i in range(10):
+        index.add(f"c{i}", "stress au travail")
+    after = dict(index.search("stress", limit=20))
+    assert after["a"] < before["a"]
+    assert len(after) == 11
+    assert index.stats()["documents"] == 12
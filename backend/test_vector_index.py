@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# test_vector_index.py
+"""
+Tests de l'index vectoriel : réutilisation de la matrice sur disque,
+recherche exacte et recherche approchée par listes (IVF).
+
+Usage:
+    python -m pytest test_vector_index.py -q
+"""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.services.vector_index import VectorIndex, HashingEmbedder
+
+TEXTS = [
+    "Dormir sept à neuf heures par nuit",
+    "Boire de l'eau régulièrement pour l'hydratation",
+    "Marcher trente minutes chaque jour",
+    "La respiration lente réduit le stress",
+    "Manger des légumes à chaque repas",
+]
+
+
+class CountingEmbedder(HashingEmbedder):
+    """Vectoriseur haché qui compte les textes vectorisés"""
+
+    def __init__(self, dim: int = 256):
+        super().__init__(dim)
+        self.embedded = 0
+
+    def embed(self, texts):
+        self.embedded += len(texts)
+        return super().embed(texts)
+
+
+class ClusteredEmbedder:
+    """
+    Vecteurs synthétiques groupés en `clusters` amas : le texte "i" est le
+    document i, une requête "q:i" tombe près du document i.
+    """
+
+    def __init__(self, count: int, clusters: int = 32, dim: int = 64, seed: int = 3):
+        rng = np.random.default_rng(seed)
+        centers = rng.normal(size=(clusters, dim))
+        self.vectors = centers[rng.integers(clusters, size=count)] + 0.3 * rng.normal(size=(count, dim))
+        self.vectors = (self.vectors / np.linalg.norm(self.vectors, axis=1, keepdims=True)).astype(np.float32)
+        self.noise = 0.05 * rng.normal(size=(count, dim)).astype(np.float32)
+        self.dim = dim
+        self.name = f"clustered-{count}-{dim}"
+
+    def embed(self, texts):
+        rows = []
+        for text in texts:
+            if text.startswith("q:"):
+                i = int(text[2:])
+                vector = self.vectors[i] + self.noise[i]
+                rows.append(vector / np.linalg.norm(vector))
+            else:
+                rows.append(self.vectors[int(text)])
+        return np.array(rows, dtype=np.float32)
+
+
+def test_matrix_reused_from_disk_when_unchanged(tmp_path):
+    path = str(tmp_path / "vectors.f32")
+    first = VectorIndex(CountingEmbedder(), path=path)
+    first.build(TEXTS)
+    assert not first.reused and first.mapped
+    assert first.embedder.embedded == len(TEXTS)
+
+    # Autre worker, mêmes textes et même modèle : rien n'est recalculé
+    second = VectorIndex(CountingEmbedder(), path=path)
+    second.build(TEXTS)
+    assert second.reused and second.mapped
+    assert second.embedder.embedded == 0
+    np.testing.assert_array_equal(np.asarray(second.matrix), np.asarray(first.matrix))
+    assert second.search("stress et respiration", 1) == first.search("stress et respiration", 1)
+
+    # Textes ou modèle différents : reconstruction
+    changed = VectorIndex(CountingEmbedder(), path=path)
+    changed.build(TEXTS + ["Faire une sieste courte"])
+    assert not changed.reused and changed.embedder.embedded == len(TEXTS) + 1
+    other_model = VectorIndex(CountingEmbedder(dim=128), path=path)
+    other_model.build(TEXTS + ["Faire une sieste courte"])
+    assert not other_model.reused
+
+
+def test_truncated_matrix_is_rebuilt(tmp_path):
+    path = str(tmp_path / "vectors.f32")
+    VectorIndex(CountingEmbedder(), path=path).build(TEXTS)
+    with open(path, "r+b") as f:
+        f.truncate(100)
+    index = VectorIndex(CountingEmbedder(), path=path)
+    index.build(TEXTS)
+    assert not index.reused
+    assert os.path.getsize(path) == len(TEXTS) * index.embedder.dim * 4
+
+
+def test_exact_search_and_additions():
+    index = VectorIndex(HashingEmbedder())
+    index.build(TEXTS)
+    position, score = index.search("la respiration lente réduit le stress", 1)[0]
+    assert position == 3
+    assert score == pytest.approx(1.0, abs=1e-5)
+
+    batch = index.search_batch(["hydratation eau", "marche quotidienne"], 2)
+    assert batch == [index.search("hydratation eau", 2), index.search("marche quotidienne", 2)]
+
+    # Ajout après construction : cherché aussi, à la position suivante
+    added = index.add("Une sieste de vingt minutes restaure la vigilance")
+    assert added == len(TEXTS)
+    assert index.search("sieste vigilance", 1)[0][0] == added
+    assert index.stats()["pending_in_memory"] == 1
+
+
+def test_ivf_matches_exact_search_when_probing_every_list():
+    count = 4000
+    embedder = ClusteredEmbedder(count)
+    texts = [str(i) for i in range(count)]
+    exact = VectorIndex(embedder)
+    exact.build(texts)
+    full = VectorIndex(embedder, ivf_lists=16, nprobe=16)
+    full.build(texts)
+    assert full.stats()["mode"] == "ivf"
+    assert sum(len(rows) for rows in full._list_rows) == count
+
+    queries = [f"q:{i}" for i in range(0, count, 97)]
+    for got, expected in zip(full.search_batch(queries, 10), exact.search_batch(queries, 10)):
+        assert [position for position, _ in got] == [position for position, _ in expected]
+
+
+def test_ivf_recall_with_few_probes_and_recent_additions():
+    count = 4000
+    embedder = ClusteredEmbedder(count)
+    texts = [str(i) for i in range(count)]
+    exact = VectorIndex(embedder)
+    exact.build(texts)
+    ivf = VectorIndex(embedder, ivf_lists=32, nprobe=4)
+    ivf.build(texts)
+
+    queries = [f"q:{i}" for i in range(0, count, 41)]
+    found = total = 0
+    for got, expected in zip(ivf.search_batch(queries, 10), exact.search_batch(queries, 10)):
+        found += len({p for p, _ in got} & {p for p, _ in expected})
+        total += len(expected)
+    assert found / total >= 0.9
+
+    # Les ajouts récents ne sont dans aucune liste mais restent toujours comparés
+    added = ivf.add_vector(embedder.embed(["q:5"])[0])
+    assert ivf.search("q:5", 1)[0][0] == added
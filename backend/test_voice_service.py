@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# test_voice_service.py
+"""
+Tests du cache des transcriptions : un renvoi du même audio ne repasse
+ni par le décodage, ni par le prétraitement, ni par le modèle.
+
+Usage:
+    python -m pytest test_voice_service.py -q
+"""
+import io
+import os
+import sys
+import wave
+
+import numpy as np
+import pytest
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import app.services.voice_service as voice_module
+from app.services.audio_decoding import hash_upload
+from app.services.transcription_cache import TranscriptionCache
+from app.services.voice_service import VoiceService
+
+
+class FakePool:
+    tiers = ["tiny", "base"]
+
+
+class FakeExecutor:
+    """Exécuteur sans Whisper : compte les passages et choisit le palier selon la durée"""
+
+    def __init__(self):
+        self.model_pool = FakePool()
+        self.calls = []
+
+    def choose_tier(self, duration_seconds, latency_budget_ms=None):
+        return "tiny" if duration_seconds < 1 else "base"
+
+    async def transcribe_batch(self, chunks, tier=None, **options):
+        self.calls.append((tier, options.get("language")))
+        return {"text": "j'ai mal à la tête", "language": options.get("language", "fr"),
+                "confidence": 0.9, "model": tier}
+
+
+class FakeUpload:
+    """Équivalent minimal d'un UploadFile de FastAPI"""
+
+    def __init__(self, data: bytes):
+        self.file = io.BytesIO(data)
+
+    async def read(self, size: int = -1) -> bytes:
+        return self.file.read(size)
+
+    async def seek(self, offset: int):
+        self.file.seek(offset)
+
+
+def make_wav(seconds: float = 2.0) -> bytes:
+    t = np.arange(int(16000 * seconds)) / 16000
+    samples = (0.3 * np.sin(2 * np.pi * 220 * t) * 32767).astype("<i2")
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(16000)
+        f.writeframes(samples.tobytes())
+    return buffer.getvalue()
+
+
+async def chunks_of(data: bytes, size: int = 4096):
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+
+@pytest.fixture
+def service(tmp_path):
+    return VoiceService(FakeExecutor(), TranscriptionCache(str(tmp_path / "cache")))
+
+
+@pytest.mark.asyncio
+async def test_cache_hit_skips_decode_and_preprocessing(service, monkeypatch):
+    data = make_wav()
+    first = await service.transcribe_audio(FakeUpload(data), language="fr")
+    assert first["cached"] is False
+    assert first["model"] == "whisper-base"
+    assert service.executor.calls == [("base", "fr")]
+
+    def no_preprocess(audio):
+        raise AssertionError("prétraitement relancé sur un audio déjà transcrit")
+
+    monkeypatch.setattr(voice_module, "preprocess", no_preprocess)
+    second = await service.transcribe_audio(FakeUpload(data), language="fr")
+    assert second["cached"] is True
+    assert second["text"] == first["text"]
+    assert second["audio_sha256"] == first["audio_sha256"]
+    assert second["model"] == "whisper-base"
+    assert len(service.executor.calls) == 1
+
+    # Empreinte connue de l'appelant : le flux n'est même pas lu
+    async def unreadable():
+        raise AssertionError("flux décodé malgré l'entrée en cache")
+        yield b""
+
+    third = await service.transcribe_stream(unreadable(), language="fr", audio_hash=first["audio_sha256"])
+    assert third["cached"] is True
+
+
+@pytest.mark.asyncio
+async def test_stream_without_hash_hits_cache_before_preprocessing(service, monkeypatch):
+    data = make_wav()
+    first = await service.transcribe_stream(chunks_of(data), language="fr")
+    assert first["audio_sha256"] == await hash_upload(FakeUpload(data))
+
+    monkeypatch.setattr(voice_module, "preprocess", None)
+    second = await service.transcribe_stream(chunks_of(data, 1000), language="fr")
+    assert second["cached"] is True
+    assert len(service.executor.calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_cache_key_depends_on_language_not_tier(service):
+    data = make_wav()
+    await service.transcribe_audio(FakeUpload(data), language="fr")
+    # Un autre budget de latence ne change pas la clé
+    again = await service.transcribe_audio(FakeUpload(data), language="fr", latency_budget_ms=1)
+    assert again["cached"] is True
+
+    other = await service.transcribe_audio(FakeUpload(data), language="en")
+    assert other["cached"] is False
+    assert service.executor.calls == [("base", "fr"), ("base", "en")]
+    assert service.cache.stores == 2